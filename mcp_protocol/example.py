@@ -5,6 +5,17 @@ MCP协议示例代码
 展示MCP的核心概念和实现
 """
 
+import asyncio
+import contextlib
+import copy
+import io
+import itertools
+import random
+import re
+import sys
+import time
+from typing import Any
+
 # ============================================================
 # 1. MCP架构示例
 # ============================================================
@@ -65,6 +76,14 @@ class MCPClient:
     def __init__(self, name: str):
         self.name = name
         self.servers = []
+        # 远程连接（open 之后使用）
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._slots = None
+        self.stats = {"requests": 0, "frames": 0, "max_in_flight": 0, "out_of_order": 0}
         print(f"📡 客户端 '{name}' 已初始化")
     
     def connect_server(self, server):
@@ -86,6 +105,102 @@ class MCPClient:
             if tool:
                 return server.execute_tool(tool_name, **kwargs)
         return None
+    
+    # ---------- 远程服务器：请求流水线与批量请求 ----------
+    
+    async def open(self, host: str, port: int, max_in_flight: int = 64):
+        """连接远程 MCP 服务器（每行一条 JSON-RPC 消息）
+        
+        之后并发发起的请求在同一连接上流水线发送，不等待前一个响应；
+        响应可能乱序到达，按 id 交给对应的等待者。max_in_flight 限制同时未完成的帧数
+        """
+        self._reader, self._writer = await asyncio.open_connection(host, port, limit=MAX_FRAME_BYTES)
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._reader_task = asyncio.create_task(self._read_responses())
+    
+    async def close(self):
+        """关闭远程连接"""
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._reader_task.cancel()
+        await asyncio.gather(self._reader_task, return_exceptions=True)
+        self._writer = None
+    
+    async def request(self, method: str, params: dict = None) -> Any:
+        """发送一个请求并等待结果，错误响应抛出 JSONRPCError"""
+        async with self._slots:
+            req_id = next(self._ids)
+            future = self._expect(req_id)
+            await self._send(JSONRPCMessage.create_request(method, params, req_id=req_id))
+            return await future
+    
+    async def call_remote_tool(self, name: str, arguments: dict) -> Any:
+        """调用远程服务器上的工具"""
+        return await self.request("tools/call", {"name": name, "arguments": arguments})
+    
+    async def batch(self, calls: list, max_batch: int = 50) -> list:
+        """批量请求：calls 为 [(method, params), ...]，按 max_batch 拆成若干批量帧流水线发送
+        
+        返回与 calls 顺序一致的结果列表，出错的请求对应位置为 JSONRPCError 实例
+        """
+        chunks = [calls[i:i + max_batch] for i in range(0, len(calls), max_batch)]
+        results = await asyncio.gather(*(self._send_batch(chunk) for chunk in chunks))
+        return [result for chunk in results for result in chunk]
+    
+    async def _send_batch(self, calls: list) -> list:
+        async with self._slots:
+            ids = [next(self._ids) for _ in calls]
+            futures = [self._expect(req_id) for req_id in ids]
+            await self._send([
+                JSONRPCMessage.create_request(method, params, req_id=req_id)
+                for (method, params), req_id in zip(calls, ids)
+            ])
+            return await asyncio.gather(*futures, return_exceptions=True)
+    
+    def _expect(self, req_id) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        self.stats["requests"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], len(self._pending))
+        return future
+    
+    async def _send(self, message):
+        if self._writer is None:
+            raise ConnectionError("未连接远程服务器")
+        self.stats["frames"] += 1
+        self._writer.write(JSONRPCMessage.encode(message))
+        await self._writer.drain()
+    
+    async def _read_responses(self):
+        """读取响应（单条或批量数组），按 id 唤醒对应的请求"""
+        last_id = 0
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                message = JSONRPCMessage.decode(line)
+                for response in message if isinstance(message, list) else [message]:
+                    req_id = response.get("id")
+                    future = self._pending.pop(req_id, None)
+                    if future is None or future.done():
+                        continue
+                    if isinstance(req_id, int):
+                        if req_id < last_id:
+                            self.stats["out_of_order"] += 1
+                        last_id = max(last_id, req_id)
+                    if "error" in response:
+                        error = response["error"]
+                        future.set_exception(JSONRPCError(error.get("code"), error.get("message")))
+                    else:
+                        future.set_result(response.get("result"))
+        finally:
+            # 连接断开：未完成的请求全部失败
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("连接已关闭"))
+            self._pending.clear()
 
 
 class MCPServer:
@@ -145,6 +260,61 @@ class MCPServer:
         if resource:
             return resource["content"]
         return None
+    
+    def handle_message(self, message):
+        """处理一条 JSON-RPC 消息或批量数组
+        
+        返回单条响应或响应数组；消息全部是通知时返回 None（不发送任何内容）
+        """
+        if isinstance(message, list):
+            if not message:
+                return JSONRPCMessage.create_error(-32600, "Invalid Request: 空的批量请求", req_id=None)
+            responses = [r for r in map(self._handle_single, message) if r is not None]
+            return responses or None
+        return self._handle_single(message)
+    
+    def _handle_single(self, message):
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or "method" not in message:
+            req_id = message.get("id") if isinstance(message, dict) else None
+            return JSONRPCMessage.create_error(-32600, "Invalid Request", req_id=req_id)
+        req_id = message.get("id")
+        params = message.get("params")
+        try:
+            # 本示例的方法都使用按名传参，数组形式的 params 属于无效参数而不是服务器内部错误
+            if params is not None and not isinstance(params, dict):
+                raise JSONRPCError(-32602, "Invalid params: params 必须是对象")
+            result = self._dispatch(message["method"], params or {})
+        except JSONRPCError as e:
+            response = JSONRPCMessage.create_error(e.code, e.message, req_id=req_id)
+        except Exception as e:
+            response = JSONRPCMessage.create_error(-32603, f"Internal error: {e}", req_id=req_id)
+        else:
+            response = JSONRPCMessage.create_response(result, req_id=req_id)
+        # 通知不返回响应
+        return response if "id" in message else None
+    
+    def _dispatch(self, method: str, params: dict):
+        if method == "ping":
+            return {}
+        if method == "tools/list":
+            return {"tools": self.list_tools()}
+        if method == "tools/call":
+            name = params.get("name")
+            if name not in self.tools:
+                raise JSONRPCError(-32602, f"工具不存在: {name}")
+            arguments = params.get("arguments") or {}
+            if not isinstance(arguments, dict):
+                raise JSONRPCError(-32602, "Invalid params: arguments 必须是对象")
+            result = self.execute_tool(name, **arguments)
+            return {"content": [{"type": "text", "text": str(result)}]}
+        if method == "resources/read":
+            content = self.read_resource(params.get("uri"))
+            if content is None:
+                raise JSONRPCError(-32602, f"资源不存在: {params.get('uri')}")
+            return {"contents": [{"uri": params["uri"], "text": content}]}
+        if method.startswith("notifications/"):
+            return None
+        raise JSONRPCError(-32601, f"Method not found: {method}")
 
 
 # 测试MCP架构
@@ -222,15 +392,57 @@ class JSONRPCMessage:
         }
     
     @staticmethod
-    def parse_message(message: dict) -> str:
-        """解析JSON-RPC消息"""
+    def create_notification(method: str, params: dict = None) -> dict:
+        """创建JSON-RPC通知（没有 id，接收方不返回响应）"""
+        notification = {
+            "jsonrpc": "2.0",
+            "method": method
+        }
+        if params:
+            notification["params"] = params
+        return notification
+    
+    @staticmethod
+    def create_batch(calls: list, start_id: int = 1) -> list:
+        """创建批量请求：calls 为 [(method, params), ...]，id 从 start_id 开始依次递增"""
+        return [
+            JSONRPCMessage.create_request(method, params, req_id=start_id + i)
+            for i, (method, params) in enumerate(calls)
+        ]
+    
+    @staticmethod
+    def parse_message(message) -> str:
+        """解析JSON-RPC消息（数组为批量消息）"""
+        if isinstance(message, list):
+            return "batch"
+        if not isinstance(message, dict):
+            return "unknown"
         if "method" in message:
-            return "request"
+            return "request" if "id" in message else "notification"
         elif "error" in message:
             return "error"
         elif "result" in message:
             return "response"
         return "unknown"
+    
+    @staticmethod
+    def encode(message) -> bytes:
+        """分帧：单条消息或批量数组序列化为一行 JSON"""
+        return json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+    
+    @staticmethod
+    def decode(line: bytes):
+        """解析一行 JSON（单条消息为 dict，批量为 list），格式错误时抛出 ValueError"""
+        return json.loads(line)
+
+
+class JSONRPCError(Exception):
+    """JSON-RPC 错误响应"""
+    
+    def __init__(self, code: int, message: str):
+        super().__init__(f"[{code}] {message}")
+        self.code = code
+        self.message = message
 
 
 # 错误代码常量
@@ -288,7 +500,352 @@ def test_jsonrpc_messages():
 # 3. MCP工具定义示例
 # ============================================================
 
-from typing import Any
+class SchemaValidationError(ValueError):
+    """参数不符合 JSON Schema；path 为出错位置（如 $.items[2].name）"""
+    
+    def __init__(self, message: str, path: str = ""):
+        super().__init__(message)
+        self.message = message
+        self.path = path
+    
+    def __str__(self):
+        return f"${self.path}: {self.message}"
+
+
+# JSON Schema 类型 -> Python 类型
+_SCHEMA_TYPES = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "object": (dict,),
+    "array": (list, tuple),
+    "null": (type(None),),
+}
+
+# 除 type 之外会产生校验逻辑的关键字（description、default 等只是说明）
+_CONSTRAINT_KEYWORDS = {
+    "enum", "const", "minLength", "maxLength", "pattern",
+    "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum",
+    "properties", "required", "additionalProperties", "items", "minItems", "maxItems",
+}
+
+_MISSING = object()
+
+
+class _TypeSpec:
+    """编译后的 type 关键字：Python 类型元组 + 是否排除 bool（bool 是 int 的子类）"""
+    
+    __slots__ = ("types", "reject_bool", "expected")
+    
+    def __init__(self, names: list):
+        unknown = [t for t in names if t not in _SCHEMA_TYPES]
+        if unknown:
+            raise ValueError(f"不支持的 schema 类型: {unknown}")
+        self.types = tuple(t for name in names for t in _SCHEMA_TYPES[name])
+        self.reject_bool = "boolean" not in names
+        self.expected = " | ".join(names)
+    
+    def matches(self, value) -> bool:
+        return isinstance(value, self.types) and not (self.reject_bool and value.__class__ is bool)
+    
+    def error(self, value) -> SchemaValidationError:
+        return SchemaValidationError(f"类型错误，需要 {self.expected}，实际为 {type(value).__name__}")
+
+
+def _type_spec(schema: dict):
+    types = schema.get("type") if isinstance(schema, dict) else None
+    if not types:
+        return None
+    return _TypeSpec(types if isinstance(types, list) else [types])
+
+
+def _prefix_path(error: SchemaValidationError, prefix: str) -> SchemaValidationError:
+    # 出错时才拼接路径，校验通过的调用没有额外开销
+    error.path = prefix + error.path
+    return error
+
+
+def _identity(value):
+    return value
+
+
+def compile_schema(schema: dict):
+    """把 JSON Schema 编译为校验函数：validate(value) -> value
+    
+    注册工具时编译一次，之后每次调用只执行预先生成的闭包，不再解释 schema 字典：
+    type 检查合并进对象/数组/字符串/数值各自的闭包，只有 type 的属性在父对象中内联检查。
+    支持 type、enum、const、字符串长度/pattern、数值范围、
+    object（properties / required / additionalProperties / default）和 array（items / 长度）。
+    校验失败抛出 SchemaValidationError；缺省的属性按 default 补全后返回新的字典（不修改传入的参数）
+    """
+    if not schema:
+        return _identity
+    spec = _type_spec(schema)
+    steps = []
+    # 对象/数组/字符串/数值的闭包在 type 恰好是该类型时顺带完成类型检查
+    covered = False
+    kinds = [
+        (("properties", "required", "additionalProperties"), "object", _compile_object),
+        (("items", "minItems", "maxItems"), "array", _compile_array),
+        (("minLength", "maxLength", "pattern"), "string", _compile_string),
+        (("minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum"), None, _compile_number),
+    ]
+    for keywords, kind, compiler in kinds:
+        if any(k in schema for k in keywords):
+            strict = spec is not None and not covered and (
+                schema["type"] == kind if kind else schema["type"] in ("number", "integer"))
+            steps.append(compiler(schema, spec if strict else None))
+            covered = covered or strict
+    if spec is not None and not covered:
+        steps.insert(0, _compile_type(spec))
+    if "enum" in schema:
+        steps.append(_compile_enum(schema["enum"]))
+    if "const" in schema:
+        steps.append(_compile_const(schema["const"]))
+    
+    if not steps:
+        return _identity
+    if len(steps) == 1:
+        return steps[0]
+    if len(steps) == 2:
+        first, second = steps
+        return lambda value: second(first(value))
+    
+    def validate(value):
+        for step in steps:
+            value = step(value)
+        return value
+    return validate
+
+
+def _compile_type(spec: _TypeSpec):
+    types, reject_bool = spec.types, spec.reject_bool
+    
+    def check_type(value):
+        if not isinstance(value, types) or (reject_bool and value.__class__ is bool):
+            raise spec.error(value)
+        return value
+    return check_type
+
+
+def _compile_enum(allowed: list):
+    allowed = list(allowed)
+    
+    def check_enum(value):
+        if value not in allowed:
+            raise SchemaValidationError(f"取值必须是 {allowed} 之一，实际为 {value!r}")
+        return value
+    return check_enum
+
+
+def _compile_const(expected):
+    def check_const(value):
+        if value != expected:
+            raise SchemaValidationError(f"取值必须是 {expected!r}")
+        return value
+    return check_const
+
+
+def _compile_string(schema: dict, strict: _TypeSpec = None):
+    min_length = schema.get("minLength")
+    max_length = schema.get("maxLength")
+    pattern = re.compile(schema["pattern"]) if "pattern" in schema else None
+    
+    def check_string(value):
+        if not isinstance(value, str):
+            if strict is not None:
+                raise strict.error(value)
+            return value
+        if min_length is not None and len(value) < min_length:
+            raise SchemaValidationError(f"长度不能小于 {min_length}")
+        if max_length is not None and len(value) > max_length:
+            raise SchemaValidationError(f"长度不能大于 {max_length}")
+        if pattern is not None and not pattern.search(value):
+            raise SchemaValidationError(f"不匹配模式 {pattern.pattern}")
+        return value
+    return check_string
+
+
+def _compile_number(schema: dict, strict: _TypeSpec = None):
+    minimum = schema.get("minimum")
+    maximum = schema.get("maximum")
+    exclusive_minimum = schema.get("exclusiveMinimum")
+    exclusive_maximum = schema.get("exclusiveMaximum")
+    types = strict.types if strict is not None else (int, float)
+    
+    def check_number(value):
+        if not isinstance(value, types) or value.__class__ is bool:
+            if strict is not None:
+                raise strict.error(value)
+            return value
+        if minimum is not None and value < minimum:
+            raise SchemaValidationError(f"不能小于 {minimum}，实际为 {value}")
+        if maximum is not None and value > maximum:
+            raise SchemaValidationError(f"不能大于 {maximum}，实际为 {value}")
+        if exclusive_minimum is not None and value <= exclusive_minimum:
+            raise SchemaValidationError(f"必须大于 {exclusive_minimum}，实际为 {value}")
+        if exclusive_maximum is not None and value >= exclusive_maximum:
+            raise SchemaValidationError(f"必须小于 {exclusive_maximum}，实际为 {value}")
+        return value
+    return check_number
+
+
+def _compile_object(schema: dict, strict: _TypeSpec = None):
+    properties = schema.get("properties") or {}
+    # 每个属性：(名称, 校验函数或 None, 内联类型检查, 默认值, 默认值是否可变)
+    fields = []
+    for name, sub in properties.items():
+        sub = sub if isinstance(sub, dict) else {}
+        spec = _type_spec(sub)
+        if _CONSTRAINT_KEYWORDS.isdisjoint(sub):
+            # 只有 type（或什么都没有）：在父对象中直接检查，省去一次函数调用
+            validate = None
+        else:
+            validate, spec = compile_schema(sub), None
+        default = sub.get("default", _MISSING)
+        # 可变的默认值每次复制，避免不同调用共享同一个列表/字典
+        fields.append((name, validate, spec, default, isinstance(default, (list, dict))))
+    required = tuple(schema.get("required") or ())
+    additional = schema.get("additionalProperties", True)
+    known = frozenset(properties)
+    check_extra = additional is not True
+    extra_validator = compile_schema(additional) if isinstance(additional, dict) else None
+    
+    def check_object(value):
+        if not isinstance(value, dict):
+            if strict is not None:
+                raise strict.error(value)
+            return value
+        for name in required:
+            if name not in value:
+                raise SchemaValidationError("缺少必需参数", f".{name}")
+        result = value
+        for name, validate, spec, default, mutable in fields:
+            if name in value:
+                item = value[name]
+                if validate is None:
+                    if spec is not None and not spec.matches(item):
+                        raise _prefix_path(spec.error(item), f".{name}")
+                    continue
+                try:
+                    checked = validate(item)
+                except SchemaValidationError as e:
+                    raise _prefix_path(e, f".{name}")
+                if checked is not item:
+                    if result is value:
+                        result = dict(value)
+                    result[name] = checked
+            elif default is not _MISSING:
+                if result is value:
+                    result = dict(value)
+                result[name] = copy.deepcopy(default) if mutable else default
+        if check_extra:
+            for name in value:
+                if name in known:
+                    continue
+                if extra_validator is None:
+                    raise SchemaValidationError("不允许的参数", f".{name}")
+                try:
+                    extra_validator(value[name])
+                except SchemaValidationError as e:
+                    raise _prefix_path(e, f".{name}")
+        return result
+    return check_object
+
+
+def _compile_array(schema: dict, strict: _TypeSpec = None):
+    items = schema.get("items")
+    validate_item = compile_schema(items) if isinstance(items, dict) else None
+    min_items = schema.get("minItems")
+    max_items = schema.get("maxItems")
+    
+    def check_array(value):
+        if not isinstance(value, (list, tuple)):
+            if strict is not None:
+                raise strict.error(value)
+            return value
+        if min_items is not None and len(value) < min_items:
+            raise SchemaValidationError(f"元素个数不能少于 {min_items}")
+        if max_items is not None and len(value) > max_items:
+            raise SchemaValidationError(f"元素个数不能多于 {max_items}")
+        if validate_item is None:
+            return value
+        result = value
+        for i, item in enumerate(value):
+            try:
+                checked = validate_item(item)
+            except SchemaValidationError as e:
+                raise _prefix_path(e, f"[{i}]")
+            if checked is not item:
+                if result is value:
+                    result = list(value)
+                result[i] = checked
+        return result
+    return check_array
+
+
+def interpret_schema(schema: dict, value, path: str = ""):
+    """逐次解释 schema 字典的完整校验（与 compile_schema 支持相同的关键字），用于基准对比"""
+    if not schema:
+        return value
+    types = schema.get("type")
+    if types:
+        names = types if isinstance(types, list) else [types]
+        matched = False
+        for name in names:
+            if name not in _SCHEMA_TYPES:
+                raise ValueError(f"不支持的 schema 类型: {name}")
+            if isinstance(value, _SCHEMA_TYPES[name]) and (name == "boolean" or value.__class__ is not bool):
+                matched = True
+        if not matched:
+            raise SchemaValidationError(f"类型错误，需要 {' | '.join(names)}，实际为 {type(value).__name__}", path)
+    if "enum" in schema and value not in schema["enum"]:
+        raise SchemaValidationError(f"取值必须是 {list(schema['enum'])} 之一，实际为 {value!r}", path)
+    if "const" in schema and value != schema["const"]:
+        raise SchemaValidationError(f"取值必须是 {schema['const']!r}", path)
+    if isinstance(value, str):
+        if "minLength" in schema and len(value) < schema["minLength"]:
+            raise SchemaValidationError(f"长度不能小于 {schema['minLength']}", path)
+        if "maxLength" in schema and len(value) > schema["maxLength"]:
+            raise SchemaValidationError(f"长度不能大于 {schema['maxLength']}", path)
+        if "pattern" in schema and not re.search(schema["pattern"], value):
+            raise SchemaValidationError(f"不匹配模式 {schema['pattern']}", path)
+    if isinstance(value, (int, float)) and value.__class__ is not bool:
+        if "minimum" in schema and value < schema["minimum"]:
+            raise SchemaValidationError(f"不能小于 {schema['minimum']}，实际为 {value}", path)
+        if "maximum" in schema and value > schema["maximum"]:
+            raise SchemaValidationError(f"不能大于 {schema['maximum']}，实际为 {value}", path)
+        if "exclusiveMinimum" in schema and value <= schema["exclusiveMinimum"]:
+            raise SchemaValidationError(f"必须大于 {schema['exclusiveMinimum']}，实际为 {value}", path)
+        if "exclusiveMaximum" in schema and value >= schema["exclusiveMaximum"]:
+            raise SchemaValidationError(f"必须小于 {schema['exclusiveMaximum']}，实际为 {value}", path)
+    if isinstance(value, dict):
+        for name in schema.get("required", ()):
+            if name not in value:
+                raise SchemaValidationError("缺少必需参数", f"{path}.{name}")
+        properties = schema.get("properties", {})
+        result = dict(value)
+        for name, sub in properties.items():
+            if name in value:
+                result[name] = interpret_schema(sub, value[name], f"{path}.{name}")
+            elif "default" in sub:
+                result[name] = copy.deepcopy(sub["default"])
+        additional = schema.get("additionalProperties", True)
+        for name in value:
+            if name not in properties and additional is not True:
+                if additional is False:
+                    raise SchemaValidationError("不允许的参数", f"{path}.{name}")
+                interpret_schema(additional, value[name], f"{path}.{name}")
+        value = result
+    if isinstance(value, (list, tuple)):
+        if "minItems" in schema and len(value) < schema["minItems"]:
+            raise SchemaValidationError(f"元素个数不能少于 {schema['minItems']}", path)
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            raise SchemaValidationError(f"元素个数不能多于 {schema['maxItems']}", path)
+        if isinstance(schema.get("items"), dict):
+            value = [interpret_schema(schema["items"], item, f"{path}[{i}]") for i, item in enumerate(value)]
+    return value
 
 
 class ToolDefinition:
@@ -298,6 +855,8 @@ class ToolDefinition:
         self.name = name
         self.description = description
         self.input_schema = input_schema
+        # 定义工具时编译一次，调用时直接执行校验函数
+        self._validator = compile_schema(input_schema)
     
     def to_dict(self) -> dict:
         """转换为MCP工具格式"""
@@ -317,7 +876,19 @@ class ToolDefinition:
         )
     
     def validate_params(self, params: dict) -> tuple[bool, str]:
-        """验证参数"""
+        """验证参数（使用编译好的校验函数）"""
+        try:
+            self._validator(params)
+        except SchemaValidationError as e:
+            return False, str(e)
+        return True, "参数有效"
+    
+    def apply_schema(self, params: dict) -> dict:
+        """校验参数并补全默认值，返回新的参数字典；不合法时抛出 SchemaValidationError"""
+        return self._validator(params)
+    
+    def validate_params_interpreted(self, params: dict) -> tuple[bool, str]:
+        """逐次解释 input_schema 的校验方式（只检查顶层的必需参数和类型），用于基准对比"""
         required = self.input_schema.get("required", [])
         for param in required:
             if param not in params:
@@ -371,10 +942,8 @@ class ToolRegistry:
         if not tool:
             raise ValueError(f"工具不存在: {name}")
         
-        # 验证参数
-        valid, message = tool.validate_params(params)
-        if not valid:
-            raise ValueError(message)
+        # 验证参数并补全默认值（SchemaValidationError 是 ValueError 的子类）
+        params = tool.apply_schema(params)
         
         # 执行处理函数
         handler = self.handlers.get(name)
@@ -442,6 +1011,83 @@ def test_tool_system():
     
     # 列出工具
     print(f"\n已注册工具: {registry.list_tools()}")
+    
+    # 编译后的校验：嵌套对象、数组、枚举、默认值和出错路径
+    order_tool = ToolDefinition("create_order", "创建订单", ORDER_SCHEMA)
+    print(f"\n补全默认值: {order_tool.apply_schema({'customer': {'name': '张三'}, 'items': [{'sku': 'A1'}]})}")
+    for params in (
+        {"customer": {"name": "张三"}, "items": [{"sku": "A1", "quantity": 2}, {"sku": "B2", "quantity": 0}]},
+        {"customer": {"name": "张三", "level": "svip"}, "items": [{"sku": "A1"}]},
+        {"customer": {}, "items": [{"sku": "A1"}]},
+        {"customer": {"name": "张三"}, "items": [{"sku": "A1", "quantity": True}]},
+    ):
+        print(f"  {order_tool.validate_params(params)[1]}")
+    
+    run_validation_benchmark(20000)
+
+
+# 嵌套 schema 示例（基准测试也使用）
+ORDER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "customer": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "minLength": 1},
+                "level": {"type": "string", "enum": ["normal", "vip"], "default": "normal"}
+            },
+            "required": ["name"]
+        },
+        "items": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "sku": {"type": "string", "pattern": "^[A-Z][0-9]+$"},
+                    "quantity": {"type": "integer", "minimum": 1, "default": 1}
+                },
+                "required": ["sku"],
+                "additionalProperties": False
+            }
+        },
+        "note": {"type": "string", "maxLength": 200}
+    },
+    "required": ["customer", "items"]
+}
+
+
+def run_validation_benchmark(n: int = 200000):
+    """对比编译后的校验函数与逐次解释 schema 的校验（每次调用的平均耗时）"""
+    bmi_tool = ToolDefinition("calculate_bmi", "计算BMI", {
+        "type": "object",
+        "properties": {
+            "height_cm": {"type": "number", "description": "身高（厘米）"},
+            "weight_kg": {"type": "number", "description": "体重（公斤）"}
+        },
+        "required": ["height_cm", "weight_kg"]
+    })
+    order_tool = ToolDefinition("create_order", "创建订单", ORDER_SCHEMA)
+    cases = [
+        ("BMI（平铺）", bmi_tool, {"height_cm": 175, "weight_kg": 70}),
+        ("订单（嵌套）", order_tool, {"customer": {"name": "张三", "level": "vip"},
+                                "items": [{"sku": f"A{i}", "quantity": 2} for i in range(5)]}),
+    ]
+    
+    def per_call_ns(func, params) -> float:
+        started = time.perf_counter()
+        for _ in range(n):
+            func(params)
+        return (time.perf_counter() - started) / n * 1e9
+    
+    print(f"\n参数校验基准（{n} 次，每次调用平均耗时）:")
+    for label, tool, params in cases:
+        top_level = per_call_ns(tool.validate_params_interpreted, params)
+        interpreted = per_call_ns(lambda value: interpret_schema(tool.input_schema, value), params)
+        compiled = per_call_ns(tool._validator, params)
+        print(f"  {label}: 原实现（只检查顶层） {top_level:.0f} ns | "
+              f"解释执行（完整） {interpreted:.0f} ns | 编译后（完整） {compiled:.0f} ns"
+              f" | 加速 {interpreted / compiled:.1f}x")
 
 
 # ============================================================
@@ -767,12 +1413,160 @@ def test_full_session():
     print(f"\n计算结果: {result}")
 
 
+# ============================================================
+# 7. 批量请求与流水线
+# ============================================================
+
+# 单帧（一条消息或一个批量数组）的最大字节数
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+
+class LocalJSONRPCServer:
+    """本地 TCP JSON-RPC 服务器：每行一帧（单条消息或批量数组），交给 MCPServer.handle_message 处理
+    
+    latency 模拟网络往返：每帧处理前等待 latency 秒（jitter 为随机浮动比例）；
+    各帧并发处理，流水线发送的多个请求的延迟可以互相重叠，响应也可能乱序返回
+    """
+    
+    def __init__(self, server: MCPServer, latency: float = 0.0, jitter: float = 0.0):
+        self.server = server
+        self.latency = latency
+        self.jitter = jitter
+        self.frames = 0
+        self._tcp_server = None
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> tuple:
+        """开始监听，返回 (host, port)"""
+        self._tcp_server = await asyncio.start_server(self._handle, host, port, limit=MAX_FRAME_BYTES)
+        return self._tcp_server.sockets[0].getsockname()[:2]
+    
+    async def close(self):
+        self._tcp_server.close()
+        await self._tcp_server.wait_closed()
+    
+    async def _handle(self, reader, writer):
+        write_lock = asyncio.Lock()
+        tasks = set()
+        
+        async def process(line: bytes):
+            if self.latency:
+                await asyncio.sleep(self.latency * (1 + random.uniform(-self.jitter, self.jitter)))
+            try:
+                response = self.server.handle_message(JSONRPCMessage.decode(line))
+            except ValueError as e:
+                response = JSONRPCMessage.create_error(-32700, f"Parse error: {e}", req_id=None)
+            if response is not None:
+                async with write_lock:
+                    writer.write(JSONRPCMessage.encode(response))
+                    await writer.drain()
+        
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    self.frames += 1
+                    task = asyncio.create_task(process(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def _create_bench_server() -> MCPServer:
+    server = MCPServer("BenchServer")
+    server.register_tool("add", "两数相加", lambda a, b: a + b)
+    return server
+
+
+async def _run_mode(address: tuple, calls: list, mode: str, max_in_flight: int = 1, batch_size: int = 1) -> dict:
+    client = MCPClient(f"bench-{mode}")
+    await client.open(*address, max_in_flight=max_in_flight)
+    started = time.perf_counter()
+    if mode == "sequential":
+        results = [await client.request(method, params) for method, params in calls]
+    elif mode == "pipelined":
+        results = await asyncio.gather(*(client.request(method, params) for method, params in calls))
+    else:
+        results = await client.batch(calls, max_batch=batch_size)
+    elapsed = time.perf_counter() - started
+    await client.close()
+    assert [r["content"][0]["text"] for r in results] == [str(i + 1) for i in range(len(calls))]
+    return {"seconds": elapsed, **client.stats}
+
+
+async def _pipelining_benchmark(n: int, latency: float, in_flight_limits=(8, 64), batch_sizes=(10, 50)) -> list:
+    server = LocalJSONRPCServer(_create_bench_server(), latency=latency, jitter=0.5)
+    address = await server.start()
+    calls = [("tools/call", {"name": "add", "arguments": {"a": i, "b": 1}}) for i in range(n)]
+    
+    modes = [("顺序（逐个等待响应）", "sequential", 1, 1)]
+    modes += [(f"流水线 in_flight={k}", "pipelined", k, 1) for k in in_flight_limits]
+    modes += [(f"批量 size={b}（逐批等待）", "batch", 1, b) for b in batch_sizes]
+    modes += [(f"批量 size={batch_sizes[0]} + 流水线 in_flight={in_flight_limits[0]}",
+               "batch", in_flight_limits[0], batch_sizes[0])]
+    rows = []
+    for label, mode, max_in_flight, batch_size in modes:
+        rows.append((label, await _run_mode(address, calls, mode, max_in_flight, batch_size)))
+    await server.close()
+    return rows
+
+
+def run_pipelining_benchmark(n: int = 200, latency_ms: float = 2.0):
+    """对比顺序请求、流水线和批量请求（本地服务器，模拟 latency_ms 毫秒的往返延迟）"""
+    # 基准测试不需要客户端/服务器创建时的提示信息
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = asyncio.run(_pipelining_benchmark(n, latency_ms / 1000))
+    
+    baseline = rows[0][1]["seconds"]
+    print(f"\n{n} 次工具调用，模拟往返延迟 {latency_ms} ms:")
+    print(f"{'总耗时':>9} {'每次':>8} {'节省':>5} {'帧数':>5} {'最大在途':>6} {'乱序':>5}  方式")
+    for label, r in rows:
+        print(f"{r['seconds'] * 1000:>9.1f}ms {r['seconds'] / n * 1000:>6.2f}ms "
+              f"{(1 - r['seconds'] / baseline) * 100:>6.0f}% {r['frames']:>7} {r['max_in_flight']:>10} "
+              f"{r['out_of_order']:>7}  {label}")
+
+
+def test_batch_and_pipelining():
+    """测试批量请求与流水线"""
+    print("\n" + "=" * 50)
+    print("测试7: 批量请求与流水线")
+    print("=" * 50)
+    
+    # 批量消息的构造与服务端处理
+    server = _create_bench_server()
+    batch = JSONRPCMessage.create_batch([
+        ("tools/call", {"name": "add", "arguments": {"a": 1, "b": 2}}),
+        ("tools/call", {"name": "missing", "arguments": {}}),
+        ("ping", None),
+    ])
+    batch.append(JSONRPCMessage.create_notification("notifications/initialized"))
+    print(f"\n消息类型: {JSONRPCMessage.parse_message(batch)}, "
+          f"{[JSONRPCMessage.parse_message(m) for m in batch]}")
+    print("批量响应:")
+    for response in server.handle_message(batch):
+        print(f"  {json.dumps(response, ensure_ascii=False)}")
+    print(f"空批量: {server.handle_message([])}")
+    print(f"只有通知的批量: {server.handle_message([JSONRPCMessage.create_notification('notifications/initialized')])}")
+    
+    run_pipelining_benchmark(n=100, latency_ms=2.0)
+
+
 # ============================================================
 # 主函数
 # ============================================================
 
 if __name__ == "__main__":
-    from typing import Any
+    if len(sys.argv) > 1 and sys.argv[1] == "bench-schema":
+        # python example.py bench-schema [次数]
+        run_validation_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        # python example.py bench [调用次数] [往返延迟毫秒]
+        args = sys.argv[2:]
+        run_pipelining_benchmark(int(args[0]) if args else 200, float(args[1]) if len(args) > 1 else 2.0)
+        sys.exit(0)
     
     print("=" * 60)
     print("MCP (Model Context Protocol) 协议示例")
@@ -785,6 +1579,7 @@ if __name__ == "__main__":
     test_resource_system()
     test_prompt_system()
     test_full_session()
+    test_batch_and_pipelining()
     
     print("\n" + "=" * 60)
     print("所有测试完成!")
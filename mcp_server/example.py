@@ -6,9 +6,26 @@ MCP Server示例代码
 """
 
 import asyncio
+import base64
+import codecs
+import copy
+import fnmatch
+import functools
+import importlib.util
+import inspect
+import io
 import json
+import mmap
 import os
+import re
 import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext, redirect_stdout
 from typing import Any
 
 # ============================================================
@@ -22,6 +39,17 @@ from typing import Any
 # 实际使用时需要安装官方SDK
 
 
+# 参数校验使用 JSON Schema 编译器（compile_schema / SchemaValidationError），
+# 实现见 mcp_protocol/example.py 第 3 节，这里直接复用
+_PROTOCOL_EXAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp_protocol", "example.py")
+_spec = importlib.util.spec_from_file_location("mcp_protocol_example", _PROTOCOL_EXAMPLE)
+_protocol = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = _protocol
+_spec.loader.exec_module(_protocol)
+SchemaValidationError = _protocol.SchemaValidationError
+compile_schema = _protocol.compile_schema
+
+
 class BasicMCPServer:
     """基础MCP服务器框架"""
     
@@ -32,13 +60,22 @@ class BasicMCPServer:
         self.prompts = {}
         print(f"🖥️  MCP服务器 '{name}' 已创建")
     
-    def register_tool(self, name: str, description: str, handler, input_schema: dict):
-        """注册工具"""
+    def register_tool(self, name: str, description: str, handler, input_schema: dict,
+                      timeout: float = None, on_cancel=None):
+        """注册工具（handler 可以是普通函数或 async 函数；timeout 为单次调用超时秒数）
+        
+        on_cancel(thread_id)：同步 handler 超时或被取消时由传输层调用，用于中断仍在
+        线程池中执行的调用（例如中断该线程上的 SQLite 查询），释放工作线程
+        """
         self.tools[name] = {
             "name": name,
             "description": description,
             "handler": handler,
-            "inputSchema": input_schema
+            "inputSchema": input_schema,
+            # 注册时把 schema 编译为校验函数，每次调用不再解释 schema
+            "validator": compile_schema(input_schema),
+            "timeout": timeout,
+            "on_cancel": on_cancel
         }
         print(f"🔧 注册工具: {name} - {description}")
     
@@ -90,8 +127,9 @@ class BasicMCPServer:
     def call_tool(self, name: str, arguments: dict) -> Any:
         """调用工具"""
         if name in self.tools:
-            handler = self.tools[name]["handler"]
-            return handler(**arguments)
+            tool = self.tools[name]
+            arguments = tool["validator"](arguments)
+            return tool["handler"](**arguments)
         raise ValueError(f"未知工具: {name}")
     
     def read_resource(self, uri: str) -> str:
@@ -229,11 +267,201 @@ def create_basic_server():
 # 2. 文件系统MCP Server
 # ============================================================
 
+# read_file 单次响应的默认上限（超过时截断，并在结果中给出续读位置）
+MAX_READ_BYTES = 1024 * 1024
+# 流式读取的默认分块大小（3 的倍数，base64 分块可以直接拼接）
+READ_CHUNK_BYTES = 63 * 1024
+# 不小于该大小的文件用 mmap 读取：只有被访问的页会读入，不把整个文件复制到 Python 内存
+MMAP_THRESHOLD = 1024 * 1024
+# 行号索引的间隔：每隔这么多行记录一次字节偏移，按行读取时从最近的记录点开始扫描
+LINE_INDEX_STEP = 1000
+# 判断是否为二进制文件时检查的开头字节数
+BINARY_SNIFF_BYTES = 8192
+# grep_files 的默认工作线程数、默认最多返回的匹配数、每行匹配文本的最大长度
+GREP_WORKERS = min(8, os.cpu_count() or 1)
+GREP_MAX_MATCHES = 100
+GREP_LINE_CHARS = 200
+# 文件索引不进入的目录（版本库元数据、字节码缓存）
+INDEX_IGNORED_DIRS = frozenset({".git", ".hg", ".svn", "__pycache__"})
+
+
+def _open_buffer(f, size: int):
+    """文件内容的只读缓冲区（支持切片、find、count），用作上下文管理器"""
+    if size < MMAP_THRESHOLD:
+        return nullcontext(f.read())
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _looks_binary(sample: bytes, encoding: str) -> bool:
+    """含 NUL 字节，或（UTF-8 时）无法解码的内容视为二进制"""
+    if b"\0" in sample:
+        return True
+    if codecs.lookup(encoding).name != "utf-8":
+        return False
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # 采样末尾被截断的多字节字符不算
+        return e.start < len(sample) - 3
+    return False
+
+
+def _char_start(buf, pos: int, size: int, forward: bool) -> int:
+    """把位置移到 UTF-8 字符的起始字节（跳过续字节），避免切断多字节字符"""
+    step = 1 if forward else -1
+    while 0 < pos < size and buf[pos] & 0xC0 == 0x80:
+        pos += step
+    return pos
+
+
+@functools.lru_cache(maxsize=256)
+def _glob_regex(pattern: str):
+    """glob 模式编译为正则（按模式缓存）"""
+    return re.compile(fnmatch.translate(os.path.normcase(pattern)))
+
+
+class FileIndex:
+    """root_dir 下所有文件的内存索引：相对路径、大小、修改时间、扩展名
+    
+    refresh() 增量更新：逐个 stat 目录，只重新列出 mtime 变化的目录
+    （新增、删除、重命名文件都会改变所在目录的 mtime），不变的目录直接复用上次的结果。
+    原地改写文件内容不会改变目录 mtime，这类文件的大小和修改时间在目录下次被重新列出时更新；
+    通过本服务器写入的文件由 mark_dirty() 标记所在目录
+    查询（glob / 子串 / 扩展名）只扫描内存中的快照，不访问文件系统
+    """
+    
+    def __init__(self, root: str, min_interval: float = 1.0):
+        self.root = root
+        # 两次自动刷新的最小间隔（秒），连续查询不重复 stat 目录
+        self.min_interval = min_interval
+        # 相对目录 -> (mtime_ns, 子目录列表, 文件名列表)；mtime_ns 为 None 表示需要重新列出
+        self._dirs = {}
+        # 相对路径 -> (相对路径, 大小, 修改时间, 扩展名, 小写路径, 规范化的路径, 规范化的文件名)
+        self._files = {}
+        self._entries = ()
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+        self.stats = {"refreshes": 0, "rescanned_dirs": 0}
+    
+    def refresh(self, force: bool = False):
+        """增量刷新索引（距上次刷新不足 min_interval 秒时跳过，除非 force）"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._refreshed_at is not None and now - self._refreshed_at < self.min_interval:
+                return
+            changed = False
+            seen = set()
+            stack = [""]
+            while stack:
+                rel = stack.pop()
+                full = os.path.join(self.root, rel) if rel else self.root
+                try:
+                    mtime = os.stat(full).st_mtime_ns
+                except OSError:
+                    continue
+                seen.add(rel)
+                cached = self._dirs.get(rel)
+                if cached is None or cached[0] != mtime:
+                    cached = self._scan_dir(rel, full, mtime)
+                    changed = True
+                stack.extend(cached[1])
+            for rel in set(self._dirs) - seen:
+                self._drop_dir(rel)
+                changed = True
+            if changed:
+                self._entries = tuple(sorted(self._files.values()))
+            self._refreshed_at = time.monotonic()
+            self.stats["refreshes"] += 1
+    
+    def mark_dirty(self, full_dir: str):
+        """标记目录需要在下次刷新时重新列出（并立即允许刷新）"""
+        rel = os.path.relpath(full_dir, self.root)
+        rel = "" if rel == "." else rel
+        with self._lock:
+            if rel in self._dirs:
+                self._dirs[rel] = (None,) + self._dirs[rel][1:]
+            self._refreshed_at = None
+    
+    def query(self, pattern: str = None, substring: str = None, extension: str = None) -> list:
+        """按 glob（含 / 时匹配相对路径，否则匹配文件名）、子串（不区分大小写）、扩展名筛选，
+        返回 [{path, size, mtime, ext}]（按路径排序）"""
+        self.refresh()
+        regex = suffix = None
+        match_path = bool(pattern) and "/" in pattern
+        if pattern and pattern != "*":
+            if pattern.startswith("*") and not any(c in pattern[1:] for c in "*?[/"):
+                # 最常见的 *.py 形式直接比较后缀
+                suffix = os.path.normcase(pattern[1:])
+            else:
+                regex = _glob_regex(pattern)
+        needle = substring.lower() if substring else None
+        if extension:
+            extension = extension.lower() if extension.startswith(".") else "." + extension.lower()
+        results = []
+        for path, size, mtime, ext, lower, path_key, name_key in self._entries:
+            if extension and ext != extension:
+                continue
+            if needle and needle not in lower:
+                continue
+            if suffix is not None and not name_key.endswith(suffix):
+                continue
+            if regex is not None and not regex.match(path_key if match_path else name_key):
+                continue
+            results.append({"path": path, "size": size, "mtime": mtime, "ext": ext})
+        return results
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def _scan_dir(self, rel: str, full: str, mtime: int) -> tuple:
+        """重新列出一个目录，更新其中的文件记录"""
+        self.stats["rescanned_dirs"] += 1
+        old = self._dirs.get(rel)
+        if old is not None:
+            for name in old[2]:
+                self._files.pop(os.path.join(rel, name), None)
+        subdirs, names = [], []
+        try:
+            with os.scandir(full) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in INDEX_IGNORED_DIRS:
+                                subdirs.append(os.path.join(rel, entry.name))
+                            continue
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    path = os.path.join(rel, entry.name)
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    self._files[path] = (path, st.st_size, st.st_mtime, ext, path.lower(),
+                                         os.path.normcase(path), os.path.normcase(entry.name))
+                    names.append(entry.name)
+        except OSError:
+            pass
+        # 不再存在的子目录在 refresh 结束时统一清理
+        self._dirs[rel] = (mtime, subdirs, names)
+        return self._dirs[rel]
+    
+    def _drop_dir(self, rel: str):
+        _mtime, _subdirs, names = self._dirs.pop(rel)
+        for name in names:
+            self._files.pop(os.path.join(rel, name), None)
+
+
 class FilesystemMCPServer:
     """文件系统MCP服务器"""
     
-    def __init__(self, root_dir: str = "."):
+    def __init__(self, root_dir: str = ".", max_read_bytes: int = MAX_READ_BYTES):
         self.root_dir = os.path.abspath(root_dir)
+        self.max_read_bytes = max_read_bytes
+        # 行号索引：文件路径 -> ((大小, 修改时间), [每 LINE_INDEX_STEP 行的起始偏移])
+        self._line_index = {}
+        self._line_index_lock = threading.Lock()
+        # 文件索引在第一次搜索时建立
+        self.index = FileIndex(self.root_dir)
         self.server = BasicMCPServer("FilesystemServer")
         self._register_tools()
         print(f"📁 根目录: {self.root_dir}")
@@ -241,21 +469,33 @@ class FilesystemMCPServer:
     def _register_tools(self):
         """注册文件系统工具"""
         
-        def read_file_handler(path: str, encoding: str = "utf-8") -> str:
-            """读取文件"""
+        def read_file_handler(path: str, encoding: str = "utf-8", offset: int = 0, length: int = None,
+                              start_line: int = None, end_line: int = None, max_bytes: int = None,
+                              stream: bool = False, chunk_bytes: int = READ_CHUNK_BYTES):
+            """读取文件（按范围读取，不把整个文件读入内存）
+            
+            offset/length 为字节范围，start_line/end_line 为行范围（从 1 开始，包含 end_line）；
+            stream=True 时返回分块迭代器，由传输层逐块发送。
+            出错时抛出异常，由传输层作为 isError 结果返回（成功时总是返回字典）
+            """
             full_path = os.path.join(self.root_dir, path)
             
             if not os.path.exists(full_path):
-                return f"错误: 文件不存在 - {path}"
+                raise FileNotFoundError(f"文件不存在 - {path}")
             
             if not os.path.isfile(full_path):
-                return f"错误: 不是文件 - {path}"
+                raise ValueError(f"不是文件 - {path}")
             
-            try:
-                with open(full_path, 'r', encoding=encoding) as f:
-                    return f.read()
-            except Exception as e:
-                return f"读取错误: {str(e)}"
+            if start_line is not None and offset:
+                raise ValueError("offset 与 start_line 不能同时使用")
+            
+            if start_line is not None and end_line is not None and end_line < start_line:
+                # 流式读取的生成器要到第一次迭代才执行，这里提前报错
+                raise ValueError(f"end_line（{end_line}）不能小于 start_line（{start_line}）")
+            
+            if stream:
+                return self.stream_range(path, encoding, offset, length, start_line, end_line, chunk_bytes)
+            return self.read_range(path, encoding, offset, length, start_line, end_line, max_bytes)
         
         def write_file_handler(path: str, content: str, encoding: str = "utf-8") -> str:
             """写入文件"""
@@ -265,6 +505,8 @@ class FilesystemMCPServer:
                 os.makedirs(os.path.dirname(full_path), exist_ok=True)
                 with open(full_path, 'w', encoding=encoding) as f:
                     f.write(content)
+                # 覆盖已有文件不会改变目录 mtime，主动让索引重新列出该目录
+                self.index.mark_dirty(os.path.dirname(full_path))
                 return f"成功写入文件: {path}"
             except Exception as e:
                 return f"写入错误: {str(e)}"
@@ -313,42 +555,66 @@ class FilesystemMCPServer:
             except Exception as e:
                 return f"错误: {str(e)}"
         
-        def search_files_handler(pattern: str) -> str:
-            """搜索文件"""
-            import fnmatch
-            
-            matches = []
-            for root, dirs, files in os.walk(self.root_dir):
-                for name in files:
-                    if fnmatch.fnmatch(name, pattern):
-                        rel_path = os.path.relpath(
-                            os.path.join(root, name),
-                            self.root_dir
-                        )
-                        matches.append(rel_path)
+        def search_files_handler(pattern: str = "*", substring: str = None, extension: str = None,
+                                 limit: int = 20) -> str:
+            """搜索文件（查询内存中的文件索引，不遍历目录树）"""
+            matches = self.index.query(pattern, substring, extension)
+            conditions = [f"'{pattern}'"]
+            if substring:
+                conditions.append(f"包含 '{substring}'")
+            if extension:
+                conditions.append(f"扩展名 {extension}")
+            conditions = "、".join(conditions)
             
             if not matches:
-                return f"未找到匹配 '{pattern}' 的文件"
+                return f"未找到匹配 {conditions} 的文件"
+            
+            result = f"找到 {len(matches)} 个匹配 {conditions} 的文件:\n"
+            for match in matches[:limit]:  # 限制显示数量
+                result += f"  - {match['path']} ({match['size']} bytes)\n"
             
-            result = f"找到 {len(matches)} 个匹配 '{pattern}' 的文件:\n"
-            for match in matches[:20]:  # 限制显示数量
-                result += f"  - {match}\n"
+            if len(matches) > limit:
+                result += f"  ... 还有 {len(matches) - limit} 个文件\n"
             
-            if len(matches) > 20:
-                result += f"  ... 还有 {len(matches) - 20} 个文件\n"
+            return result
+        
+        def grep_files_handler(query: str, glob: str = None, regex: bool = False, ignore_case: bool = False,
+                               max_matches: int = GREP_MAX_MATCHES) -> str:
+            """搜索文件内容"""
+            try:
+                found = self.grep(query, glob, regex, ignore_case, max_matches)
+            except re.error as e:
+                return f"错误: 无效的正则表达式 - {e}"
             
+            summary = f"扫描 {found['files_scanned']} 个文件，跳过 {found['binary_skipped']} 个二进制文件"
+            if found["truncated"]:
+                summary += f"，已达到 {max_matches} 处上限"
+            if not found["matches"]:
+                return f"未找到 '{query}'（{summary}）"
+            
+            result = f"找到 {len(found['matches'])} 处 '{query}'（{summary}）:\n"
+            for match in found["matches"]:
+                result += f"  {match['path']}:{match['line']}: {match['text']}\n"
             return result
         
         # 注册工具
         self.server.register_tool(
             "read_file",
-            "读取文本文件内容",
+            "读取文件内容（支持字节/行范围和流式分块，超过上限时截断并给出续读位置，二进制文件返回 base64）",
             read_file_handler,
             {
                 "type": "object",
                 "properties": {
                     "path": {"type": "string", "description": "文件路径"},
-                    "encoding": {"type": "string", "description": "编码", "default": "utf-8"}
+                    "encoding": {"type": "string", "description": "编码（base64 表示按二进制读取）",
+                                 "default": "utf-8"},
+                    "offset": {"type": "integer", "minimum": 0, "description": "起始字节偏移", "default": 0},
+                    "length": {"type": "integer", "minimum": 0, "description": "读取的字节数（默认到文件末尾）"},
+                    "start_line": {"type": "integer", "minimum": 1, "description": "起始行号（从 1 开始）"},
+                    "end_line": {"type": "integer", "minimum": 1, "description": "结束行号（包含）"},
+                    "max_bytes": {"type": "integer", "minimum": 1, "description": "本次最多返回的字节数"},
+                    "stream": {"type": "boolean", "description": "分块流式返回", "default": False},
+                    "chunk_bytes": {"type": "integer", "minimum": 1024, "description": "流式分块大小（字节）"}
                 },
                 "required": ["path"]
             }
@@ -401,9 +667,30 @@ class FilesystemMCPServer:
             {
                 "type": "object",
                 "properties": {
-                    "pattern": {"type": "string", "description": "搜索模式（如 *.py）"}
+                    "pattern": {"type": "string", "description": "glob 模式（如 *.py；含 / 时匹配相对路径）",
+                                "default": "*"},
+                    "substring": {"type": "string", "description": "路径中包含的文本（不区分大小写）"},
+                    "extension": {"type": "string", "description": "扩展名（如 .py）"},
+                    "limit": {"type": "integer", "minimum": 1, "description": "最多显示的文件数", "default": 20}
+                }
+            }
+        )
+        
+        self.server.register_tool(
+            "grep_files",
+            "搜索文件内容（并行扫描，达到匹配上限后提前结束，跳过二进制文件）",
+            grep_files_handler,
+            {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "minLength": 1, "description": "要查找的文本或正则表达式"},
+                    "glob": {"type": "string", "description": "只搜索匹配该 glob 的文件（如 *.py）"},
+                    "regex": {"type": "boolean", "description": "query 是否为正则表达式", "default": False},
+                    "ignore_case": {"type": "boolean", "description": "不区分大小写", "default": False},
+                    "max_matches": {"type": "integer", "minimum": 1, "description": "最多返回的匹配数",
+                                    "default": GREP_MAX_MATCHES}
                 },
-                "required": ["pattern"]
+                "required": ["query"]
             }
         )
     
@@ -412,6 +699,195 @@ class FilesystemMCPServer:
     
     def call_tool(self, name: str, arguments: dict):
         return self.server.call_tool(name, arguments)
+    
+    def grep(self, query: str, glob: str = None, regex: bool = False, ignore_case: bool = False,
+             max_matches: int = GREP_MAX_MATCHES, workers: int = GREP_WORKERS) -> dict:
+        """并行搜索文件内容，返回 {matches: [{path, line, text}], truncated, files_scanned, binary_skipped}
+        
+        候选文件来自文件索引（按 glob 筛选）；工作线程从共享的候选队列中取文件，
+        累计找到 max_matches 处匹配后所有线程停止取新文件。
+        开头含 NUL 字节或不是 UTF-8 的文件视为二进制跳过；
+        区分大小写的普通文本先在字节层面查找，不包含的文件不做解码和逐行匹配
+        """
+        matcher = re.compile(query if regex else re.escape(query), re.IGNORECASE if ignore_case else 0)
+        literal = None if regex or ignore_case else query.encode("utf-8")
+        candidates = iter(self.index.query(pattern=glob))
+        lock = threading.Lock()
+        stop = threading.Event()
+        matches = []
+        counts = {"files_scanned": 0, "binary_skipped": 0}
+        
+        def search(path: str):
+            """在一个文件中查找，二进制文件返回 None"""
+            with open(os.path.join(self.root_dir, path), "rb") as f:
+                with _open_buffer(f, os.fstat(f.fileno()).st_size) as buf:
+                    if _looks_binary(buf[:BINARY_SNIFF_BYTES], "utf-8"):
+                        return None
+                    if literal is not None and buf.find(literal) < 0:
+                        return []
+                    text = buf[:].decode("utf-8", errors="replace")
+            found = []
+            for line_no, line in enumerate(text.splitlines(), 1):
+                if matcher.search(line):
+                    found.append({"path": path, "line": line_no, "text": line.strip()[:GREP_LINE_CHARS]})
+                    if len(found) >= max_matches or stop.is_set():
+                        break
+            return found
+        
+        def worker():
+            while not stop.is_set():
+                with lock:
+                    entry = next(candidates, None)
+                if entry is None:
+                    return
+                try:
+                    found = search(entry["path"])
+                except OSError:
+                    continue
+                with lock:
+                    if found is None:
+                        counts["binary_skipped"] += 1
+                        continue
+                    counts["files_scanned"] += 1
+                    matches.extend(found[:max_matches - len(matches)])
+                    if len(matches) >= max_matches:
+                        stop.set()
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grep") as pool:
+            for future in [pool.submit(worker) for _ in range(workers)]:
+                future.result()
+        matches.sort(key=lambda m: (m["path"], m["line"]))
+        return {"matches": matches, "truncated": stop.is_set(), **counts}
+    
+    def _resolve_range(self, full_path: str, st, buf, encoding: str, offset: int, length: int,
+                       start_line: int, end_line: int) -> tuple:
+        """计算要读取的字节范围，返回 (是否二进制, 起始偏移, 结束偏移)"""
+        size = st.st_size
+        binary = encoding == "base64" or _looks_binary(buf[:BINARY_SNIFF_BYTES], encoding)
+        if start_line is not None:
+            if end_line is not None and end_line < start_line:
+                raise ValueError(f"end_line（{end_line}）不能小于 start_line（{start_line}）")
+            if binary:
+                raise ValueError("二进制文件不支持按行读取")
+            signature = (st.st_size, st.st_mtime_ns)
+            start = self._line_offset(full_path, signature, buf, size, start_line)
+            if end_line is None:
+                end = size
+            else:
+                end = self._line_offset(full_path, signature, buf, size, end_line + 1)
+            return binary, start, end
+        start = min(offset, size)
+        end = size if length is None else min(size, offset + length)
+        if not binary:
+            end = _char_start(buf, end, size, forward=False)
+            start = min(_char_start(buf, start, size, forward=True), end)
+        return binary, start, end
+    
+    def _line_offset(self, full_path: str, signature: tuple, buf, size: int, line: int) -> int:
+        """第 line 行（从 1 开始）的起始字节偏移，超出文件行数时返回文件大小
+        
+        每个文件缓存一组行号索引记录点（文件大小或修改时间变化后重建），
+        翻页读取大文件时只需从最近的记录点向后扫描
+        """
+        with self._line_index_lock:
+            cached = self._line_index.get(full_path)
+            if cached is None or cached[0] != signature:
+                cached = (signature, [0])
+                self._line_index[full_path] = cached
+            checkpoints = cached[1]
+            k = min((line - 1) // LINE_INDEX_STEP, len(checkpoints) - 1)
+            pos = checkpoints[k]
+        
+        current = k * LINE_INDEX_STEP + 1
+        found = []
+        while current < line:
+            newline = buf.find(b"\n", pos)
+            if newline < 0:
+                return size
+            pos = newline + 1
+            current += 1
+            if (current - 1) % LINE_INDEX_STEP == 0:
+                found.append(pos)
+        if found:
+            with self._line_index_lock:
+                # 其他线程可能已经扩展了同一段索引
+                if len(checkpoints) == k + 1:
+                    checkpoints.extend(found)
+        return pos
+    
+    def read_range(self, path: str, encoding: str = "utf-8", offset: int = 0, length: int = None,
+                   start_line: int = None, end_line: int = None, max_bytes: int = None) -> dict:
+        """读取文件的一个范围，结果不超过 max_bytes（且不超过服务器上限）
+        
+        返回 {path, size, offset, length, encoding, content, truncated, eof}；按行读取时另有
+        start_line / end_line；被截断时给出 next_offset（在行边界截断时还有 next_line）
+        """
+        full_path = os.path.join(self.root_dir, path)
+        limit = min(max_bytes or self.max_read_bytes, self.max_read_bytes)
+        with open(full_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            with _open_buffer(f, size) as buf:
+                binary, start, end = self._resolve_range(full_path, st, buf, encoding, offset, length,
+                                                         start_line, end_line)
+                stop = min(end, start + limit)
+                if stop < end:
+                    # 优先在行尾截断，其次在字符边界截断
+                    newline = buf.rfind(b"\n", start, stop) if start_line is not None else -1
+                    if newline >= 0:
+                        stop = newline + 1
+                    elif not binary and _char_start(buf, stop, size, forward=False) > start:
+                        stop = _char_start(buf, stop, size, forward=False)
+                data = buf[start:stop]
+        
+        result = {"path": path, "size": size, "offset": start, "length": len(data)}
+        if binary:
+            result.update(encoding="base64", content=base64.b64encode(data).decode("ascii"))
+        else:
+            result.update(encoding=encoding, content=data.decode(encoding, errors="replace"))
+        if start_line is not None:
+            lines = data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+            result.update(start_line=start_line, end_line=start_line + lines - 1)
+        result["truncated"] = stop < end
+        result["eof"] = stop >= size
+        if stop < end:
+            result["next_offset"] = stop
+            if start_line is not None and data.endswith(b"\n"):
+                result["next_line"] = result["end_line"] + 1
+        return result
+    
+    def stream_range(self, path: str, encoding: str = "utf-8", offset: int = 0, length: int = None,
+                     start_line: int = None, end_line: int = None, chunk_bytes: int = READ_CHUNK_BYTES):
+        """按块产出文件的一个范围：{path, index, offset, length, encoding, content, last}
+        
+        文件在迭代期间保持打开（大文件为 mmap），每次只复制和编码一个分块；
+        分块大小不超过服务器的单次响应上限
+        """
+        full_path = os.path.join(self.root_dir, path)
+        # 3 的倍数：base64 分块可以直接拼接
+        chunk_bytes = max(3, min(chunk_bytes, self.max_read_bytes) // 3 * 3)
+        with open(full_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            with _open_buffer(f, size) as buf:
+                binary, start, end = self._resolve_range(full_path, st, buf, encoding, offset, length,
+                                                         start_line, end_line)
+                index, pos = 0, start
+                while True:
+                    stop = min(end, pos + chunk_bytes)
+                    if not binary and stop < end:
+                        stop = max(_char_start(buf, stop, size, forward=False), pos + 1)
+                    data = buf[pos:stop]
+                    chunk = {"path": path, "index": index, "offset": pos, "length": len(data)}
+                    if binary:
+                        chunk.update(encoding="base64", content=base64.b64encode(data).decode("ascii"))
+                    else:
+                        chunk.update(encoding=encoding, content=data.decode(encoding, errors="replace"))
+                    chunk["last"] = stop >= end
+                    yield chunk
+                    if stop >= end:
+                        return
+                    index, pos = index + 1, stop
 
 
 def create_filesystem_server():
@@ -421,7 +897,8 @@ def create_filesystem_server():
     print("=" * 50)
     
     # 创建服务器
-    server = FilesystemMCPServer(".")
+    # 以脚本所在目录为根目录，从任意工作目录运行都能读到 example.py
+    server = FilesystemMCPServer(os.path.dirname(os.path.abspath(__file__)))
     
     # 测试列出目录
     print("\n测试 list_directory:")
@@ -433,9 +910,105 @@ def create_filesystem_server():
     result = server.call_tool("file_info", {"path": "example.py"})
     print(result[:500] if len(result) > 500 else result)
     
+    # 按行/字节范围读取：只返回需要的部分，超过上限时截断并给出续读位置
+    print("\n测试 read_file (example.py 第 1-3 行):")
+    result = server.call_tool("read_file", {"path": "example.py", "start_line": 1, "end_line": 3})
+    print(result["content"])
+    result = server.call_tool("read_file", {"path": "example.py", "max_bytes": 200})
+    print(f"限制 200 字节: length={result['length']}, truncated={result['truncated']}, "
+          f"next_offset={result['next_offset']}")
+    
+    run_large_file_demo()
+    run_search_demo()
+    
     return server
 
 
+def run_search_demo(dirs: int = 200, files_per_dir: int = 50):
+    """文件索引：与每次遍历目录树对比，增量刷新，以及并行内容搜索"""
+    print("\n文件搜索:")
+    with tempfile.TemporaryDirectory() as tmp:
+        for d in range(dirs):
+            package = os.path.join(tmp, f"pkg{d // 20}", f"mod{d}")
+            os.makedirs(package)
+            for i in range(files_per_dir):
+                ext = (".py", ".md", ".json")[i % 3]
+                with open(os.path.join(package, f"file{i}{ext}"), "w", encoding="utf-8") as f:
+                    f.write(f"# 模块 {d} 文件 {i}\nVALUE = {d * files_per_dir + i}\n")
+        with redirect_stdout(io.StringIO()):
+            server = FilesystemMCPServer(tmp)
+        
+        # 原实现：每次调用遍历整个目录树
+        started = time.perf_counter()
+        walked = [name for _root, _dirs, names in os.walk(tmp) for name in names if fnmatch.fnmatch(name, "*.py")]
+        walk_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        server.index.refresh(force=True)
+        build_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        indexed = server.index.query("*.py")
+        query_ms = (time.perf_counter() - started) * 1000
+        print(f"  {len(server.index)} 个文件: 遍历目录树 {walk_ms:.1f} ms | 建立索引 {build_ms:.1f} ms | "
+              f"内存查询 {query_ms:.1f} ms（结果一致: {len(walked) == len(indexed)}）")
+        
+        # 新增文件只改变一个目录的 mtime，刷新时只重新列出该目录
+        with open(os.path.join(tmp, "pkg3", "mod70", "new_feature.py"), "w", encoding="utf-8") as f:
+            f.write("NEW = True\n")
+        rescanned = server.index.stats["rescanned_dirs"]
+        started = time.perf_counter()
+        server.index.refresh(force=True)
+        refresh_ms = (time.perf_counter() - started) * 1000
+        print(f"  增量刷新: {refresh_ms:.1f} ms，重新列出 {server.index.stats['rescanned_dirs'] - rescanned} 个目录")
+        print("  " + server.call_tool("search_files", {"substring": "new_", "extension": "py"}).strip())
+        
+        started = time.perf_counter()
+        result = server.call_tool("grep_files", {"query": "VALUE = 99", "glob": "*.py", "max_matches": 3})
+        print(f"  内容搜索（{(time.perf_counter() - started) * 1000:.1f} ms）: " + result.splitlines()[0])
+        for line in result.splitlines()[1:]:
+            print("  " + line)
+
+
+def run_large_file_demo(lines: int = 200000):
+    """大文件：mmap 按范围读取、行号索引、截断、二进制 base64 与流式分块"""
+    print("\n大文件读取:")
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "app.log"), "w", encoding="utf-8") as f:
+            for i in range(1, lines + 1):
+                f.write(f"2024-01-01 08:{i // 60 % 60:02d}:{i % 60:02d} INFO 请求 #{i} 处理完成\n")
+        with open(os.path.join(tmp, "logo.bin"), "wb") as f:
+            f.write(bytes(range(256)) * 64)
+        with redirect_stdout(io.StringIO()):
+            server = FilesystemMCPServer(tmp, max_read_bytes=64 * 1024)
+        size = os.path.getsize(os.path.join(tmp, "app.log"))
+        print(f"  app.log: {size / 1024 / 1024:.1f} MB，{lines} 行")
+        
+        for label in ("首次（建立行号索引）", "再次（使用行号索引）"):
+            started = time.perf_counter()
+            result = server.call_tool("read_file", {"path": "app.log", "start_line": lines - 1, "end_line": lines})
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"  最后 2 行 {label}: {elapsed:.1f} ms - {result['content'].splitlines()[-1]}")
+        
+        result = server.call_tool("read_file", {"path": "app.log"})
+        print(f"  读取整个文件: 返回 {result['length']} 字节（上限 64 KB），truncated={result['truncated']}，"
+              f"next_offset={result['next_offset']}")
+        result = server.call_tool("read_file", {"path": "app.log", "start_line": 1, "max_bytes": 4096})
+        print(f"  按行读取 4 KB: 第 {result['start_line']}-{result['end_line']} 行，下一次从第 {result['next_line']} 行开始")
+        
+        result = server.call_tool("read_file", {"path": "logo.bin", "offset": 250, "length": 10})
+        print(f"  二进制文件: encoding={result['encoding']}, content={result['content']} "
+              f"-> {list(base64.b64decode(result['content']))}")
+        
+        # 流式读取：每次只在内存中保留一个分块
+        tracemalloc.start()
+        chunks = total = 0
+        for chunk in server.call_tool("read_file", {"path": "app.log", "stream": True}):
+            chunks += 1
+            total += chunk["length"]
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  流式读取: {chunks} 块，共 {total} 字节，Python 内存峰值 {peak / 1024:.0f} KB")
+
+
 # ============================================================
 # 3. 数据库MCP Server
 # ============================================================
@@ -452,8 +1025,23 @@ class DatabaseMCPServer:
     
     def _init_database(self):
         """初始化数据库"""
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
+        # 工具可能在传输层的线程池中并发执行，每个线程使用自己的连接，数据库使用 WAL 模式：
+        # 读不阻塞写、写不阻塞读，写操作之间由 SQLite 排队（busy timeout 内等待，而不是直接报错）。
+        # 各连接需要看到同一份数据，":memory:" 改用临时文件（close 时删除）；
+        # 不使用共享缓存的内存库，它是表级锁，并发读写同一张表时写入会直接失败（database table is locked）
+        self._tempdir = None
+        if self.db_path == ":memory:":
+            self._tempdir = tempfile.TemporaryDirectory(prefix="mcp_demo_")
+            self._database = os.path.join(self._tempdir.name, "demo.db")
+        else:
+            self._database = self.db_path
+        self._local = threading.local()
+        self._connections = []
+        self._thread_connections = {}   # 线程 ID -> 连接（用于中断超时的查询）
+        self._connections_lock = threading.Lock()
+        # 主线程连接
+        self.conn = self._db
+        self.conn.execute("PRAGMA journal_mode=WAL")
         
         # 创建示例表
         cursor = self.conn.cursor()
@@ -511,13 +1099,33 @@ class DatabaseMCPServer:
             
             self.conn.commit()
     
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._database, timeout=10, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            with self._connections_lock:
+                self._connections.append(conn)
+                self._thread_connections[threading.get_ident()] = conn
+            self._local.conn = conn
+        return conn
+    
+    def interrupt(self, thread_id: int):
+        """中断某个线程上正在执行的 SQL（工具调用超时/取消时由传输层调用，可在任意线程调用）"""
+        with self._connections_lock:
+            conn = self._thread_connections.get(thread_id)
+        if conn is not None:
+            conn.interrupt()
+    
     def _register_tools(self):
         """注册数据库工具"""
         
         def query_handler(sql: str, params: list = None) -> str:
             """执行查询"""
             try:
-                cursor = self.conn.cursor()
+                cursor = self._db.cursor()
                 cursor.execute(sql, params or [])
                 
                 # 判断是SELECT还是其他语句
@@ -537,7 +1145,7 @@ class DatabaseMCPServer:
                     
                     return result
                 else:
-                    self.conn.commit()
+                    self._db.commit()
                     return f"执行成功，影响 {cursor.rowcount} 行"
                     
             except Exception as e:
@@ -545,7 +1153,7 @@ class DatabaseMCPServer:
         
         def list_tables_handler() -> str:
             """列出所有表"""
-            cursor = self.conn.cursor()
+            cursor = self._db.cursor()
             cursor.execute("""
                 SELECT name FROM sqlite_master 
                 WHERE type='table' AND name NOT LIKE 'sqlite_%'
@@ -564,7 +1172,7 @@ class DatabaseMCPServer:
         
         def table_info_handler(table_name: str) -> str:
             """获取表结构"""
-            cursor = self.conn.cursor()
+            cursor = self._db.cursor()
             cursor.execute(f"PRAGMA table_info({table_name})")
             columns = cursor.fetchall()
             
@@ -585,24 +1193,24 @@ class DatabaseMCPServer:
         def insert_user_handler(name: str, email: str, age: int = None) -> str:
             """插入用户"""
             try:
-                cursor = self.conn.cursor()
+                cursor = self._db.cursor()
                 cursor.execute(
                     "INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
                     (name, email, age)
                 )
-                self.conn.commit()
+                self._db.commit()
                 return f"成功插入用户，ID: {cursor.lastrowid}"
             except sqlite3.IntegrityError as e:
                 return f"插入失败: 邮箱已存在"
         
         def update_order_handler(order_id: int, status: str) -> str:
             """更新订单状态"""
-            cursor = self.conn.cursor()
+            cursor = self._db.cursor()
             cursor.execute(
                 "UPDATE orders SET status = ? WHERE id = ?",
                 (status, order_id)
             )
-            self.conn.commit()
+            self._db.commit()
             
             if cursor.rowcount > 0:
                 return f"成功更新订单 {order_id} 状态为 {status}"
@@ -610,7 +1218,7 @@ class DatabaseMCPServer:
         
         def get_user_orders_handler(user_id: int) -> str:
             """获取用户订单"""
-            cursor = self.conn.cursor()
+            cursor = self._db.cursor()
             cursor.execute("""
                 SELECT o.id, o.product, o.amount, o.status, o.created_at
                 FROM orders o
@@ -641,14 +1249,16 @@ class DatabaseMCPServer:
                     "params": {"type": "array", "description": "查询参数", "default": []}
                 },
                 "required": ["sql"]
-            }
+            },
+            on_cancel=self.interrupt
         )
         
         self.server.register_tool(
             "list_tables",
             "列出所有表",
             list_tables_handler,
-            {"type": "object", "properties": {}}
+            {"type": "object", "properties": {}},
+            on_cancel=self.interrupt
         )
         
         self.server.register_tool(
@@ -661,7 +1271,8 @@ class DatabaseMCPServer:
                     "table_name": {"type": "string", "description": "表名"}
                 },
                 "required": ["table_name"]
-            }
+            },
+            on_cancel=self.interrupt
         )
         
         self.server.register_tool(
@@ -676,7 +1287,8 @@ class DatabaseMCPServer:
                     "age": {"type": "integer", "description": "用户年龄"}
                 },
                 "required": ["name", "email"]
-            }
+            },
+            on_cancel=self.interrupt
         )
         
         self.server.register_tool(
@@ -690,7 +1302,8 @@ class DatabaseMCPServer:
                     "status": {"type": "string", "description": "新状态"}
                 },
                 "required": ["order_id", "status"]
-            }
+            },
+            on_cancel=self.interrupt
         )
         
         self.server.register_tool(
@@ -703,7 +1316,8 @@ class DatabaseMCPServer:
                     "user_id": {"type": "integer", "description": "用户ID"}
                 },
                 "required": ["user_id"]
-            }
+            },
+            on_cancel=self.interrupt
         )
     
     def list_tools(self):
@@ -713,9 +1327,15 @@ class DatabaseMCPServer:
         return self.server.call_tool(name, arguments)
     
     def close(self):
-        """关闭数据库连接"""
-        if self.conn:
-            self.conn.close()
+        """关闭数据库连接（临时数据库随之删除）"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+            self._thread_connections.clear()
+        if self._tempdir is not None:
+            self._tempdir.cleanup()
+            self._tempdir = None
 
 
 def create_database_server():
@@ -918,11 +1538,604 @@ def run_tests():
     print(f"\n测试完成: {tester.test_results}")
 
 
+# ============================================================
+# 6. 异步 JSON-RPC 传输（stdio / TCP）
+# ============================================================
+
+# JSON-RPC 2.0 错误码（与 mcp_protocol 示例中的 JSONRPC_ERRORS 一致）
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+# 服务器自定义错误码（-32000 ~ -32099）：工具调用超时
+REQUEST_TIMEOUT = -32001
+
+MCP_PROTOCOL_VERSION = "2024-11-05"
+
+# 单条消息的最大字节数（超过时断开连接）
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+class RPCError(Exception):
+    """返回给客户端的 JSON-RPC 错误"""
+    
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def rpc_result(result: Any, req_id) -> dict:
+    """JSON-RPC 成功响应"""
+    return {"jsonrpc": "2.0", "id": req_id, "result": result}
+
+
+def rpc_error(code: int, message: str, req_id=None) -> dict:
+    """JSON-RPC 错误响应"""
+    return {"jsonrpc": "2.0", "id": req_id, "error": {"code": code, "message": message}}
+
+
+def encode_message(message) -> bytes:
+    """分帧：每条消息一行 JSON（MCP stdio 传输的格式）"""
+    return json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _text_content(result) -> dict:
+    """工具结果 -> MCP 文本内容（非字符串结果序列化为 JSON）"""
+    if not isinstance(result, str):
+        result = json.dumps(result, ensure_ascii=False, default=str)
+    return {"type": "text", "text": result}
+
+
+# 迭代器结束标记（next 的默认值）
+_STREAM_END = object()
+
+
+def _valid_id(req_id) -> bool:
+    """JSON-RPC 请求 id：字符串、整数或 null（布尔值、浮点数、数组、对象都不接受）"""
+    return req_id is None or (isinstance(req_id, (str, int)) and not isinstance(req_id, bool))
+
+
+class _ThreadCall:
+    """在线程池中执行的同步工具调用：记录执行线程，超时/取消时只中断仍在执行的调用
+    
+    尚未开始的调用由 wait_for 取消 Future 后不会再执行；已结束的调用不再中断，
+    避免误中断同一线程上随后执行的其他请求
+    """
+    
+    def __init__(self, func):
+        self.func = func
+        self.thread_id = None
+        self.finished = False
+        self._lock = threading.Lock()
+    
+    def __call__(self):
+        with self._lock:
+            self.thread_id = threading.get_ident()
+        try:
+            return self.func()
+        finally:
+            with self._lock:
+                self.finished = True
+    
+    def interrupt(self, on_cancel):
+        with self._lock:
+            if on_cancel is not None and self.thread_id is not None and not self.finished:
+                on_cancel(self.thread_id)
+
+
+def _close_quietly(chunks):
+    try:
+        chunks.close()
+    except ValueError:  # 生成器正在其他线程中执行
+        pass
+
+
+class AsyncMCPTransport:
+    """BasicMCPServer 的异步 JSON-RPC 传输层
+    
+    - 每行一个 JSON-RPC 2.0 消息（或一个批量数组），请求/响应的字段与 JSONRPCMessage 生成的一致
+    - 同一连接上的请求并发执行，响应按完成顺序返回，客户端按 id 匹配；
+      批量数组中的请求同样并发执行，全部完成后以数组一次返回
+    - async 工具直接在事件循环上运行；同步工具放到有界线程池执行，不阻塞事件循环，
+      一个客户端的慢调用不会拖住其他客户端
+    - 每次调用都有超时：工具注册时的 timeout，或传输层默认值；
+      请求可以用 params._meta.timeout 进一步缩短
+    - 客户端发送 notifications/cancelled 可取消进行中的请求（被取消的请求不再返回响应）；
+      连接异常断开时取消该连接上所有未完成的请求
+    - 工具返回迭代器时按块流式发送：请求带 params._meta.progressToken 时每块作为
+      notifications/progress 发出，最终响应只包含汇总
+    
+    注意：同步工具超时或被取消后，线程无法被强制停止，会在后台执行完毕后释放线程池名额
+    """
+    
+    def __init__(self, server: BasicMCPServer, max_workers: int = 8, call_timeout: float = 30.0):
+        self.server = server
+        self.call_timeout = call_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-tool")
+        self.stats = {"requests": 0, "errors": 0, "timeouts": 0, "cancelled": 0}
+        self._connections = set()
+    
+    async def serve_tcp(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        """监听 TCP 端口（port=0 时由系统分配），返回 asyncio.Server"""
+        return await asyncio.start_server(self.handle_connection, host, port, limit=MAX_MESSAGE_BYTES)
+    
+    async def serve_stdio(self):
+        """通过标准输入/输出通信，直到 stdin 关闭"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_MESSAGE_BYTES)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+        writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+        await self.handle_connection(reader, writer)
+    
+    async def wait_closed(self):
+        """等待所有客户端连接处理结束"""
+        await asyncio.gather(*self._connections, return_exceptions=True)
+    
+    def close(self):
+        """关闭线程池（等待正在执行的同步工具结束）"""
+        self.executor.shutdown(wait=True)
+    
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个客户端连接：每个请求一个任务，读取循环不等待请求完成
+        
+        读到 EOF（客户端不再发送请求）时等待进行中的请求完成后再关闭；连接异常断开时取消它们
+        """
+        write_lock = asyncio.Lock()
+        in_flight = {}
+        current = asyncio.current_task()
+        self._connections.add(current)
+        
+        async def send(message):
+            async with write_lock:
+                writer.write(encode_message(message))
+                await writer.drain()
+        
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    await send(rpc_error(INVALID_REQUEST, f"消息超过 {MAX_MESSAGE_BYTES} 字节"))
+                    break
+                if not line:
+                    await asyncio.gather(*list(in_flight.values()), return_exceptions=True)
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError as e:
+                    await send(rpc_error(PARSE_ERROR, f"Parse error: {e}"))
+                    continue
+                await self._on_message(message, send, in_flight)
+        except ConnectionError:
+            pass
+        finally:
+            pending = list(in_flight.values())
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            writer.close()
+            self._connections.discard(current)
+    
+    async def _on_message(self, message, send, in_flight: dict):
+        if isinstance(message, list):
+            await self._on_batch(message, send, in_flight)
+            return
+        error = self._validate(message, in_flight)
+        if error is not None:
+            await send(error)
+        elif "id" not in message:
+            self._on_notification(message, in_flight)
+        else:
+            self.stats["requests"] += 1
+            self._track(message["id"], self._respond(message, send), in_flight)
+    
+    async def _on_batch(self, batch: list, send, in_flight: dict):
+        """批量请求：各请求并发执行，全部完成后以一个数组返回（通知和被取消的请求不出现在数组中）"""
+        if not batch:
+            await send(rpc_error(INVALID_REQUEST, "Invalid Request: 空的批量请求"))
+            return
+        responses = []
+        tasks = []
+        for message in batch:
+            error = self._validate(message, in_flight)
+            if error is not None:
+                responses.append(error)
+            elif "id" not in message:
+                self._on_notification(message, in_flight)
+            else:
+                self.stats["requests"] += 1
+                tasks.append(self._track(message["id"], self._run_request(message, send), in_flight))
+        self._track(object(), self._send_batch(responses, tasks, send), in_flight)
+    
+    def _validate(self, message, in_flight: dict):
+        """校验单条消息，不合法时返回错误响应（id 只能是字符串、整数或 null）"""
+        if (not isinstance(message, dict) or message.get("jsonrpc") != "2.0"
+                or not isinstance(message.get("method"), str)):
+            req_id = message.get("id") if isinstance(message, dict) else None
+            return rpc_error(INVALID_REQUEST, "Invalid Request", req_id if _valid_id(req_id) else None)
+        if not _valid_id(message.get("id")):
+            return rpc_error(INVALID_REQUEST, "Invalid Request: id 必须是字符串、整数或 null")
+        if "id" in message and message["id"] in in_flight:
+            return rpc_error(INVALID_REQUEST, f"请求 id {message['id']!r} 正在处理中", message["id"])
+        return None
+    
+    def _on_notification(self, message: dict, in_flight: dict):
+        """通知没有响应；目前只处理取消"""
+        if message["method"] == "notifications/cancelled":
+            params = message.get("params")
+            # 格式不对的通知直接忽略（通知没有响应，也不能影响连接上的其他请求）
+            if not isinstance(params, dict) or not _valid_id(params.get("requestId")):
+                return
+            task = in_flight.get(params["requestId"])
+            if task is not None and task.cancel():
+                self.stats["cancelled"] += 1
+    
+    @staticmethod
+    def _track(key, coro, in_flight: dict) -> asyncio.Task:
+        """启动任务并登记为进行中（按请求 id 取消，连接关闭时统一等待或取消）"""
+        task = asyncio.create_task(coro)
+        in_flight[key] = task
+        task.add_done_callback(lambda _task: in_flight.pop(key, None))
+        return task
+    
+    async def _respond(self, message: dict, send):
+        response = await self._run_request(message, send)
+        try:
+            await send(response)
+        except ConnectionError:
+            pass
+    
+    async def _send_batch(self, responses: list, tasks: list, send):
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, dict):
+                responses.append(result)
+        if responses:
+            try:
+                await send(responses)
+            except ConnectionError:
+                pass
+    
+    async def _run_request(self, message: dict, send=None) -> dict:
+        """执行一个请求，返回响应消息（send 用于在响应之前发送进度通知）"""
+        req_id = message["id"]
+        try:
+            params = message.get("params") or {}
+            if not isinstance(params, dict):
+                raise RPCError(INVALID_PARAMS, "params 必须是对象")
+            return rpc_result(await self.dispatch(message["method"], params, send), req_id)
+        except RPCError as e:
+            self.stats["errors"] += 1
+            return rpc_error(e.code, e.message, req_id)
+        except Exception as e:
+            self.stats["errors"] += 1
+            return rpc_error(INTERNAL_ERROR, f"Internal error: {e}", req_id)
+    
+    async def dispatch(self, method: str, params: dict, send=None) -> Any:
+        """执行一个 MCP 方法，返回 result 字段的内容"""
+        if method == "initialize":
+            return {
+                "protocolVersion": MCP_PROTOCOL_VERSION,
+                "capabilities": {"tools": {}, "resources": {}, "prompts": {}},
+                "serverInfo": {"name": self.server.name, "version": "1.0.0"}
+            }
+        if method == "ping":
+            return {}
+        if method == "tools/list":
+            return {"tools": self.server.list_tools()}
+        if method == "tools/call":
+            meta = params.get("_meta") or {}
+            progress = None
+            if meta.get("progressToken") is not None and send is not None:
+                progress = functools.partial(self._send_progress, send, meta["progressToken"])
+            return await self.call_tool(params.get("name"), params.get("arguments") or {}, meta.get("timeout"),
+                                        progress)
+        if method == "resources/list":
+            return {"resources": self.server.list_resources()}
+        if method == "resources/read":
+            uri = params.get("uri")
+            try:
+                content = self.server.read_resource(uri)
+            except ValueError as e:
+                raise RPCError(INVALID_PARAMS, str(e))
+            return {"contents": [{"uri": uri, "mimeType": "text/plain", "text": content}]}
+        if method == "prompts/list":
+            return {"prompts": self.server.list_prompts()}
+        raise RPCError(METHOD_NOT_FOUND, f"Method not found: {method}")
+    
+    async def call_tool(self, name: str, arguments: dict, timeout: float = None, progress=None) -> dict:
+        """调用工具：工具自身的异常作为 isError 结果返回，超时作为 JSON-RPC 错误返回
+        
+        工具返回迭代器（如 read_file 的 stream=True）时逐块取出：请求带 progressToken 时
+        每块作为 notifications/progress 发送（progress 为进度回调），否则合并到响应中
+        """
+        tool = self.server.tools.get(name)
+        if tool is None:
+            raise RPCError(INVALID_PARAMS, f"未知工具: {name}")
+        if not isinstance(arguments, dict):
+            raise RPCError(INVALID_PARAMS, "arguments 必须是对象")
+        try:
+            arguments = tool["validator"](arguments)
+        except SchemaValidationError as e:
+            raise RPCError(INVALID_PARAMS, f"参数校验失败: {e}")
+        
+        limit = tool.get("timeout") or self.call_timeout
+        if timeout:
+            limit = min(limit, float(timeout)) if limit else float(timeout)
+        
+        handler = tool["handler"]
+        call = None
+        try:
+            if inspect.iscoroutinefunction(handler):
+                pending = handler(**arguments)
+            else:
+                loop = asyncio.get_running_loop()
+                call = _ThreadCall(functools.partial(handler, **arguments))
+                pending = loop.run_in_executor(self.executor, call)
+            result = await asyncio.wait_for(pending, limit)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            # 线程池中的调用不会因 wait_for 超时而停止，交给工具中断它，否则会一直占用工作线程
+            if call is not None:
+                call.interrupt(tool.get("on_cancel"))
+            raise RPCError(REQUEST_TIMEOUT, f"工具 {name} 执行超时（{limit}s）")
+        except asyncio.CancelledError:
+            if call is not None:
+                call.interrupt(tool.get("on_cancel"))
+            raise
+        except Exception as e:
+            return {"content": [{"type": "text", "text": f"{type(e).__name__}: {e}"}], "isError": True}
+        
+        if inspect.isgenerator(result):
+            return await self._drain_stream(name, result, limit, progress)
+        return {"content": [_text_content(result)]}
+    
+    async def _drain_stream(self, name: str, chunks, limit: float, progress=None) -> dict:
+        """在线程池中逐块取出迭代器（超时按每块计算）
+        
+        有进度回调时每块立即发给客户端，内存中只保留当前块；
+        否则合并到响应中，总大小超过 MAX_MESSAGE_BYTES 的一半时停止并标记 truncated
+        """
+        loop = asyncio.get_running_loop()
+        content = []
+        count = size = 0
+        truncated = False
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        loop.run_in_executor(self.executor, next, chunks, _STREAM_END), limit)
+                except asyncio.TimeoutError:
+                    self.stats["timeouts"] += 1
+                    raise RPCError(REQUEST_TIMEOUT, f"工具 {name} 分块超时（{limit}s）")
+                except Exception as e:
+                    return {"content": [{"type": "text", "text": f"{type(e).__name__}: {e}"}], "isError": True}
+                if chunk is _STREAM_END:
+                    break
+                item = _text_content(chunk)
+                count += 1
+                if progress is not None:
+                    await progress(count, item)
+                    continue
+                size += len(item["text"])
+                if size > MAX_MESSAGE_BYTES // 2:
+                    truncated = True
+                    break
+                content.append(item)
+        finally:
+            # 迭代器可能仍在其他线程中执行（超时/取消），此时关闭失败，由垃圾回收释放文件
+            loop.run_in_executor(self.executor, _close_quietly, chunks)
+        
+        summary = {"streamed": progress is not None, "chunks": count, "truncated": truncated}
+        return {"content": content + [_text_content(summary)]}
+    
+    @staticmethod
+    async def _send_progress(send, token, count: int, item: dict):
+        await send({"jsonrpc": "2.0", "method": "notifications/progress",
+                    "params": {"progressToken": token, "progress": count, "content": [item]}})
+
+
+class DemoClient:
+    """演示用的最小 TCP 客户端：发送请求后等待同一 id 的响应"""
+    
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+    
+    @classmethod
+    async def connect(cls, host: str, port: int) -> 'DemoClient':
+        reader, writer = await asyncio.open_connection(host, port, limit=MAX_MESSAGE_BYTES)
+        return cls(reader, writer)
+    
+    async def send(self, method: str, params: dict = None, notify: bool = False):
+        message = {"jsonrpc": "2.0", "method": method, "params": params or {}}
+        if not notify:
+            self.next_id += 1
+            message["id"] = self.next_id
+        self.writer.write(encode_message(message))
+        await self.writer.drain()
+        return message.get("id")
+    
+    async def receive(self) -> dict:
+        return json.loads(await self.reader.readline())
+    
+    async def request(self, method: str, params: dict = None, on_notification=None) -> dict:
+        """发送请求并等待响应；期间收到的通知交给 on_notification（未提供时丢弃）"""
+        req_id = await self.send(method, params)
+        while True:
+            response = await self.receive()
+            if response.get("id") == req_id:
+                return response
+            if on_notification is not None and "method" in response:
+                on_notification(response)
+    
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+# 约 1 秒的 CPU 密集型查询，模拟慢 SQL
+SLOW_SQL = ("SELECT (WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 3000000) "
+            "SELECT count(*) FROM c) AS n")
+
+
+async def _transport_demo():
+    db = DatabaseMCPServer(":memory:")
+    
+    async def async_sleep_handler(seconds: float) -> str:
+        """async 工具：直接在事件循环上运行"""
+        await asyncio.sleep(seconds)
+        return f"睡眠 {seconds}s 完成"
+    
+    db.server.register_tool(
+        "sleep", "异步等待指定秒数", async_sleep_handler,
+        {"type": "object", "properties": {"seconds": {"type": "number"}}, "required": ["seconds"]}
+    )
+    
+    # 同一个服务器上再挂载文件系统服务器的 read_file 工具
+    with redirect_stdout(io.StringIO()):
+        fs = FilesystemMCPServer(os.path.dirname(os.path.abspath(__file__)))
+    db.server.tools["read_file"] = fs.server.tools["read_file"]
+    
+    transport = AsyncMCPTransport(db.server, max_workers=4, call_timeout=10)
+    server = await transport.serve_tcp()
+    host, port = server.sockets[0].getsockname()[:2]
+    print(f"\n📡 监听 {host}:{port}")
+    
+    slow_client = await DemoClient.connect(host, port)
+    fast_client = await DemoClient.connect(host, port)
+    await slow_client.request("initialize")
+    
+    # 客户端 A 的慢查询进行中，客户端 B 的请求照常返回
+    started = time.perf_counter()
+    slow = asyncio.create_task(slow_client.request("tools/call", {"name": "query", "arguments": {"sql": SLOW_SQL}}))
+    await asyncio.sleep(0.05)
+    for name, arguments in [("list_tables", {}), ("get_user_orders", {"user_id": 1}), ("sleep", {"seconds": 0.1})]:
+        t = time.perf_counter()
+        response = await fast_client.request("tools/call", {"name": name, "arguments": arguments})
+        text = response["result"]["content"][0]["text"].splitlines()[0]
+        print(f"  客户端B {name}: {(time.perf_counter() - t) * 1000:.0f} ms - {text}")
+    response = await slow
+    print(f"  客户端A 慢查询: {(time.perf_counter() - started) * 1000:.0f} ms - "
+          f"{response['result']['content'][0]['text'].splitlines()[0]}")
+    
+    # 单次调用超时
+    response = await fast_client.request("tools/call", {"name": "sleep", "arguments": {"seconds": 5},
+                                                        "_meta": {"timeout": 0.2}})
+    print(f"\n超时: {response['error']}")
+    
+    # 同步工具超时后中断其 SQLite 语句，工作线程立即释放：超时的慢查询不会占满线程池
+    started = time.perf_counter()
+    for _ in range(8):
+        await fast_client.send("tools/call", {"name": "query", "arguments": {"sql": SLOW_SQL},
+                                              "_meta": {"timeout": 0.2}})
+    codes = [(await fast_client.receive()).get("error", {}).get("code") for _ in range(8)]
+    response = await fast_client.request("tools/call", {"name": "list_tables", "arguments": {}})
+    print(f"8 个慢查询中 {codes.count(REQUEST_TIMEOUT)} 个超时并被中断，随后 list_tables "
+          f"{'成功' if 'result' in response else '失败'}，共 {(time.perf_counter() - started) * 1000:.0f} ms")
+    
+    # 参数在执行前按 inputSchema 校验，错误带有出错位置
+    response = await fast_client.request("tools/call", {"name": "sleep", "arguments": {"seconds": "5"}})
+    print(f"参数校验: {response['error']}")
+    
+    # 流式读取：带 progressToken 时文件分块作为进度通知发送，响应只包含汇总
+    received = []
+    response = await fast_client.request(
+        "tools/call",
+        {"name": "read_file", "arguments": {"path": "example.py", "stream": True, "chunk_bytes": 16 * 1024},
+         "_meta": {"progressToken": "read-1"}},
+        on_notification=received.append)
+    text = "".join(json.loads(n["params"]["content"][0]["text"])["content"] for n in received)
+    with open(__file__, encoding="utf-8") as f:
+        matches = text == f.read()
+    print(f"流式读取: {len(received)} 个进度通知，拼接后与原文件一致: {matches}，"
+          f"响应: {response['result']['content'][-1]['text']}")
+    
+    # 取消进行中的请求：之后不会再收到该请求的响应
+    req_id = await fast_client.send("tools/call", {"name": "sleep", "arguments": {"seconds": 5}})
+    await fast_client.send("notifications/cancelled", {"requestId": req_id, "reason": "用户取消"}, notify=True)
+    response = await fast_client.request("ping")
+    print(f"取消请求 {req_id} 后 ping: {response}")
+    
+    # 同一连接上并发的请求按完成顺序返回
+    for seconds in (0.3, 0.1, 0.2):
+        await fast_client.send("tools/call", {"name": "sleep", "arguments": {"seconds": seconds}})
+    order = [(await fast_client.receive())["id"] for _ in range(3)]
+    print(f"响应顺序（按完成先后）: {order}")
+    
+    # 批量请求：一个数组发出，一个数组返回（通知不占响应位置）
+    fast_client.writer.write(encode_message([
+        {"jsonrpc": "2.0", "id": "a", "method": "tools/call",
+         "params": {"name": "get_user_orders", "arguments": {"user_id": 2}}},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": "b", "method": "tools/call", "params": {"name": "sleep", "arguments": {"seconds": 0.1}}},
+        {"jsonrpc": "2.0", "id": "c", "method": "unknown/method"},
+    ]))
+    batch = await fast_client.receive()
+    print(f"批量响应: {[(r['id'], 'error' if 'error' in r else 'ok') for r in batch]}")
+    
+    await slow_client.close()
+    await fast_client.close()
+    await transport.wait_closed()
+    server.close()
+    await server.wait_closed()
+    transport.close()
+    db.close()
+    print(f"\n传输层统计: {transport.stats}")
+
+
+def run_transport_demo():
+    """异步传输示例"""
+    print("\n" + "=" * 50)
+    print("示例6: 异步 JSON-RPC 传输")
+    print("=" * 50)
+    asyncio.run(_transport_demo())
+
+
+def serve_main(args: list) -> int:
+    """作为真实的 MCP 服务器运行数据库工具
+    
+    python example.py serve            # stdio 传输（供 Claude Desktop 等主机启动）
+    python example.py serve 8765       # TCP 传输
+    数据库路径取环境变量 DB_PATH（默认内存数据库）
+    """
+    # stdout 是协议通道，创建服务器时的提示信息改为输出到 stderr
+    with redirect_stdout(sys.stderr):
+        db = DatabaseMCPServer(os.environ.get("DB_PATH", ":memory:"))
+    transport = AsyncMCPTransport(db.server)
+    
+    async def main():
+        if args:
+            server = await transport.serve_tcp("127.0.0.1", int(args[0]))
+            print(f"MCP 服务器监听 127.0.0.1:{args[0]}", file=sys.stderr)
+            async with server:
+                await server.serve_forever()
+        else:
+            await transport.serve_stdio()
+    
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transport.close()
+        db.close()
+    return 0
+
+
 # ============================================================
 # 主函数
 # ============================================================
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        sys.exit(serve_main(sys.argv[2:]))
+    
     print("=" * 60)
     print("MCP Server 配置与开发示例")
     print("=" * 60)
@@ -933,6 +2146,7 @@ if __name__ == "__main__":
     create_database_server()
     create_mcp_config()
     run_tests()
+    run_transport_demo()
     
     print("\n" + "=" * 60)
     print("所有示例完成!")
@@ -43,6 +43,13 @@ run_flask() {
     python app.py
 }
 
+# 以生产模式运行 Flask Web 应用（gunicorn 多 worker）
+run_prod() {
+    echo -e "${BLUE}>>> 使用 gunicorn 启动 Flask Web 应用...${NC}"
+    cd web
+    gunicorn -c gunicorn.conf.py wsgi:app
+}
+
 # 运行 Streamlit Web 应用
 run_streamlit() {
     echo -e "${BLUE}>>> 启动 Streamlit Web 应用...${NC}"
@@ -56,6 +63,7 @@ usage() {
     echo ""
     echo "可用命令:"
     echo "  flask      运行 Flask Web 应用 (端口 5000)"
+    echo "  prod       以生产模式运行 Flask Web 应用 (gunicorn, 端口 \$PORT)"
     echo "  streamlit  运行 Streamlit Web 应用 (端口 8502)"
     echo "  test       运行测试"
     echo "  help       显示帮助"
@@ -69,6 +77,7 @@ main() {
 
     case "$1" in
         flask) run_flask ;;
+        prod) run_prod ;;
         streamlit) run_streamlit ;;
         test) pytest -v ;;
         help) usage ;;
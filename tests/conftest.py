@@ -0,0 +1,17 @@
+"""
+测试公共配置：web/ 目录下是平铺模块（与 app.py 的导入方式一致），加入 sys.path
+"""
+
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+WEB_DIR = ROOT / 'web'
+
+if str(WEB_DIR) not in sys.path:
+    sys.path.insert(0, str(WEB_DIR))
+
+# 多学习者模式要求设置 SECRET_KEY；测试不使用快照，避免读写 web/data
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+os.environ.setdefault('CONTENT_SNAPSHOT_ENABLED', '0')
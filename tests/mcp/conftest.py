@@ -0,0 +1,33 @@
+"""
+MCP 示例测试：两个示例都是 example.py，按路径以不同的模块名加载
+"""
+
+import sys
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def _load(name: str, path: Path):
+    module = sys.modules.get(name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope='session')
+def protocol():
+    """mcp_protocol/example.py（名称与 mcp_server/example.py 中的加载方式一致）"""
+    return _load('mcp_protocol_example', ROOT / 'mcp_protocol' / 'example.py')
+
+
+@pytest.fixture(scope='session')
+def server_example(protocol):
+    """mcp_server/example.py"""
+    return _load('mcp_server_example', ROOT / 'mcp_server' / 'example.py')
@@ -0,0 +1,154 @@
+"""
+异步 JSON-RPC 传输：并发请求、超时、取消、非法消息、慢查询中断
+"""
+
+import asyncio
+import time
+
+import pytest
+
+
+@pytest.fixture
+def run_server(server_example):
+    """在新的事件循环中启动传输层，把 (transport, client) 交给测试协程"""
+    ex = server_example
+
+    def run(scenario, call_timeout=10):
+        async def main():
+            db = ex.DatabaseMCPServer(':memory:')
+
+            async def sleep_handler(seconds: float) -> str:
+                await asyncio.sleep(seconds)
+                return f'slept {seconds}'
+
+            db.server.register_tool(
+                'sleep', 'sleep', sleep_handler,
+                {'type': 'object', 'properties': {'seconds': {'type': 'number'}}, 'required': ['seconds']})
+            transport = ex.AsyncMCPTransport(db.server, max_workers=4, call_timeout=call_timeout)
+            server = await transport.serve_tcp('127.0.0.1')
+            host, port = server.sockets[0].getsockname()[:2]
+            client = await ex.DemoClient.connect(host, port)
+            try:
+                return await asyncio.wait_for(scenario(transport, client), 30)
+            finally:
+                await client.close()
+                await transport.wait_closed()
+                server.close()
+                await server.wait_closed()
+                transport.close()
+                db.close()
+
+        return asyncio.run(main())
+
+    return run
+
+
+def _sleep(seconds, **meta):
+    params = {'name': 'sleep', 'arguments': {'seconds': seconds}}
+    if meta:
+        params['_meta'] = meta
+    return params
+
+
+def test_requests_on_one_connection_run_concurrently(run_server):
+    async def scenario(transport, client):
+        started = time.perf_counter()
+        ids = [await client.send('tools/call', _sleep(s)) for s in (0.4, 0.1, 0.2)]
+        order = [(await client.receive())['id'] for _ in ids]
+        return ids, order, time.perf_counter() - started
+
+    ids, order, elapsed = run_server(scenario)
+    # 按完成先后返回，总耗时接近最慢的一个而不是三者之和
+    assert order == [ids[1], ids[2], ids[0]]
+    assert elapsed < 0.65
+
+
+def test_timeout_returns_error(run_server, server_example):
+    async def scenario(transport, client):
+        return await client.request('tools/call', _sleep(5, timeout=0.1)), transport.stats
+
+    response, stats = run_server(scenario)
+    assert response['error']['code'] == server_example.REQUEST_TIMEOUT
+    assert stats['timeouts'] == 1
+
+
+def test_cancelled_request_gets_no_response(run_server):
+    async def scenario(transport, client):
+        req_id = await client.send('tools/call', _sleep(5))
+        await client.send('notifications/cancelled', {'requestId': req_id}, notify=True)
+        started = time.perf_counter()
+        pong = await client.request('ping')
+        return pong, time.perf_counter() - started, transport.stats
+
+    pong, elapsed, stats = run_server(scenario)
+    # 下一条收到的就是 ping 的响应（被取消的请求没有响应，也不用等它）
+    assert pong['result'] == {}
+    assert elapsed < 1
+    assert stats['cancelled'] == 1
+
+
+@pytest.mark.parametrize('message, code', [
+    (b'{not json\n', -32700),
+    (b'{"jsonrpc": "2.0", "id": [1], "method": "ping"}\n', -32600),
+    (b'{"jsonrpc": "2.0", "id": 1.5, "method": "ping"}\n', -32600),
+    (b'{"jsonrpc": "2.0", "id": 7, "method": "tools/call", "params": [1, 2]}\n', -32602),
+    (b'{"jsonrpc": "2.0", "id": 8, "method": "tools/call", "params": {"name": "sleep", "arguments": 3}}\n', -32602),
+    (b'{"jsonrpc": "2.0", "id": 9, "method": "tools/call", '
+     b'"params": {"name": "sleep", "arguments": {"seconds": "x"}}}\n', -32602),
+    (b'[]\n', -32600),
+])
+def test_malformed_messages_get_errors_and_connection_survives(run_server, message, code):
+    async def scenario(transport, client):
+        client.writer.write(message)
+        await client.writer.drain()
+        error = await client.receive()
+        return error, await client.request('ping')
+
+    error, pong = run_server(scenario)
+    assert error['error']['code'] == code
+    assert pong['result'] == {}
+
+
+def test_malformed_cancel_notification_is_ignored(run_server):
+    async def scenario(transport, client):
+        await client.send('notifications/cancelled', {'requestId': {'bad': 1}}, notify=True)
+        client.writer.write(b'{"jsonrpc": "2.0", "method": "notifications/cancelled", "params": [1]}\n')
+        return await client.request('ping')
+
+    assert run_server(scenario)['result'] == {}
+
+
+def test_batch_returns_one_array_without_notifications(run_server, server_example):
+    async def scenario(transport, client):
+        client.writer.write(server_example.encode_message([
+            {'jsonrpc': '2.0', 'id': 'a', 'method': 'ping'},
+            {'jsonrpc': '2.0', 'method': 'notifications/initialized'},
+            {'jsonrpc': '2.0', 'id': 'b', 'method': 'tools/call', 'params': _sleep(0.05)},
+            {'jsonrpc': '2.0', 'id': 'c', 'method': 'unknown/method'},
+        ]))
+        return await client.receive()
+
+    batch = run_server(scenario)
+    by_id = {r['id']: r for r in batch}
+    assert set(by_id) == {'a', 'b', 'c'}
+    assert by_id['b']['result']['content'][0]['text'] == 'slept 0.05'
+    assert by_id['c']['error']['code'] == -32601
+
+
+def test_timed_out_sql_is_interrupted_and_frees_workers(run_server, server_example):
+    ex = server_example
+
+    async def scenario(transport, client):
+        started = time.perf_counter()
+        # 超过线程池大小的慢查询：若超时后不中断，后续请求要排队等它们跑完
+        for _ in range(8):
+            await client.send('tools/call', {'name': 'query', 'arguments': {'sql': ex.SLOW_SQL},
+                                             '_meta': {'timeout': 0.1}})
+        codes = [(await client.receive()).get('error', {}).get('code') for _ in range(8)]
+        response = await client.request('tools/call', {'name': 'list_tables', 'arguments': {}})
+        return codes, response, time.perf_counter() - started
+
+    codes, response, elapsed = run_server(scenario)
+    assert codes == [ex.REQUEST_TIMEOUT] * 8
+    assert 'result' in response
+    assert elapsed < 2
@@ -0,0 +1,112 @@
+"""
+文件系统服务器的搜索：增量刷新的文件索引（search_files）与并行内容搜索（grep_files）
+"""
+
+import shutil
+
+import pytest
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for d in ('a', 'a/deep', 'b', '.git', '__pycache__'):
+        (tmp_path / d).mkdir()
+    (tmp_path / 'top.py').write_text('import os\nTODO = 1\n', encoding='utf-8')
+    (tmp_path / 'a' / 'one.py').write_text('def one():\n    return "todo later"\n', encoding='utf-8')
+    (tmp_path / 'a' / 'deep' / 'Notes.MD').write_text('# TODO\n- item\n', encoding='utf-8')
+    (tmp_path / 'b' / 'data.json').write_text('{"todo": []}\n', encoding='utf-8')
+    (tmp_path / 'b' / 'image.bin').write_bytes(b'\0TODO\0' * 10)
+    (tmp_path / '.git' / 'config').write_text('TODO\n', encoding='utf-8')
+    (tmp_path / '__pycache__' / 'x.pyc').write_bytes(b'TODO')
+    return tmp_path
+
+
+@pytest.fixture
+def fs(server_example, tree):
+    return server_example.FilesystemMCPServer(str(tree))
+
+
+def _paths(entries):
+    return [e['path'].replace('\\', '/') for e in entries]
+
+
+def test_query_filters(fs):
+    index = fs.index
+    assert _paths(index.query()) == ['a/deep/Notes.MD', 'a/one.py', 'b/data.json', 'b/image.bin', 'top.py']
+    assert _paths(index.query('*.py')) == ['a/one.py', 'top.py']
+    assert _paths(index.query('a/*')) == ['a/deep/Notes.MD', 'a/one.py']
+    assert _paths(index.query('o*.py')) == ['a/one.py']
+    assert _paths(index.query(substring='DEEP')) == ['a/deep/Notes.MD']
+    assert _paths(index.query(extension='md')) == ['a/deep/Notes.MD']
+    assert _paths(index.query('*.py', extension='.json')) == []
+
+
+def test_refresh_only_rescans_changed_directories(fs, tree):
+    index = fs.index
+    index.refresh(force=True)
+    scanned = index.stats['rescanned_dirs']
+
+    # 无变化：不重新列出任何目录
+    index.refresh(force=True)
+    assert index.stats['rescanned_dirs'] == scanned
+
+    (tree / 'b' / 'new.py').write_text('x = 1\n', encoding='utf-8')
+    index.refresh(force=True)
+    assert index.stats['rescanned_dirs'] == scanned + 1
+    assert 'b/new.py' in _paths(index.query('*.py'))
+
+    shutil.rmtree(tree / 'a')
+    index.refresh(force=True)
+    assert _paths(index.query('*.py')) == ['b/new.py', 'top.py']
+
+
+def test_refresh_is_throttled(server_example, tree):
+    index = server_example.FileIndex(str(tree), min_interval=60)
+    index.query()
+    (tree / 'late.py').write_text('', encoding='utf-8')
+    assert 'late.py' not in _paths(index.query('*.py'))
+    assert index.stats['refreshes'] == 1
+
+
+def test_write_file_marks_directory_dirty(fs, tree):
+    fs.index.min_interval = 60
+    assert fs.index.query('top.py')[0]['size'] == len('import os\nTODO = 1\n')
+    # 覆盖已有文件不改变目录 mtime，依赖 write_file 标记目录
+    fs.call_tool('write_file', {'path': 'top.py', 'content': 'x' * 100})
+    assert fs.index.query('top.py')[0]['size'] == 100
+
+
+def test_search_files_tool_limits_output(fs):
+    text = fs.call_tool('search_files', {'pattern': '*', 'limit': 2})
+    assert text.startswith('找到 5 个')
+    assert '还有 3 个文件' in text
+    assert fs.call_tool('search_files', {'pattern': '*.rs'}).startswith('未找到')
+
+
+def test_grep_skips_binary_and_ignored_dirs(fs):
+    found = fs.grep('TODO')
+    assert [(m['path'].replace('\\', '/'), m['line']) for m in found['matches']] == [
+        ('a/deep/Notes.MD', 1), ('top.py', 2)]
+    assert found['binary_skipped'] == 1
+    assert found['files_scanned'] == 4
+    assert not found['truncated']
+
+
+def test_grep_ignore_case_regex_and_glob(fs):
+    found = fs.grep('todo', ignore_case=True, glob='*.py')
+    assert [m['path'].replace('\\', '/') for m in found['matches']] == ['a/one.py', 'top.py']
+    found = fs.grep(r'^def \w+', regex=True)
+    assert [m['text'] for m in found['matches']] == ['def one():']
+
+
+def test_grep_stops_at_max_matches(fs, tree):
+    (tree / 'many.txt').write_text('hit\n' * 50, encoding='utf-8')
+    found = fs.grep('hit', max_matches=10, workers=4)
+    assert len(found['matches']) == 10
+    assert found['truncated']
+
+
+def test_grep_files_tool(fs):
+    assert 'top.py:2: TODO = 1' in fs.call_tool('grep_files', {'query': 'TODO'})
+    assert fs.call_tool('grep_files', {'query': '(', 'regex': True}).startswith('错误: 无效的正则表达式')
+    assert fs.call_tool('grep_files', {'query': 'nothing-here'}).startswith("未找到 'nothing-here'")
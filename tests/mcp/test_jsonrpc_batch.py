@@ -0,0 +1,118 @@
+"""
+MCP 协议层：批量请求的服务端处理、客户端流水线与批量拆分
+"""
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def bench_server(protocol):
+    return protocol._create_bench_server()
+
+
+def test_batch_responses_skip_notifications(protocol, bench_server):
+    msg = protocol.JSONRPCMessage
+    batch = msg.create_batch([
+        ('tools/call', {'name': 'add', 'arguments': {'a': 1, 'b': 2}}),
+        ('tools/call', {'name': 'missing', 'arguments': {}}),
+        ('ping', None),
+    ])
+    batch.append(msg.create_notification('notifications/initialized'))
+    assert msg.parse_message(batch) == 'batch'
+
+    responses = bench_server.handle_message(batch)
+    assert [r['id'] for r in responses] == [1, 2, 3]
+    assert responses[0]['result']['content'][0]['text'] == '3'
+    assert responses[1]['error']['code'] == -32602
+    assert responses[2]['result'] == {}
+
+
+def test_empty_and_notification_only_batches(protocol, bench_server):
+    msg = protocol.JSONRPCMessage
+    assert bench_server.handle_message([])['error']['code'] == -32600
+    assert bench_server.handle_message([msg.create_notification('notifications/initialized')]) is None
+
+
+@pytest.mark.parametrize('message, code', [
+    ({'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call', 'params': [1, 2]}, -32602),
+    ({'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call', 'params': {'name': 'add', 'arguments': [1, 2]}}, -32602),
+    ({'jsonrpc': '2.0', 'id': 1, 'method': 'no/such'}, -32601),
+    ({'jsonrpc': '1.0', 'id': 1, 'method': 'ping'}, -32600),
+    ({'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call', 'params': {'name': 'add', 'arguments': {'a': 1}}}, -32603),
+])
+def test_error_codes(bench_server, message, code):
+    response = bench_server.handle_message(message)
+    assert response['id'] == 1
+    assert response['error']['code'] == code
+
+
+def test_invalid_entries_in_batch_do_not_affect_others(bench_server):
+    responses = bench_server.handle_message([
+        42,
+        {'jsonrpc': '2.0', 'id': 'x', 'method': 'tools/call', 'params': 'oops'},
+        {'jsonrpc': '2.0', 'id': 'y', 'method': 'ping'},
+    ])
+    assert [(r['id'], r.get('error', {}).get('code')) for r in responses] == [
+        (None, -32600), ('x', -32602), ('y', None)]
+
+
+def _run_client(protocol, scenario, latency=0.0, jitter=0.0):
+    async def main():
+        server = protocol.LocalJSONRPCServer(protocol._create_bench_server(), latency=latency, jitter=jitter)
+        address = await server.start()
+        client = protocol.MCPClient('test')
+        try:
+            return await scenario(server, client, address)
+        finally:
+            await client.close()
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def test_pipelined_requests_match_out_of_order_responses(protocol):
+    async def scenario(server, client, address):
+        await client.open(*address, max_in_flight=16)
+        results = await asyncio.gather(
+            *(client.call_remote_tool('add', {'a': i, 'b': 1}) for i in range(40)))
+        return results, client.stats
+
+    results, stats = _run_client(protocol, scenario, latency=0.005, jitter=0.9)
+    # 响应乱序到达时仍按 id 交给对应的请求
+    assert [r['content'][0]['text'] for r in results] == [str(i + 1) for i in range(40)]
+    assert 1 < stats['max_in_flight'] <= 16
+    assert stats['frames'] == 40
+
+
+def test_client_batch_splits_frames_and_keeps_order(protocol):
+    async def scenario(server, client, address):
+        await client.open(*address)
+        calls = [('tools/call', {'name': 'add', 'arguments': {'a': i, 'b': 1}}) for i in range(25)]
+        calls[7] = ('tools/call', {'name': 'missing', 'arguments': {}})
+        results = await client.batch(calls, max_batch=10)
+        return results, client.stats, server.frames
+
+    results, stats, frames = _run_client(protocol, scenario)
+    assert stats['frames'] == frames == 3
+    assert isinstance(results[7], protocol.JSONRPCError) and results[7].code == -32602
+    assert [r['content'][0]['text'] for i, r in enumerate(results) if i != 7] == [
+        str(i + 1) for i in range(25) if i != 7]
+
+
+def test_remote_error_raises_and_parse_error_is_reported(protocol):
+    async def scenario(server, client, address):
+        await client.open(*address)
+        with pytest.raises(protocol.JSONRPCError) as excinfo:
+            await client.request('no/such')
+        reader, writer = await asyncio.open_connection(*address)
+        writer.write(b'{broken\n')
+        await writer.drain()
+        parse_error = protocol.JSONRPCMessage.decode(await reader.readline())
+        writer.close()
+        return excinfo.value.code, parse_error
+
+    code, parse_error = _run_client(protocol, scenario)
+    assert code == -32601
+    assert parse_error['error']['code'] == -32700
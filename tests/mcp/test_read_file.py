@@ -0,0 +1,125 @@
+"""
+文件系统服务器的 read_file：字节/行范围、截断与续读、流式分块
+"""
+
+import base64
+
+import pytest
+
+
+@pytest.fixture
+def files(tmp_path):
+    lines = [f'line {i:05d} 中文\n' for i in range(1, 3001)]
+    (tmp_path / 'lines.txt').write_text(''.join(lines), encoding='utf-8')
+    # 超过 MMAP_THRESHOLD 的文件走 mmap
+    (tmp_path / 'big.txt').write_text(''.join(f'{i:07d}\n' for i in range(1, 200001)), encoding='utf-8')
+    (tmp_path / 'blob.bin').write_bytes(bytes(range(256)) * 20)
+    (tmp_path / 'sub').mkdir()
+    return tmp_path, lines
+
+
+@pytest.fixture
+def fs(server_example, files):
+    return server_example.FilesystemMCPServer(str(files[0]), max_read_bytes=4096)
+
+
+def _read(fs, **arguments):
+    return fs.call_tool('read_file', arguments)
+
+
+def test_line_range_across_index_checkpoints(fs, files):
+    _, lines = files
+    result = _read(fs, path='lines.txt', start_line=1500, end_line=1502)
+    assert result['content'] == ''.join(lines[1499:1502])
+    assert (result['start_line'], result['end_line']) == (1500, 1502)
+    assert not result['truncated']
+    # 索引缓存之后再读更早的行结果不变
+    assert _read(fs, path='lines.txt', start_line=2, end_line=2)['content'] == lines[1]
+
+
+def test_line_range_on_mmapped_file(fs):
+    result = _read(fs, path='big.txt', start_line=150000, end_line=150001)
+    assert result['content'] == '0150000\n0150001\n'
+    assert _read(fs, path='big.txt', start_line=200000)['content'] == '0200000\n'
+    assert _read(fs, path='big.txt', start_line=300000)['content'] == ''
+
+
+def test_truncated_line_read_resumes_with_next_line(fs, files):
+    _, lines = files
+    collected, start = [], 1
+    while True:
+        result = _read(fs, path='lines.txt', start_line=start, end_line=400)
+        collected.append(result['content'])
+        assert result['content'].endswith('\n')
+        if not result['truncated']:
+            break
+        assert result['next_offset'] == result['offset'] + result['length']
+        start = result['next_line']
+    assert len(collected) > 1
+    assert ''.join(collected) == ''.join(lines[:400])
+
+
+def test_byte_range_respects_utf8_boundaries(fs, files):
+    root, _ = files
+    data = (root / 'lines.txt').read_bytes()
+    # 'line 00001 ' 之后是多字节字符，范围的两端都落在字符中间
+    result = _read(fs, path='lines.txt', offset=12, length=5)
+    assert data[result['offset']:result['offset'] + result['length']].decode('utf-8') == result['content']
+    assert result['offset'] >= 12 and result['offset'] + result['length'] <= 17
+
+
+def test_byte_read_truncates_at_max_bytes(fs, files):
+    root, _ = files
+    result = _read(fs, path='lines.txt', max_bytes=100)
+    assert result['truncated'] and not result['eof']
+    assert result['length'] <= 100
+    rest = _read(fs, path='lines.txt', offset=result['next_offset'], length=50)
+    end = rest['offset'] + rest['length']
+    assert (result['content'] + rest['content']).encode('utf-8') == (root / 'lines.txt').read_bytes()[:end]
+
+
+def test_binary_files_are_base64(fs, files):
+    root, _ = files
+    result = _read(fs, path='blob.bin', offset=10, length=20)
+    assert result['encoding'] == 'base64'
+    assert base64.b64decode(result['content']) == (root / 'blob.bin').read_bytes()[10:30]
+    with pytest.raises(ValueError):
+        _read(fs, path='blob.bin', start_line=1)
+
+
+@pytest.mark.parametrize('arguments, error', [
+    ({'path': 'missing.txt'}, FileNotFoundError),
+    ({'path': 'sub'}, ValueError),
+    ({'path': 'lines.txt', 'offset': 5, 'start_line': 1}, ValueError),
+    ({'path': 'lines.txt', 'start_line': 5, 'end_line': 4}, ValueError),
+    ({'path': 'lines.txt', 'start_line': 5, 'end_line': 4, 'stream': True}, ValueError),
+])
+def test_invalid_requests_raise(fs, arguments, error):
+    with pytest.raises(error):
+        _read(fs, **arguments)
+
+
+def test_invalid_arguments_fail_schema(fs, server_example):
+    with pytest.raises(server_example.SchemaValidationError) as excinfo:
+        _read(fs, path='lines.txt', start_line=0)
+    assert excinfo.value.path == '.start_line'
+
+
+def test_stream_chunks_reassemble_the_range(fs, files):
+    _, lines = files
+    chunks = list(_read(fs, path='lines.txt', stream=True, chunk_bytes=1024))
+    assert len(chunks) > 1
+    assert [c['index'] for c in chunks] == list(range(len(chunks)))
+    assert [c['last'] for c in chunks] == [False] * (len(chunks) - 1) + [True]
+    # 分块只在字符边界切分，每块都能单独解码
+    assert all(c['length'] <= 1024 for c in chunks)
+    assert ''.join(c['content'] for c in chunks) == ''.join(lines)
+
+    ranged = list(_read(fs, path='lines.txt', stream=True, chunk_bytes=1024, start_line=10, end_line=200))
+    assert ''.join(c['content'] for c in ranged) == ''.join(lines[9:200])
+
+
+def test_stream_binary_chunks_concatenate(fs, files):
+    root, _ = files
+    chunks = list(_read(fs, path='blob.bin', stream=True, chunk_bytes=1024))
+    assert b''.join(base64.b64decode(c['content']) for c in chunks) == (root / 'blob.bin').read_bytes()
@@ -0,0 +1,115 @@
+"""
+JSON Schema 编译：错误位置、默认值补全、与逐次解释的结果一致
+"""
+
+import copy
+
+import pytest
+
+
+def _order(**overrides):
+    order = {'customer': {'name': 'Ann'}, 'items': [{'sku': 'A1'}, {'sku': 'B22', 'quantity': 3}]}
+    order.update(overrides)
+    return order
+
+
+INVALID_ORDERS = [
+    ({'items': [{'sku': 'A1'}]}, '.customer', '缺少必需参数'),
+    (_order(customer={'name': ''}), '.customer.name', '长度不能小于 1'),
+    (_order(customer={'name': 'Ann', 'level': 'gold'}), '.customer.level', '取值必须是'),
+    (_order(items=[]), '.items', '元素个数不能少于 1'),
+    (_order(items=[{'sku': 'A1'}, {'sku': 'bad'}]), '.items[1].sku', '不匹配模式'),
+    (_order(items=[{'sku': 'A1', 'quantity': 0}]), '.items[0].quantity', '不能小于 1'),
+    (_order(items=[{'sku': 'A1', 'quantity': True}]), '.items[0].quantity', '类型错误'),
+    (_order(items=[{'sku': 'A1', 'quantity': 1.5}]), '.items[0].quantity', '类型错误'),
+    (_order(items=[{'sku': 'A1', 'extra': 1}]), '.items[0].extra', '不允许的参数'),
+    (_order(note='x' * 201), '.note', '长度不能大于 200'),
+    ('not an object', '', '类型错误'),
+]
+
+
+@pytest.mark.parametrize('value, path, message', INVALID_ORDERS)
+def test_errors_carry_the_failing_path(protocol, value, path, message):
+    validate = protocol.compile_schema(protocol.ORDER_SCHEMA)
+    with pytest.raises(protocol.SchemaValidationError) as compiled:
+        validate(value)
+    assert compiled.value.path == path
+    assert message in compiled.value.message
+    assert str(compiled.value).startswith(f'${path}: ')
+
+    # 逐次解释的实现报告相同的位置和信息
+    with pytest.raises(protocol.SchemaValidationError) as interpreted:
+        protocol.interpret_schema(protocol.ORDER_SCHEMA, value)
+    assert (interpreted.value.path, interpreted.value.message) == (compiled.value.path, compiled.value.message)
+
+
+def test_defaults_are_filled_without_mutating_input(protocol):
+    validate = protocol.compile_schema(protocol.ORDER_SCHEMA)
+    order = _order()
+    original = copy.deepcopy(order)
+
+    result = validate(order)
+    assert result == protocol.interpret_schema(protocol.ORDER_SCHEMA, order)
+    assert result['customer']['level'] == 'normal'
+    assert [item['quantity'] for item in result['items']] == [1, 3]
+    assert order == original
+
+
+def test_valid_value_without_defaults_is_returned_as_is(protocol):
+    validate = protocol.compile_schema(protocol.ORDER_SCHEMA)
+    order = _order(customer={'name': 'Ann', 'level': 'vip'}, items=[{'sku': 'A1', 'quantity': 2}])
+    assert validate(order) is order
+
+
+def test_mutable_defaults_are_not_shared(protocol):
+    validate = protocol.compile_schema(
+        {'type': 'object', 'properties': {'tags': {'type': 'array', 'default': []}}})
+    first, second = validate({}), validate({})
+    first['tags'].append('x')
+    assert second['tags'] == []
+
+
+@pytest.mark.parametrize('schema, good, bad', [
+    ({'type': ['string', 'null']}, [None, 's'], [1, True]),
+    ({'type': 'number', 'exclusiveMinimum': 0, 'maximum': 10}, [0.5, 10], [0, 11, True, '1']),
+    ({'type': 'boolean'}, [True, False], [0, 'true']),
+    ({'const': 'x'}, ['x'], ['y']),
+    ({'type': 'object', 'additionalProperties': {'type': 'integer'}}, [{'a': 1}], [{'a': 'b'}]),
+    ({}, [1, 'x', None], []),
+])
+def test_compiled_and_interpreted_agree(protocol, schema, good, bad):
+    validate = protocol.compile_schema(schema)
+    for value in good:
+        assert validate(value) == protocol.interpret_schema(schema, value)
+    for value in bad:
+        with pytest.raises(protocol.SchemaValidationError):
+            validate(value)
+        with pytest.raises(protocol.SchemaValidationError):
+            protocol.interpret_schema(schema, value)
+
+
+def test_unknown_type_fails_at_compile_time(protocol):
+    with pytest.raises(ValueError):
+        protocol.compile_schema({'type': 'decimal'})
+
+
+def test_tool_definition_uses_compiled_validator(protocol):
+    tool = protocol.ToolDefinition('order', 'place an order', protocol.ORDER_SCHEMA)
+    assert tool.validate_params(_order()) == (True, '参数有效')
+    ok, message = tool.validate_params(_order(items=[{'sku': 'bad'}]))
+    assert not ok and message.startswith('$.items[0].sku')
+    assert tool.apply_schema(_order())['customer']['level'] == 'normal'
+
+
+def test_server_tools_validate_arguments_before_calling(server_example):
+    server = server_example.BasicMCPServer('test')
+    calls = []
+    server.register_tool('add', 'add', lambda a, b=2: calls.append((a, b)) or a + b,
+                         {'type': 'object', 'properties': {'a': {'type': 'integer'},
+                                                           'b': {'type': 'integer', 'default': 5}},
+                          'required': ['a']})
+    assert server.call_tool('add', {'a': 1}) == 6
+    with pytest.raises(server_example.SchemaValidationError) as excinfo:
+        server.call_tool('add', {'a': '1'})
+    assert excinfo.value.path == '.a'
+    assert calls == [(1, 5)]
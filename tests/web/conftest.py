@@ -0,0 +1,28 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+WEB_DIR = Path(__file__).resolve().parents[2] / 'web'
+
+
+@pytest.fixture(scope='session')
+def web_app(tmp_path_factory):
+    """使用数据目录临时副本的应用（整个测试会话只导入一次）"""
+    data_dir = tmp_path_factory.mktemp('web') / 'data'
+    shutil.copytree(WEB_DIR / 'data', data_dir, ignore=shutil.ignore_patterns(
+        '*.db', '*.db-*', '*.lock', '*.py', '*.bak', '*.snapshot', '.secret_key', 'users', 'profiles'))
+    os.environ['TUTORIAL_DATA_DIR'] = str(data_dir)
+    import app as web_app
+    web_app.app.config['TESTING'] = True
+    yield web_app
+    if web_app.progress_events is not None:
+        web_app.progress_events.close()
+    web_app.state_store.flush()
+
+
+@pytest.fixture
+def client(web_app):
+    """每个测试一个新会话（多学习者模式下即一个新学习者）"""
+    return web_app.app.test_client()
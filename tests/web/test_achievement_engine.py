@@ -0,0 +1,87 @@
+from datetime import date
+
+import pytest
+
+from achievement_engine import (AchievementEngine, EVENT_EXERCISE, EVENT_MODULE, EVENT_QUIZ, LearnerCounters,
+                                compile_rule)
+
+DEFINITIONS = [
+    {'id': 'first_module', 'condition': 'modules_completed >= 1'},
+    {'id': 'three_exercises', 'condition': 'exercises_completed >= 3'},
+    {'id': 'perfect', 'condition': 'perfect_quiz'},
+    {'id': 'basics', 'condition': 'all_basics_completed'},
+    {'id': 'streak3', 'condition': 'streak >= 3'},
+]
+
+
+def make_engine(**kwargs):
+    return AchievementEngine(DEFINITIONS, basics_ids=['a', 'b'], total_modules=3, **kwargs)
+
+
+def empty_progress():
+    return {'modules': {}, 'exercises': [], 'quizzes': [], 'learning_days': []}
+
+
+def test_compile_rule_rejects_bad_conditions():
+    with pytest.raises(ValueError):
+        compile_rule({'id': 'x', 'condition': 'modules_completed > 1'})
+    with pytest.raises(ValueError):
+        compile_rule({'id': 'x', 'condition': 'unknown_metric >= 1'})
+
+
+def test_events_unlock_only_once():
+    engine = make_engine()
+    unlocked = set()
+
+    def handle(event, payload):
+        new = engine.handle('alice', event, payload, unlocked, empty_progress)
+        unlocked.update(new)
+        return new
+
+    handle(EVENT_QUIZ, {'quiz_id': 'q0', 'score': 50})
+    for i in range(2):
+        assert handle(EVENT_EXERCISE, {'exercise_id': i}) == []
+    assert handle(EVENT_EXERCISE, {'exercise_id': 2}) == ['three_exercises']
+    # 重复提交同一道题不增加计数
+    assert handle(EVENT_EXERCISE, {'exercise_id': 2}) == []
+    assert handle(EVENT_QUIZ, {'quiz_id': 'q1', 'score': 100}) == ['perfect']
+    assert handle(EVENT_QUIZ, {'quiz_id': 'q2', 'score': 100}) == []
+    assert sorted(handle(EVENT_MODULE, {'module_id': 'a', 'status': 'completed'})) == ['first_module']
+    assert handle(EVENT_MODULE, {'module_id': 'b', 'status': 'completed'}) == ['basics']
+
+
+def test_counters_are_built_from_existing_progress():
+    progress = {
+        'modules': {'a': {'status': 'completed'}, 'b': {'status': 'completed'}},
+        'exercises': [{'id': 1}, {'id': 2}, {'id': 3}],
+        'quizzes': [{'id': 'q', 'score': 100}],
+        'learning_days': ['2024-05-01', '2024-05-02', '2024-05-03'],
+    }
+    engine = make_engine()
+    unlocked = engine.handle('bob', EVENT_EXERCISE, {'exercise_id': 3}, [], lambda: progress)
+    assert sorted(unlocked) == ['basics', 'first_module', 'perfect', 'streak3', 'three_exercises']
+
+
+def test_streak_resets_after_a_gap():
+    counters = LearnerCounters([], 1)
+    for day in (date(2024, 5, 1), date(2024, 5, 2), date(2024, 5, 2)):
+        counters.record_day(day)
+    assert counters.streak == 2
+    counters.record_day(date(2024, 5, 4))
+    assert counters.streak == 1
+
+
+def test_reset_rebuilds_counters_from_progress():
+    engine = make_engine()
+    loads = []
+
+    def load():
+        loads.append(1)
+        return empty_progress()
+
+    engine.handle('alice', EVENT_EXERCISE, {'exercise_id': 1}, [], load)
+    engine.handle('alice', EVENT_EXERCISE, {'exercise_id': 2}, [], load)
+    assert len(loads) == 1
+    engine.reset('alice')
+    engine.handle('alice', EVENT_EXERCISE, {'exercise_id': 3}, [], load)
+    assert len(loads) == 2
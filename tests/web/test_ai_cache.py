@@ -0,0 +1,65 @@
+import sqlite3
+import time
+
+from ai_cache import ResponseCache, make_cache_key
+
+
+def test_cache_key_ignores_whitespace_and_role_case():
+    a = make_cache_key('openai', 'gpt', [{'role': 'User', 'content': '  什么是\n装饰器 '}], temperature=None)
+    b = make_cache_key('openai', 'gpt', [{'role': 'user', 'content': '什么是 装饰器'}])
+    assert a == b
+    assert a != make_cache_key('openai', 'gpt', [{'role': 'user', 'content': '什么是 装饰器'}], temperature=0.5)
+    assert a != make_cache_key('claude', 'gpt', [{'role': 'user', 'content': '什么是 装饰器'}])
+
+
+def test_hit_miss_and_ttl():
+    cache = ResponseCache(ttl=0.05)
+    assert cache.get('k') is None
+    cache.set('k', 'reply')
+    assert cache.get('k') == 'reply'
+    time.sleep(0.06)
+    assert cache.get('k') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 0)
+
+
+def test_lru_eviction_by_bytes():
+    cache = ResponseCache(max_bytes=10)
+    cache.set('a', 'aaaa')
+    cache.set('b', 'bbbb')
+    cache.get('a')
+    cache.set('c', 'cccc')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'aaaa'
+    assert cache.stats()['evictions'] == 1
+    # 超过上限的单条回复不缓存
+    cache.set('big', 'x' * 11)
+    assert cache.get('big') is None
+
+
+def test_persistent_cache_is_shared(tmp_path):
+    path = tmp_path / 'ai_cache.db'
+    ResponseCache(persist_path=path).set('k', '持久化回复')
+    assert ResponseCache(persist_path=path).get('k') == '持久化回复'
+
+
+def test_persistent_cache_is_pruned_periodically(tmp_path):
+    path = tmp_path / 'ai_cache.db'
+    cache = ResponseCache(max_bytes=1000, persist_path=path)
+
+    def rows():
+        return sqlite3.connect(str(path)).execute('SELECT COUNT(*) FROM ai_cache').fetchone()[0]
+
+    # 每条 100 字节：累计写入达到上限的 1/4（第 3 条）时清理，其余写入不清理
+    for i in range(12):
+        cache.set(f'k{i}', 'x' * 100)
+    assert rows() == 10
+    cache.set('k12', 'x' * 100)
+    assert rows() == 11
+
+    big = ResponseCache(max_bytes=10 ** 9, persist_path=tmp_path / 'big.db')
+    for i in range(ResponseCache.PRUNE_EVERY - 1):
+        big.set(f'k{i}', 'x')
+    assert big._unpruned_writes == ResponseCache.PRUNE_EVERY - 1
+    big.set('last', 'x')
+    assert big._unpruned_writes == 0
@@ -0,0 +1,88 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ai_client import ClaudeProvider, OllamaProvider, OpenAIProvider, ProviderBusyError, ProviderRegistry
+
+OPENAI_STREAM = [
+    'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+    '',
+    'data: {"choices": [{"delta": {"content": "你好"}}]}',
+    'data: {"choices": [{"delta": {"content": "，世界"}}]}',
+    'data: [DONE]',
+    'data: {"choices": [{"delta": {"content": "不应出现"}}]}',
+]
+
+
+@pytest.fixture
+def sse_server():
+    """逐行返回 OPENAI_STREAM 的本地服务，记录收到的请求体"""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for line in OPENAI_STREAM:
+                self.wfile.write(line.encode('utf-8') + b'\n')
+                self.wfile.flush()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}', received
+    server.shutdown()
+    server.server_close()
+
+
+def test_openai_stream_lines():
+    provider = OpenAIProvider()
+    assert provider.parse_stream_line(': keep-alive') == (None, False)
+    assert provider.parse_stream_line('data: {"choices": [{"delta": {"content": "hi"}}]}') == ('hi', False)
+    assert provider.parse_stream_line('data: [DONE]') == (None, True)
+
+
+def test_claude_stream_lines():
+    provider = ClaudeProvider()
+    assert provider.parse_stream_line('event: content_block_delta') == (None, False)
+    delta = {'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': 'hi'}}
+    assert provider.parse_stream_line('data: ' + json.dumps(delta)) == ('hi', False)
+    assert provider.parse_stream_line('data: {"type": "message_stop"}') == (None, True)
+
+
+def test_ollama_stream_lines():
+    provider = OllamaProvider()
+    assert provider.parse_stream_line('{"message": {"content": "hi"}, "done": false}') == ('hi', False)
+    assert provider.parse_stream_line('{"message": {"content": ""}, "done": true}') == ('', True)
+
+
+def test_stream_chat_yields_deltas_until_done(sse_server):
+    base_url, received = sse_server
+    provider = OpenAIProvider(timeout=5)
+    chunks = list(provider.stream_chat([{'role': 'user', 'content': 'hi'}], {'base_url': base_url, 'api_key': 'k'}))
+    assert chunks == ['你好', '，世界']
+    assert received[0]['stream'] is True
+    # 生成器结束后释放并发名额
+    assert provider._slots.acquire(blocking=False)
+
+
+def test_busy_provider_fails_fast():
+    provider = OpenAIProvider(max_concurrency=1, acquire_timeout=0.01)
+    with provider._slot():
+        with pytest.raises(ProviderBusyError):
+            provider._slot()
+    with provider._slot():
+        pass
+
+
+def test_registry_reuses_providers():
+    registry = ProviderRegistry(max_concurrency=2)
+    assert registry.get('openai') is registry.get('openai')
+    assert registry.get('unknown') is None
@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmark import BASE_DIR as WEB_DIR, TRAFFIC_MIX, Workload, compare, percentile, run_load, summarize
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) == 0.0
+
+
+def test_workload_is_reproducible_with_seed():
+    a = Workload(['m1', 'm2'], ['e1'], ['q1'], seed=42)
+    b = Workload(['m1', 'm2'], ['e1'], ['q1'], seed=42)
+    assert [a.next_request() for _ in range(50)] == [b.next_request() for _ in range(50)]
+    labels = {label for _, label in TRAFFIC_MIX}
+    assert all(a.next_request()[0] in labels for _ in range(50))
+
+
+class _FakeClient:
+    def request(self, method, path, body):
+        if path.startswith('/api/search'):
+            raise ConnectionError('boom')
+        return 200 if method == 'GET' else 500
+
+
+def test_run_load_counts_latencies_and_errors():
+    workload = Workload(['m1'], ['e1'], ['q1'], seed=1)
+    samples, elapsed = run_load(_FakeClient(), workload, duration=0.2, concurrency=2, warmup=0.05)
+    assert 0.2 <= elapsed < 1.0
+    assert samples['GET /']['latencies'] and samples['GET /']['errors'] == 0
+    assert samples['GET /api/search']['latencies'] == [] and samples['GET /api/search']['errors'] > 0
+    assert samples['POST /api/progress/module/<module_id>']['errors'] > 0
+
+    result = summarize(samples, elapsed)
+    total = result['total']
+    assert total['requests'] == sum(len(s['latencies']) for s in samples.values())
+    assert total['rps'] == round(total['requests'] / elapsed, 2)
+    assert total['p50_ms'] <= total['p95_ms'] <= total['p99_ms']
+
+
+def test_compare_reports_regressions_beyond_threshold():
+    base = {'routes': {'GET /': {'requests': 100, 'errors': 0, 'rps': 100.0, 'p95_ms': 10.0}}}
+    ok = {'routes': {'GET /': {'requests': 100, 'errors': 0, 'rps': 90.0, 'p95_ms': 11.0}}}
+    slow = {'routes': {'GET /': {'requests': 50, 'errors': 2, 'rps': 50.0, 'p95_ms': 20.0}}}
+    assert compare(ok, base, 0.2) == []
+    regressions = compare(slow, base, 0.2)
+    assert len(regressions) == 3
+    assert any('p95' in r for r in regressions) and any('rps' in r for r in regressions)
+
+
+def test_in_process_benchmark_leaves_data_dir_untouched(tmp_path):
+    data_dir = WEB_DIR / 'data'
+    before = sorted(os.listdir(data_dir))
+    output = tmp_path / 'bench.json'
+    env = {k: v for k, v in os.environ.items() if k not in ('SECRET_KEY', 'TUTORIAL_DATA_DIR')}
+    proc = subprocess.run(
+        [sys.executable, str(WEB_DIR / 'benchmark.py'), '--duration', '0.5', '--warmup', '0',
+         '--concurrency', '2', '--seed', '1', '--output', str(output)],
+        env=env, capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    result = json.loads(output.read_text(encoding='utf-8'))
+    assert result['total']['requests'] > 0
+    assert result['total']['errors'] == 0
+    assert sorted(os.listdir(data_dir)) == before
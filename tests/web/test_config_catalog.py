@@ -0,0 +1,37 @@
+import pytest
+
+from config import (MODULES, CatalogError, ModuleCatalog, get_learning_path, get_module_info,
+                    get_prerequisites)
+
+MODULES_FIXTURE = [
+    {'id': 'a', 'category': 'x', 'order': 3},
+    {'id': 'b', 'category': 'x', 'order': 2},
+    {'id': 'c', 'category': 'y', 'order': 1},
+    {'id': 'd', 'category': 'y', 'order': 4},
+]
+
+
+def test_learning_path_respects_dependencies_then_order():
+    catalog = ModuleCatalog(MODULES_FIXTURE, ['x', 'y'], {'c': ['a'], 'd': ['c', 'b'], 'b': ['missing']})
+    assert [m['id'] for m in catalog.learning_path] == ['b', 'a', 'c', 'd']
+    assert catalog.prerequisites['d'] == ['b', 'a', 'c']
+    assert catalog.dependencies['b'] == []
+    assert catalog.unknown_dependencies == {'b': ['missing']}
+    assert [m['id'] for m in catalog.by_category['y']] == ['c', 'd']
+
+
+def test_dependency_cycle_is_rejected():
+    with pytest.raises(CatalogError) as exc:
+        ModuleCatalog(MODULES_FIXTURE, ['x', 'y'], {'a': ['c'], 'c': ['a']})
+    assert 'a, c' in str(exc.value)
+
+
+def test_builtin_catalog_is_consistent():
+    path = get_learning_path()
+    assert len(path) == len(MODULES)
+    seen = set()
+    for module in path:
+        assert set(get_prerequisites(module['id'])) <= seen
+        seen.add(module['id'])
+    assert get_module_info('functions')['name']
+    assert get_module_info('missing') is None
@@ -0,0 +1,128 @@
+import json
+
+import pytest
+
+from content_io import EMPTY_REPLACE_ERROR, INVALID_LINES_ERROR, export_jsonl, import_jsonl, main, validate_exercise
+from content_repo import ContentIndex
+
+
+def exercise(item_id, **extra):
+    return {'id': item_id, 'module': 'functions', 'title': f'题目 {item_id}', 'description': '描述',
+            'difficulty': 'easy', **extra}
+
+
+def lines(*items):
+    return [json.dumps(item, ensure_ascii=False) + '\n' for item in items]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / 'exercises.json'
+    items = [validate_exercise(exercise('e1')), validate_exercise(exercise('e2'))]
+    path.write_text(json.dumps(items, ensure_ascii=False), encoding='utf-8')
+    return ContentIndex(path, module_key='module')
+
+
+def stored(index):
+    return [item['id'] for item in json.loads(index.filepath.read_text(encoding='utf-8'))]
+
+
+def test_upsert_creates_updates_and_dedupes(index):
+    report = import_jsonl(index, 'exercises', lines(
+        exercise('e3', title='旧'), exercise('e1', points=20), exercise('e3', title='新'), exercise('e2')))
+    assert report['received'] == 4 and report['duplicates'] == 1
+    assert (report['created'], report['updated'], report['skipped']) == (1, 1, 1)
+    assert stored(index) == ['e1', 'e2', 'e3']
+    assert index.get('e3')['title'] == '新'
+    assert index.get('e1')['points'] == 20
+
+
+def test_skip_mode_keeps_existing(index):
+    report = import_jsonl(index, 'exercises', lines(exercise('e1', title='改'), exercise('e9')), mode='skip')
+    assert (report['created'], report['skipped']) == (1, 1)
+    assert index.get('e1')['title'] == '题目 e1'
+
+
+def test_invalid_line_rejects_whole_batch(index):
+    bad = lines(exercise('e5'), {'id': 'e6'}, exercise('e7', difficulty='impossible')) + ['not json\n']
+    report = import_jsonl(index, 'exercises', bad)
+    assert report['error'] == INVALID_LINES_ERROR
+    assert report['invalid'] == 3 and [e['line'] for e in report['errors']] == [2, 3, 4]
+    assert not report['written'] and stored(index) == ['e1', 'e2']
+
+    report = import_jsonl(index, 'exercises', bad, skip_invalid=True)
+    assert report['written'] and stored(index) == ['e1', 'e2', 'e5']
+
+
+def test_checks_must_be_a_string(index):
+    report = import_jsonl(index, 'exercises', lines(exercise('e5', checks=['assert True'])))
+    assert report['invalid'] == 1
+    assert 'checks' in report['errors'][0]['error']
+
+
+def test_replace_counts_and_refuses_to_empty(index):
+    report = import_jsonl(index, 'exercises', lines(exercise('e2'), exercise('e4')), mode='replace')
+    assert (report['created'], report['skipped'], report['removed']) == (1, 1, 1)
+    assert stored(index) == ['e2', 'e4']
+
+    report = import_jsonl(index, 'exercises', [], mode='replace')
+    assert report['error'] == EMPTY_REPLACE_ERROR and report['total'] is None
+    assert stored(index) == ['e2', 'e4']
+
+    report = import_jsonl(index, 'exercises', [], mode='replace', allow_empty=True)
+    assert report['written'] and stored(index) == []
+
+
+def test_replace_with_new_order_is_written(index):
+    report = import_jsonl(index, 'exercises', lines(exercise('e2'), exercise('e1')), mode='replace')
+    assert report['written'] and report['skipped'] == 2
+    assert stored(index) == ['e2', 'e1']
+
+
+def test_dry_run_does_not_write(index):
+    report = import_jsonl(index, 'exercises', lines(exercise('e3')), dry_run=True)
+    assert report['created'] == 1 and not report['written']
+    assert stored(index) == ['e1', 'e2']
+
+
+def test_quiz_answer_is_normalized(tmp_path):
+    index = ContentIndex(tmp_path / 'quizzes.json', module_key='module_id')
+    quiz = {'id': 'q1', 'module_id': 'functions', 'question': '?', 'options': ['a', 'b'], 'answer': ' b '}
+    assert import_jsonl(index, 'quizzes', lines(quiz))['created'] == 1
+    assert index.get('q1')['answer'] == 'B'
+    quiz['answer'] = 'C'
+    assert import_jsonl(index, 'quizzes', lines(quiz))['invalid'] == 1
+
+
+def test_export_round_trip(index):
+    exported = list(export_jsonl(index.all()))
+    assert all(line.endswith('\n') for line in exported)
+    assert [json.loads(line) for line in exported] == index.all()
+
+
+def test_command_line_import_and_export(tmp_path, capsys):
+    (tmp_path / 'new.jsonl').write_text(''.join(lines(exercise('e1'))), encoding='utf-8')
+    assert main(['--data-dir', str(tmp_path), 'import', 'exercises', str(tmp_path / 'new.jsonl')]) == 0
+    (tmp_path / 'empty.jsonl').write_text('', encoding='utf-8')
+    assert main(['--data-dir', str(tmp_path), 'import', 'exercises', str(tmp_path / 'empty.jsonl'),
+                 '--mode', 'replace']) == 1
+    assert EMPTY_REPLACE_ERROR in capsys.readouterr().out
+    output = tmp_path / 'out.jsonl'
+    assert main(['--data-dir', str(tmp_path), 'export', 'exercises', '-o', str(output)]) == 0
+    assert [json.loads(line)['id'] for line in output.read_text(encoding='utf-8').splitlines()] == ['e1']
+
+
+def test_http_import_and_export_hide_checks(client):
+    body = ''.join(lines(exercise('io_test_1', checks='assert True'), exercise('io_test_2')))
+    response = client.post('/api/exercises/import', data=body.encode('utf-8'))
+    assert response.status_code == 200
+    assert response.get_json()['created'] == 2
+
+    exported = [json.loads(line) for line in client.get('/api/exercises/export?module=functions').get_data(as_text=True).splitlines()]
+    ids = [item['id'] for item in exported]
+    assert 'io_test_1' in ids and 'io_test_2' in ids
+    assert all('checks' not in item for item in exported)
+
+    response = client.post('/api/exercises/import?mode=replace', data=b'')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == EMPTY_REPLACE_ERROR
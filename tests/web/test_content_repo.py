@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from content_repo import ContentIndex, ContentRepository, public_item
+
+EXERCISES = [
+    {'id': 1, 'module': 'functions', 'difficulty': 'easy', 'tags': ['def', 'args']},
+    {'id': 2, 'module': 'functions', 'difficulty': 'hard', 'tags': ['closure']},
+    {'id': 3, 'module': 'data_types', 'difficulty': 'easy', 'tags': ['args'], 'checks': 'assert f() == 1'},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / 'exercises.json'
+    path.write_text(json.dumps(EXERCISES), encoding='utf-8')
+    return ContentIndex(path, module_key='module')
+
+
+def test_lookup_by_id_and_position(index):
+    assert index.get('2')['tags'] == ['closure']
+    assert index.get(2) is index.get('2')
+    assert index.position(3) == 2
+    assert index.get(99) is None and index.position(99) is None
+
+
+def test_filter_combines_conditions(index):
+    assert [e['id'] for e in index.filter(module='functions')] == [1, 2]
+    assert [e['id'] for e in index.filter(difficulty='easy', tag='args')] == [1, 3]
+    assert [e['id'] for e in index.filter(module='functions', tags=['def', 'args'])] == [1]
+    assert index.filter(module='functions', tag='missing') == []
+    assert len(index.filter()) == 3
+
+
+def test_external_file_change_reloads(index):
+    generation = index.generation
+    assert index.get(4) is None
+    index.filepath.write_text(json.dumps(EXERCISES + [{'id': 4, 'module': 'functions'}]), encoding='utf-8')
+    assert index.get(4) is not None
+    assert index.generation > generation
+    assert len(index.by_module('functions')) == 3
+
+
+def test_replace_rebuilds_indexes(index):
+    index.replace([{'id': 7, 'module': 'closures', 'tags': ['new']}])
+    assert [e['id'] for e in index.by_tag('new')] == [7]
+    assert index.get(1) is None
+
+
+def test_missing_file_is_empty(tmp_path):
+    repo = ContentRepository(tmp_path)
+    assert repo.exercises.all() == []
+    assert repo.quizzes.version == 'empty'
+
+
+def test_public_item_strips_hidden_fields():
+    item = EXERCISES[2]
+    assert 'checks' not in public_item(item)
+    assert 'checks' in item
+    assert public_item(EXERCISES[0]) is EXERCISES[0]
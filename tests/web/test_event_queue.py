@@ -0,0 +1,97 @@
+import threading
+import time
+
+from achievement_engine import EVENT_EXERCISE, EVENT_MODULE
+from event_queue import ProgressEventQueue
+
+
+class Recorder:
+    def __init__(self, block_user=None):
+        self.batches = []
+        self.applied = []
+        self.block_user = block_user
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def write_batch(self, user_id, events):
+        if user_id == self.block_user:
+            self.entered.set()
+            assert self.release.wait(5)
+        if user_id == 'broken':
+            raise RuntimeError('写入失败')
+        self.batches.append((user_id, [(event, payload) for event, payload, _at in events]))
+
+    def on_applied(self, user_id, event, payload):
+        self.applied.append((user_id, event))
+
+
+def test_batches_are_grouped_by_user_and_coalesced():
+    recorder = Recorder()
+    events = ProgressEventQueue(recorder.write_batch, recorder.on_applied, linger=0.1)
+    events.put('alice', EVENT_MODULE, module_id='m1', status='in_progress')
+    events.put('bob', EVENT_EXERCISE, exercise_id='e1', correct=True)
+    events.put('alice', EVENT_MODULE, module_id='m1', status='completed')
+    events.put('alice', EVENT_EXERCISE, exercise_id='e2', correct=False)
+    assert events.flush(timeout=5)
+
+    assert recorder.batches == [
+        ('alice', [(EVENT_MODULE, {'module_id': 'm1', 'status': 'completed'}),
+                   (EVENT_EXERCISE, {'exercise_id': 'e2', 'correct': False})]),
+        ('bob', [(EVENT_EXERCISE, {'exercise_id': 'e1', 'correct': True})]),
+    ]
+    # 合并只影响写入，统计/成就仍收到每个事件
+    assert len(recorder.applied) == 4
+    assert events.stats() == {'pending': 0, 'batches': 1, 'events': 4, 'coalesced': 1, 'errors': 0}
+    events.close()
+
+
+def test_flush_waits_only_for_that_users_events():
+    recorder = Recorder(block_user='slow')
+    events = ProgressEventQueue(recorder.write_batch, linger=0.1)
+    events.put('fast', EVENT_EXERCISE, exercise_id='e1', correct=True)
+    events.put('slow', EVENT_EXERCISE, exercise_id='e2', correct=True)
+    assert recorder.entered.wait(5)
+
+    started = time.monotonic()
+    assert events.flush('fast', timeout=5)
+    assert events.flush('idle', timeout=5)
+    assert time.monotonic() - started < 1
+    assert not events.flush('slow', timeout=0.05)
+    assert not events.flush(timeout=0.05)
+
+    recorder.release.set()
+    assert events.flush('slow', timeout=5)
+    events.close()
+
+
+def test_failed_write_does_not_block_other_users():
+    recorder = Recorder()
+    events = ProgressEventQueue(recorder.write_batch, linger=0.05)
+    events.put('broken', EVENT_EXERCISE, exercise_id='e1', correct=True)
+    events.put('alice', EVENT_EXERCISE, exercise_id='e1', correct=True)
+    assert events.flush(timeout=5)
+    assert [user for user, _ in recorder.batches] == ['alice']
+    assert events.stats()['errors'] == 1
+    events.close()
+
+
+def test_close_drains_queue_then_writes_synchronously():
+    recorder = Recorder()
+    events = ProgressEventQueue(recorder.write_batch, linger=0.5)
+    events.put('alice', EVENT_EXERCISE, exercise_id='e1', correct=True)
+    events.close()
+    assert recorder.batches == [('alice', [(EVENT_EXERCISE, {'exercise_id': 'e1', 'correct': True})])]
+
+    events.put('alice', EVENT_EXERCISE, exercise_id='e2', correct=True)
+    assert len(recorder.batches) == 2
+    assert events.stats()['pending'] == 0
+
+
+def test_progress_is_visible_right_after_submit(client):
+    """读己之写：提交后立即读取进度能看到刚写入的事件"""
+    for i in range(5):
+        assert client.post('/api/progress/module/functions', json={'status': 'completed'}).status_code == 200
+        response = client.post(f'/api/exercises/rw_test_{i}/complete', json={'correct': True})
+        assert response.status_code == 200
+        exercises = client.get('/api/progress').get_json()['exercises']
+        assert f'rw_test_{i}' in {str(e['id']) for e in exercises}
@@ -0,0 +1,75 @@
+import pytest
+
+from grader import GraderBusyError, GradingEngine, normalize_output
+
+EXERCISE = {
+    'id': 'ex1',
+    'checks': 'assert add(2, 3) == 5\nassert add(-1, 1) == 0',
+}
+
+
+@pytest.fixture(scope='module')
+def engine():
+    # 本机开发模式（不隔离），只用于测试判定逻辑
+    engine = GradingEngine(workers=2, queue_size=8, timeout=1, sandbox='none')
+    yield engine
+    engine.shutdown()
+
+
+def test_checks_pass_and_fail(engine):
+    assert engine.grade(EXERCISE, 'def add(a, b):\n    return a + b')['verdict'] == 'passed'
+    result = engine.grade(EXERCISE, 'def add(a, b):\n    return a - b')
+    assert result['verdict'] == 'failed' and not result['passed']
+    assert 'AssertionError' in result['error']
+
+
+@pytest.mark.parametrize('code', [
+    'raise SystemExit(0)',
+    'import sys\nsys.exit()',
+    'exit()',
+    'def add(a, b):\n    return a + b\nraise SystemExit',
+])
+def test_early_exit_does_not_pass(engine, code):
+    result = engine.grade(EXERCISE, code)
+    assert result['verdict'] == 'error'
+    assert not result['passed']
+
+
+def test_replacing_exec_does_not_skip_checks(engine):
+    code = 'import builtins\nbuiltins.exec = lambda *a, **k: None\nbuiltins.compile = lambda *a, **k: None'
+    result = engine.grade(EXERCISE, code)
+    assert not result['passed']
+    assert result['verdict'] == 'failed'
+
+
+def test_output_compared_with_solution(engine):
+    exercise = {'id': 'ex2', 'solution': 'for i in range(3):\n    print(i)'}
+    assert engine.grade(exercise, 'print("0\\n1\\n2  ")')['verdict'] == 'passed'
+    assert engine.grade(exercise, 'print(0)')['verdict'] == 'failed'
+    nondeterministic = {'id': 'ex3', 'solution': 'import random\nprint(random.random())'}
+    assert engine.grade(nondeterministic, 'print(1)')['verdict'] == 'ungradable'
+
+
+def test_infinite_loop_times_out(engine):
+    result = engine.grade({'id': 'ex4', 'checks': 'pass'}, 'while True:\n    pass')
+    assert result['verdict'] == 'timeout'
+    # worker 在超时后仍可继续评测
+    assert engine.grade(EXERCISE, 'def add(a, b):\n    return a + b')['passed']
+
+
+def test_full_queue_fails_fast():
+    engine = GradingEngine(workers=1, queue_size=1, timeout=2, sandbox='none')
+    try:
+        futures = [engine.submit('import time\ntime.sleep(0.5)')]
+        with pytest.raises(GraderBusyError):
+            for _ in range(5):
+                futures.append(engine.submit('pass'))
+        assert engine.stats()['rejected'] == 1
+        assert futures[0].result(timeout=10)['status'] == 'ok'
+    finally:
+        engine.shutdown()
+
+
+def test_normalize_output():
+    assert normalize_output('a  \nb\t\n\n') == 'a\nb'
+    assert normalize_output(None) == ''
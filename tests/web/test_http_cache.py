@@ -0,0 +1,104 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, jsonify, url_for
+
+import http_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    static = tmp_path / 'static'
+    static.mkdir()
+    (static / 'app.js').write_text('console.log(1);\n' * 200, encoding='utf-8')
+    app = Flask(__name__, static_folder=str(static))
+    app.calls = 0
+    app.version = 'v1'
+
+    @app.route('/items')
+    @http_cache.conditional(lambda: app.version)
+    def items():
+        app.calls += 1
+        return jsonify({'items': [{'id': i, 'title': f'item {i}'} for i in range(200)]})
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    app.body_cache = http_cache.init_app(app, min_size=1024)
+    return app
+
+
+def test_etag_match_returns_304_without_running_view(app):
+    client = app.test_client()
+    first = client.get('/items')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and app.calls == 1
+    assert 'no-cache' in first.headers['Cache-Control']
+
+    second = client.get('/items', headers={'If-None-Match': etag})
+    assert second.status_code == 304 and second.data == b''
+    assert app.calls == 1
+
+    app.version = 'v2'
+    assert client.get('/items', headers={'If-None-Match': etag}).status_code == 200
+    assert app.calls == 2
+
+
+def test_gzip_response_and_encoded_etag(app):
+    client = app.test_client()
+    response = client.get('/items', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data))['items'][0]['id'] == 0
+    etag = response.headers['ETag']
+    assert etag.endswith('-gzip"')
+
+    revalidated = client.get('/items', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert revalidated.status_code == 304
+
+    # 强 ETag 的响应压缩结果被缓存
+    client.get('/items', headers={'Accept-Encoding': 'gzip'})
+    assert app.body_cache.stats()['hits'] >= 1
+
+
+def test_small_or_unaccepted_responses_are_not_compressed(app):
+    client = app.test_client()
+    assert 'Content-Encoding' not in client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/items').headers
+
+
+@pytest.mark.skipif(http_cache.brotli is None, reason='未安装 brotli')
+def test_brotli_preferred_when_accepted(app):
+    response = app.test_client().get('/items', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(http_cache.brotli.decompress(response.data))['items']
+
+
+def test_fingerprinted_static_files_are_immutable(app):
+    with app.test_request_context():
+        url = url_for('static', filename='app.js')
+    assert '?v=' in url
+    client = app.test_client()
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+    response.close()
+
+    stale = client.get('/static/app.js?v=000000000000')
+    assert 'immutable' not in stale.headers.get('Cache-Control', '')
+    stale.close()
+
+
+def test_fingerprint_rejects_paths_outside_static(app):
+    fingerprints = http_cache.StaticFingerprints(app.static_folder)
+    assert fingerprints.get('../outside.txt') is None
+    assert fingerprints.get('missing.js') is None
+
+
+def test_content_api_etag(client):
+    first = client.get('/api/exercises')
+    assert first.status_code == 200
+    assert client.get('/api/exercises', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
@@ -0,0 +1,88 @@
+from achievement_engine import EVENT_EXERCISE, EVENT_MODULE, EVENT_QUIZ
+from learning_stats import LearnerStats, StatsAggregator, score_bucket
+
+MODULES = [
+    {'id': 'm1', 'category': 'basic'},
+    {'id': 'm2', 'category': 'basic'},
+    {'id': 'm3', 'category': 'advanced'},
+]
+ITEM_MODULES = {'e1': 'm1', 'e2': 'm2', 'q1': 'm1', 'q2': 'm3'}
+
+
+def module_of(kind, item_id):
+    return ITEM_MODULES.get(str(item_id))
+
+
+def test_score_buckets():
+    assert [score_bucket(s) for s in (100, 99, 80, 79, 60, 0)] == ['100', '80-99', '80-99', '60-79', '60-79', '0-59']
+
+
+def test_incremental_updates_match_rebuild_from_progress():
+    categories = {m['id']: m['category'] for m in MODULES}
+    totals = {'basic': 2, 'advanced': 1}
+    stats = LearnerStats(categories, totals)
+    day = '2024-05-01'
+    stats.on_module('m1', 'in_progress', day)
+    stats.on_module('m1', 'completed', day)
+    stats.on_module('m3', 'in_progress', day)
+    stats.on_exercise('e1', False, 'm1', day)
+    stats.on_exercise('e1', True, 'm1', day)
+    stats.on_exercise('e1', False, 'm1', day)
+    stats.on_exercise('e2', False, 'm2', day)
+    stats.on_quiz('q1', 70, 'm1', day)
+    stats.on_quiz('q1', 100, 'm1', day)
+    stats.on_quiz('q1', 80, 'm1', day)
+    stats.on_quiz('q2', 50, 'm3', day)
+    snapshot = stats.snapshot()
+
+    assert snapshot['modules']['completed'] == 1
+    assert snapshot['modules']['in_progress'] == 1
+    assert snapshot['categories']['basic']['completion_rate'] == 50.0
+    assert snapshot['exercises']['attempted'] == 2
+    assert snapshot['exercises']['correct_rate'] == 50.0
+    assert snapshot['quizzes']['average_score'] == 75.0
+    assert snapshot['quizzes']['perfect'] == 1
+    assert snapshot['quizzes']['distribution'] == {'0-59': 1, '60-79': 0, '80-99': 0, '100': 1}
+    assert snapshot['activity']['daily'] == [{'date': day, 'modules': 2, 'exercises': 2, 'quizzes': 2}]
+
+    progress = {
+        'modules': {'m1': {'status': 'completed', 'updated_at': day + 'T10:00:00'},
+                    'm3': {'status': 'in_progress', 'updated_at': day + 'T10:00:00'}},
+        'exercises': [{'id': 'e1', 'correct': True, 'completed_at': day}, {'id': 'e2', 'correct': False, 'completed_at': day}],
+        'quizzes': [{'id': 'q1', 'score': 100, 'completed_at': day}, {'id': 'q2', 'score': 50, 'completed_at': day}],
+        'learning_days': [day],
+    }
+    assert LearnerStats.from_progress(progress, categories, totals, module_of).snapshot() == snapshot
+
+
+def test_activity_moves_to_latest_day():
+    stats = LearnerStats({'m1': 'basic'}, {'basic': 1})
+    stats.on_quiz('q1', 60, 'm1', '2024-05-01')
+    stats.on_quiz('q1', 90, 'm1', '2024-05-02')
+    daily = stats.snapshot()['activity']['daily']
+    assert [(d['date'], d['quizzes']) for d in daily] == [('2024-05-01', 0), ('2024-05-02', 1)]
+
+
+def test_aggregator_builds_once_then_applies_events():
+    aggregator = StatsAggregator(MODULES, module_of)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return {'modules': {}, 'exercises': [], 'quizzes': [], 'learning_days': []}
+
+    # 统计尚未建立时事件被忽略，首次读取时从进度构建
+    aggregator.handle('alice', EVENT_QUIZ, {'quiz_id': 'q1', 'score': 100})
+    assert aggregator.get('alice', load)['quizzes']['completed'] == 0
+    aggregator.handle('alice', EVENT_QUIZ, {'quiz_id': 'q1', 'score': 100})
+    aggregator.handle('alice', EVENT_EXERCISE, {'exercise_id': 'e1', 'correct': True})
+    aggregator.handle('alice', EVENT_MODULE, {'module_id': 'm1', 'status': 'completed'})
+    stats = aggregator.get('alice', load)
+    assert len(loads) == 1
+    assert stats['quizzes']['by_module'] == {'m1': {'completed': 1, 'average_score': 100.0}}
+    assert stats['exercises']['by_module']['m1']['correct'] == 1
+    assert stats['modules']['completed'] == 1
+
+    aggregator.reset('alice')
+    aggregator.get('alice', load)
+    assert len(loads) == 2
@@ -0,0 +1,62 @@
+import time
+
+from flask import Flask
+
+import metrics
+from metrics import MetricsRegistry, SlowRequestProfiler, timed
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', '耗时', ('route',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, route='/x')
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="/x",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/x",le="1"} 3' in text
+    assert 'latency_seconds_bucket{route="/x",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/x"} 4' in text
+    assert 'latency_seconds_sum{route="/x"} 6.05' in text
+
+
+def test_counter_labels_are_escaped_and_collectors_rendered():
+    registry = MetricsRegistry()
+    counter = registry.counter('writes', '写入', ('file',))
+    counter.inc(3, file='a"b\\c')
+    counter.inc(2, file='a"b\\c')
+    registry.register_collector(lambda: [('queue_depth', 'gauge', '队列深度', [({}, 7)])])
+    text = registry.render()
+    assert 'writes_total{file="a\\"b\\\\c"} 5' in text
+    assert '# TYPE queue_depth gauge\nqueue_depth 7' in text
+
+
+def test_timed_observes_duration():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('op_seconds', '耗时', ('op',))
+    with timed(histogram, op='load'):
+        time.sleep(0.01)
+    (_, state), = histogram._values.items()
+    assert state[-1] == 1 and state[-2] >= 0.01
+
+
+def test_request_metrics_and_slow_request_profile(tmp_path):
+    app = Flask(__name__)
+
+    @app.route('/metrics-test/<int:n>')
+    def slow(n):
+        time.sleep(n / 1000)
+        return 'ok'
+
+    profiler = SlowRequestProfiler(tmp_path, threshold_ms=50, interval_ms=1)
+    metrics.init_app(app, profiler)
+    client = app.test_client()
+    assert client.get('/metrics-test/1').status_code == 200
+    assert not list(tmp_path.iterdir())
+    client.get('/metrics-test/100')
+
+    text = metrics.registry.render()
+    assert 'tutorial_http_requests_total{method="GET",route="/metrics-test/<int:n>",status="200"} 2' in text
+    dumps = list(tmp_path.glob('*.folded'))
+    assert len(dumps) == 1
+    assert 'test_metrics.py:slow' in dumps[0].read_text(encoding='utf-8')
@@ -0,0 +1,55 @@
+"""多个 worker 进程共享同一份状态文件 / 数据库时不丢更新"""
+
+import json
+import multiprocessing
+
+import pytest
+
+from progress_store import SQLiteProgressBackend
+from state_store import JSONStateStore, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None or 'fork' not in multiprocessing.get_all_start_methods(),
+                                reason='需要 fcntl 和 fork')
+
+
+def _bump_json(path, times):
+    store = JSONStateStore(multiprocess=True)
+
+    def bump(data):
+        data['count'] += 1
+
+    for _ in range(times):
+        store.update(path, bump, default_factory=lambda: {'count': 0})
+
+
+def _mark_exercises(db_path, worker, times):
+    backend = SQLiteProgressBackend(db_path)
+    for i in range(times):
+        backend.mark_exercise(f'{worker}-{i}', True, 'alice')
+
+
+def _run(target, args_list):
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=target, args=args) for args in args_list]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(timeout=60)
+    assert [p.exitcode for p in procs] == [0] * len(procs)
+
+
+def test_json_state_updates_across_processes(tmp_path):
+    path = tmp_path / 'progress.json'
+    parent = JSONStateStore(multiprocess=True)
+    parent.update(path, lambda data: None, default_factory=lambda: {'count': 0})
+    _run(_bump_json, [(path, 50)] * 4)
+    assert json.loads(path.read_text(encoding='utf-8')) == {'count': 200}
+    # 父进程中已缓存的旧数据按文件签名失效
+    assert parent.get(path) == {'count': 200}
+
+
+def test_sqlite_progress_across_processes(tmp_path):
+    db_path = tmp_path / 'progress.db'
+    SQLiteProgressBackend(db_path)
+    _run(_mark_exercises, [(db_path, n, 25) for n in range(4)])
+    assert len(SQLiteProgressBackend(db_path).get_progress('alice')['exercises']) == 100
@@ -0,0 +1,85 @@
+from urllib.parse import urlsplit
+
+import pytest
+
+from pagination import CursorError, decode_cursor, encode_cursor, paginate, parse_list, project
+
+ITEMS = [{'id': f'e{i}', 'title': f'题目 {i}', 'solution': 'x'} for i in range(10)]
+
+
+def positions(items):
+    table = {item['id']: i for i, item in enumerate(items)}
+    return table.get
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('ex_中文', 42)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == ('ex_中文', 42)
+
+
+@pytest.mark.parametrize('cursor', ['!!!', 'e30', encode_cursor('a', 1)[:-3]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor)
+
+
+def test_pages_cover_all_items_once():
+    seen, cursor = [], ''
+    while True:
+        page, cursor = paginate(ITEMS, cursor, 3, positions(ITEMS))
+        seen.extend(item['id'] for item in page)
+        if cursor is None:
+            break
+    assert seen == [item['id'] for item in ITEMS]
+
+
+def test_deleting_items_between_pages_does_not_skip_or_repeat():
+    page, cursor = paginate(ITEMS, '', 4, positions(ITEMS))
+    assert [item['id'] for item in page] == ['e0', 'e1', 'e2', 'e3']
+    # 翻页期间删除了前面的题目：按游标中的 ID 定位
+    remaining = [item for item in ITEMS if item['id'] != 'e1']
+    page, _ = paginate(remaining, cursor, 4, positions(remaining))
+    assert [item['id'] for item in page] == ['e4', 'e5', 'e6', 'e7']
+    # 游标所在的题目被删除：退回使用游标记录的位置
+    remaining = [item for item in ITEMS if item['id'] != 'e3']
+    page, _ = paginate(remaining, cursor, 4, positions(remaining))
+    assert [item['id'] for item in page] == ['e4', 'e5', 'e6', 'e7']
+
+
+def test_inserting_items_between_pages():
+    page, cursor = paginate(ITEMS, '', 5, positions(ITEMS))
+    grown = [{'id': 'new'}] + ITEMS
+    page, _ = paginate(grown, cursor, 5, positions(grown))
+    assert page[0]['id'] == 'e5'
+
+
+def test_project_keeps_id_and_drops_hidden_fields():
+    items = [{'id': 1, 'title': 't', 'checks': 'assert 1', 'solution': 's'}]
+    assert project(items, ['title', 'checks'], hidden=('checks',)) == [{'id': 1, 'title': 't'}]
+    assert project(items, [], hidden=('checks',)) == [{'id': 1, 'title': 't', 'solution': 's'}]
+    assert project(items, []) is items
+    assert parse_list(' a, b,,c ') == ['a', 'b', 'c']
+
+
+def test_api_cursor_walk_follows_link_header(client):
+    total, seen, url = None, [], '/api/exercises?cursor=&limit=7&fields=title,checks'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        total = int(response.headers['X-Total-Count'])
+        page = response.get_json()
+        assert all(set(item) <= {'id', 'title'} for item in page)
+        seen.extend(item['id'] for item in page)
+        link = response.headers.get('Link')
+        url = None
+        if link:
+            parts = urlsplit(link[1:link.index('>')])
+            url = f'{parts.path}?{parts.query}'
+    assert len(seen) == len(set(seen)) == total
+
+
+def test_api_rejects_bad_cursor(client):
+    response = client.get('/api/quizzes?cursor=not-a-cursor')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,82 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from achievement_engine import EVENT_MODULE, EVENT_EXERCISE, EVENT_QUIZ
+from state_store import state_store
+from progress_store import JSONProgressBackend, SQLiteProgressBackend, migrate_json_to_sqlite
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'json':
+        return JSONProgressBackend(tmp_path / 'progress.json', path_for=lambda u: tmp_path / 'users' / f'{u}.json')
+    return SQLiteProgressBackend(tmp_path / 'progress.db')
+
+
+def test_exercise_only_changes_from_wrong_to_right(backend):
+    backend.mark_exercise('e1', False, 'alice')
+    backend.mark_exercise('e1', True, 'alice')
+    backend.mark_exercise('e1', False, 'alice')
+    exercises = backend.get_progress('alice')['exercises']
+    assert [(str(e['id']), e['correct']) for e in exercises] == [('e1', True)]
+
+
+def test_quiz_keeps_best_score(backend):
+    backend.mark_quiz('q1', 60, 'alice')
+    backend.mark_quiz('q1', 90, 'alice')
+    backend.mark_quiz('q1', 70, 'alice')
+    assert [q['score'] for q in backend.get_progress('alice')['quizzes']] == [90]
+
+
+def test_module_status_records_learning_day(backend):
+    at = datetime(2024, 5, 1, 9, 30)
+    backend.set_module_status('functions', 'completed', 'alice', at)
+    progress = backend.get_progress('alice')
+    assert progress['modules']['functions']['status'] == 'completed'
+    assert progress['learning_days'] == ['2024-05-01']
+    assert progress['last_visit'] == at.isoformat()
+
+
+def test_users_are_isolated(backend):
+    backend.mark_quiz('q1', 80, 'alice')
+    assert backend.get_progress('bob')['quizzes'] == []
+
+
+def test_apply_events_writes_whole_batch(backend):
+    backend.apply_events([
+        (EVENT_MODULE, {'module_id': 'functions', 'status': 'in_progress'}, None),
+        (EVENT_EXERCISE, {'exercise_id': 'e1', 'correct': True}, None),
+        (EVENT_QUIZ, {'quiz_id': 'q1', 'score': 100}, None),
+    ], 'alice')
+    progress = backend.get_progress('alice')
+    assert progress['modules']['functions']['status'] == 'in_progress'
+    assert len(progress['exercises']) == 1
+    assert progress['quizzes'][0]['score'] == 100
+
+
+def test_concurrent_writes_are_not_lost(backend):
+    def worker(n):
+        for i in range(25):
+            backend.mark_exercise(f'{n}-{i}', True, 'alice')
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(backend.get_progress('alice')['exercises']) == 100
+
+
+def test_migrate_json_to_sqlite(tmp_path):
+    source = JSONProgressBackend(tmp_path / 'progress.json')
+    source.set_module_status('functions', 'completed')
+    source.mark_quiz('q1', 75)
+    state_store.flush()
+
+    target = SQLiteProgressBackend(tmp_path / 'progress.db', migrate_from=tmp_path / 'progress.json')
+    migrated = target.get_progress()
+    assert migrated['modules']['functions']['status'] == 'completed'
+    assert migrated['quizzes'][0]['score'] == 75
+    assert migrate_json_to_sqlite(tmp_path / 'progress.json', target)['quizzes'][0]['score'] == 75
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import render_cache
+from render_cache import RenderCache
+
+
+@pytest.fixture
+def modules_dir(tmp_path):
+    module = tmp_path / 'functions'
+    module.mkdir()
+    (module / 'description.md').write_text('# 函数\n\n```python\ndef f():\n    pass\n```\n', encoding='utf-8')
+    (module / 'example.py').write_text('def f():\n    return 1\n', encoding='utf-8')
+    return tmp_path
+
+
+def test_renders_markdown_and_code(modules_dir):
+    cache = RenderCache(modules_dir)
+    desc = cache.description('functions')
+    assert '<h1>函数</h1>' in desc.html
+    assert 'codehilite' in desc.html
+    assert 'class="highlight"' in cache.example('functions').html
+    assert cache.description('missing').text == ''
+
+
+def test_renders_once_until_content_changes(modules_dir, monkeypatch):
+    calls = []
+    original = render_cache.render_markdown
+    monkeypatch.setattr(render_cache, 'render_markdown', lambda text: calls.append(text) or original(text))
+    cache = RenderCache(modules_dir)
+    path = modules_dir / 'functions' / 'description.md'
+
+    first = cache.description('functions')
+    assert cache.description('functions') is first
+    # 只 touch 文件：签名变化但内容哈希相同，不重新渲染
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    touched = cache.description('functions')
+    assert touched is not first and touched.html is first.html
+    assert len(calls) == 1
+
+    path.write_text('# 新标题\n', encoding='utf-8')
+    assert '新标题' in cache.description('functions').html
+    assert len(calls) == 2
+
+
+def test_version_changes_with_content(modules_dir):
+    cache = RenderCache(modules_dir)
+    digest, mtime = cache.version('functions')
+    assert mtime > 0
+    (modules_dir / 'functions' / 'example.py').write_text('x = 2\n', encoding='utf-8')
+    assert cache.version('functions')[0] != digest
+
+
+def test_invalidate_and_snapshot_entries(modules_dir):
+    cache = RenderCache(modules_dir)
+    cache.description('functions')
+    cache.example('functions')
+    entries = cache.export_entries()
+    assert set(entries) == {('functions', 'description.md'), ('functions', 'example.py')}
+
+    cache.invalidate('functions')
+    assert cache.export_entries() == {}
+
+    restored = RenderCache(modules_dir)
+    restored.load_entries(entries)
+    assert restored.description('functions') is entries[('functions', 'description.md')]
@@ -0,0 +1,68 @@
+import search_index
+from search_index import InvertedIndex, tokenize
+
+
+def test_tokenize_cjk_bigrams_and_unigrams():
+    assert tokenize('装饰器') == ['装饰', '饰器', '装', '饰', '器']
+    assert tokenize('装饰器', for_query=True) == ['装饰', '饰器']
+    assert tokenize('read_file') == ['read_file', 'read', 'file']
+
+
+def test_single_cjk_character_matches_inside_words():
+    index = InvertedIndex()
+    index.add_document('module', 1, [('使用装饰器包装函数', 1)], 'a')
+    index.add_document('module', 2, [('生成器与迭代器', 1)], 'b')
+    assert [p for _, _, p in index.search('饰')] == ['a']
+    assert {p for _, _, p in index.search('器')} == {'a', 'b'}
+
+
+def test_all_terms_must_match_and_title_weight_ranks_first():
+    index = InvertedIndex()
+    index.add_document('exercise', 1, [('列表推导式', 3), ('练习 list comprehension', 1)], 'title')
+    index.add_document('exercise', 2, [('字典', 3), ('列表推导式 list', 1)], 'body')
+    index.add_document('quiz', 3, [('列表', 1)], 'quiz')
+    assert [p for _, _, p in index.search('列表推导式')] == ['title', 'body']
+    assert [p for _, _, p in index.search('推导式 comprehension')] == ['title']
+    assert [p for _, _, p in index.search('列表', kind='quiz')] == ['quiz']
+
+
+def test_prefix_match_prefers_exact_term():
+    index = InvertedIndex()
+    index.add_document('module', 1, [('iterator', 1)], 'prefix')
+    index.add_document('module', 2, [('iter', 1)], 'exact')
+    assert [p for _, _, p in index.search('iter')] == ['exact', 'prefix']
+    assert [p for _, _, p in index.search('itera')] == ['prefix']
+
+
+def test_prefix_expansion_cap_keeps_most_frequent_terms(monkeypatch):
+    monkeypatch.setattr(search_index, 'MAX_PREFIX_EXPANSION', 4)
+    index = InvertedIndex()
+    for i in range(10):
+        index.add_document('module', i, [(f'pre{i:02d}', 1)], i)
+    for i in range(3):
+        index.add_document('module', 100 + i, [('prezz', 1)], 'common')
+    # 字母序截断会丢掉 prezz；按文档频率保留时它一定在扩展结果中
+    assert 'prezz' in index._expand('pre')
+    assert [p for _, _, p in index.search('pre', limit=None)].count('common') == 3
+
+
+def test_replace_and_remove_documents():
+    index = InvertedIndex()
+    index.add_document('exercise', 1, [('generator', 1)], 'old')
+    index.add_document('exercise', 1, [('decorator', 1)], 'new')
+    assert index.search('generator') == []
+    assert [p for _, _, p in index.search('decorator')] == ['new']
+
+    index.remove_document('exercise', 1)
+    assert len(index) == 0
+    assert index.search('decorator') == []
+    assert index._terms == []
+
+
+def test_export_and_load_state_round_trip():
+    index = InvertedIndex()
+    index.add_document('quiz', 'q1', [('异常处理 try except', 1)], {'id': 'q1'})
+    copy = InvertedIndex()
+    copy.load_state(index.export_state())
+    assert copy.search('except') == index.search('except')
+    assert copy.doc_ids('quiz') == {'q1'}
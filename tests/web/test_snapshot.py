@@ -0,0 +1,77 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from snapshot import CORRUPT, LOADED, MISSING, STALE, read_snapshot, read_version, source_version, write_snapshot
+
+WEB_DIR = os.path.dirname(os.path.abspath(sys.modules['snapshot'].__file__))
+
+
+def test_round_trip_and_status(tmp_path):
+    path = tmp_path / 'content.snapshot'
+    state = {'render': {('m', 'description.md'): '<h1>x</h1>'}, 'terms': ['a', 'b']}
+    assert read_snapshot(path, 'v1') == (None, MISSING)
+    size = write_snapshot(path, 'v1', state)
+    assert size == path.stat().st_size
+    assert read_version(path) == 'v1'
+    assert read_snapshot(path, 'v1') == (state, LOADED)
+    assert read_snapshot(path, 'v2') == (None, STALE)
+
+
+@pytest.mark.parametrize('content', [b'', b'not a snapshot', None])
+def test_corrupt_files(tmp_path, content):
+    path = tmp_path / 'content.snapshot'
+    if content is None:
+        # 头部正确但数据被截断
+        write_snapshot(path, 'v1', list(range(1000)))
+        path.write_bytes(path.read_bytes()[:-100])
+    else:
+        path.write_bytes(content)
+    assert read_snapshot(path, 'v1') == (None, CORRUPT)
+
+
+def test_source_version_tracks_file_signatures(tmp_path):
+    source = tmp_path / 'description.md'
+    source.write_text('a', encoding='utf-8')
+    version = source_version([source])
+    assert source_version([source]) == version
+    assert source_version([source], extra='markdown=3.5') != version
+    source.write_text('ab', encoding='utf-8')
+    assert source_version([source]) != version
+    source.unlink()
+    assert source_version([source]) != version
+
+
+def test_build_and_check_without_persistent_secret(tmp_path):
+    data_dir = tmp_path / 'data'
+    shutil.copytree(os.path.join(WEB_DIR, 'data'), data_dir, ignore=shutil.ignore_patterns(
+        '*.db', '*.db-*', '*.lock', '*.py', '*.bak', '*.snapshot', '.secret_key', 'users', 'profiles'))
+    snapshot_file = tmp_path / 'content.snapshot'
+    env = {k: v for k, v in os.environ.items() if k not in ('SECRET_KEY', 'CONTENT_SNAPSHOT_ENABLED')}
+    env.update(TUTORIAL_DATA_DIR=str(data_dir), CONTENT_SNAPSHOT_FILE=str(snapshot_file))
+
+    def run(command):
+        return subprocess.run([sys.executable, 'snapshot.py', command], cwd=WEB_DIR, env=env,
+                              capture_output=True, text=True, timeout=300)
+
+    build = run('build')
+    assert build.returncode == 0, build.stderr
+    assert snapshot_file.exists()
+    check = run('check')
+    assert check.returncode == 0, check.stderr
+    assert LOADED in check.stdout
+    # 构建只使用一次性会话密钥，不会把密钥文件留在数据目录（镜像）中
+    assert not (data_dir / '.secret_key').exists()
+
+
+def test_multi_tenant_app_requires_secret_key(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k != 'SECRET_KEY'}
+    env.update(TUTORIAL_DATA_DIR=str(tmp_path), MULTI_TENANT='1')
+    proc = subprocess.run([sys.executable, '-c', 'import app'], cwd=WEB_DIR, env=env,
+                          capture_output=True, text=True, timeout=300)
+    assert proc.returncode != 0
+    assert 'SECRET_KEY' in proc.stderr
+    assert not (tmp_path / '.secret_key').exists()
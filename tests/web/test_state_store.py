@@ -0,0 +1,67 @@
+import json
+import threading
+
+from state_store import JSONStateStore
+
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    store = JSONStateStore(flush_delay=0)
+    path = tmp_path / 'progress.json'
+
+    def bump(data):
+        data['count'] += 1
+
+    def worker():
+        for _ in range(200):
+            store.update(path, bump, default_factory=lambda: {'count': 0})
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert store.get(path) == {'count': 1600}
+    assert json.loads(path.read_text(encoding='utf-8')) == {'count': 1600}
+
+
+def test_set_is_written_on_flush(tmp_path):
+    store = JSONStateStore(flush_delay=60)
+    path = tmp_path / 'favorites.json'
+    store.set(path, {'items': [1]})
+    assert not path.exists()
+    assert store.stats()['dirty'] == 1
+
+    store.flush()
+    assert json.loads(path.read_text(encoding='utf-8')) == {'items': [1]}
+    assert store.stats()['dirty'] == 0
+
+
+def test_external_change_is_reloaded(tmp_path):
+    store = JSONStateStore(flush_delay=0)
+    path = tmp_path / 'achievements.json'
+    path.write_text('{"a": 1}', encoding='utf-8')
+    assert store.get(path) == {'a': 1}
+
+    # 大小不同，签名一定变化
+    path.write_text('{"a": 100}', encoding='utf-8')
+    assert store.get(path) == {'a': 100}
+
+
+def test_missing_file_reads_as_none(tmp_path):
+    store = JSONStateStore(flush_delay=0)
+    assert store.get(tmp_path / 'missing.json') is None
+
+
+def test_lru_eviction_flushes_dirty_entries(tmp_path):
+    store = JSONStateStore(flush_delay=60, max_entries=2)
+    paths = [tmp_path / f'user{i}.json' for i in range(3)]
+    for i, path in enumerate(paths):
+        store.set(path, {'user': i})
+
+    stats = store.stats()
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 1
+    # 被淘汰的条目先落盘，再次读取时从磁盘加载
+    assert json.loads(paths[0].read_text(encoding='utf-8')) == {'user': 0}
+    assert store.get(paths[0]) == {'user': 0}
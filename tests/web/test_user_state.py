@@ -0,0 +1,65 @@
+import stat
+import threading
+
+import pytest
+
+from user_state import claim_legacy_state, is_valid_user_id, load_secret_key, new_user_id, user_state_path
+
+
+def test_user_ids():
+    user_id = new_user_id()
+    assert is_valid_user_id(user_id)
+    assert user_id != new_user_id()
+    for bad in ('default', '../' + user_id[3:], user_id.upper(), user_id[:-1], None, 123, [user_id]):
+        assert not is_valid_user_id(bad)
+
+
+def test_user_state_paths_are_sharded(tmp_path):
+    user_id = 'ab' + '0' * 30
+    assert user_state_path(tmp_path, user_id, 'progress.json') == tmp_path / 'users' / 'ab' / user_id / 'progress.json'
+    assert user_state_path(tmp_path, 'default', 'progress.json') == tmp_path / 'progress.json'
+    with pytest.raises(ValueError):
+        user_state_path(tmp_path, '../../etc', 'passwd')
+
+
+def test_legacy_state_is_claimed_once(tmp_path):
+    winners = []
+    barrier = threading.Barrier(8)
+
+    def claim():
+        user_id = new_user_id()
+        barrier.wait()
+        if claim_legacy_state(tmp_path, user_id):
+            winners.append(user_id)
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(winners) == 1
+    assert (tmp_path / 'users' / '.legacy_owner').read_text(encoding='utf-8') == winners[0]
+
+
+def test_secret_key_is_private_and_stable(tmp_path):
+    path = tmp_path / '.secret_key'
+    key = load_secret_key(path)
+    assert len(key) == 32
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert load_secret_key(path) == key
+
+
+def test_sessions_have_isolated_progress(web_app):
+    alice, bob = web_app.app.test_client(), web_app.app.test_client()
+    assert alice.post('/api/exercises/isolation_test/complete', json={'correct': True}).status_code == 200
+    assert 'isolation_test' in {str(e['id']) for e in alice.get('/api/progress').get_json()['exercises']}
+    assert 'isolation_test' not in {str(e['id']) for e in bob.get('/api/progress').get_json()['exercises']}
+
+
+def test_session_cannot_claim_default_learner(web_app):
+    client = web_app.app.test_client()
+    with client.session_transaction() as sess:
+        sess['uid'] = 'default'
+    client.get('/api/progress')
+    with client.session_transaction() as sess:
+        assert is_valid_user_id(sess['uid'])
@@ -0,0 +1,193 @@
+"""
+Python 教程 Web 平台 - 成就引擎
+成就条件在启动时编译为谓词对象，按触发事件分组；
+每个学习者维护一组运行中的计数器（完成模块数、练习数、连续学习天数、是否满分等），
+进度事件只更新相关计数器并检查受影响的规则，开销与历史记录长度无关
+"""
+
+import re
+import time
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+# 进度事件类型
+EVENT_MODULE = 'module'
+EVENT_EXERCISE = 'exercise'
+EVENT_QUIZ = 'quiz'
+
+# 计数器 / 标志 -> 会改变它的事件
+_METRIC_EVENTS = {
+    'modules_completed': (EVENT_MODULE,),
+    'all_basics_completed': (EVENT_MODULE,),
+    'all_modules_visited': (EVENT_MODULE,),
+    'streak': (EVENT_MODULE,),
+    'exercises_completed': (EVENT_EXERCISE,),
+    'perfect_quiz': (EVENT_QUIZ,),
+}
+
+_THRESHOLD_CONDITION = re.compile(r'^\s*(\w+)\s*>=\s*(\d+)\s*$')
+_FLAG_CONDITION = re.compile(r'^\s*(\w+)\s*$')
+
+
+class ThresholdRule:
+    """形如 `metric >= N` 的成就条件"""
+
+    def __init__(self, achievement_id: str, metric: str, threshold: int):
+        self.achievement_id = achievement_id
+        self.metric = metric
+        self.threshold = threshold
+
+    def __call__(self, counters) -> bool:
+        return counters.metric(self.metric) >= self.threshold
+
+
+class FlagRule:
+    """形如 `flag` 的布尔成就条件"""
+
+    def __init__(self, achievement_id: str, metric: str):
+        self.achievement_id = achievement_id
+        self.metric = metric
+
+    def __call__(self, counters) -> bool:
+        return bool(counters.metric(self.metric))
+
+
+def compile_rule(definition: dict):
+    """把成就定义中的 condition 字符串编译为规则对象"""
+    cond = definition['condition']
+    match = _THRESHOLD_CONDITION.match(cond)
+    if match:
+        rule = ThresholdRule(definition['id'], match.group(1), int(match.group(2)))
+    else:
+        match = _FLAG_CONDITION.match(cond)
+        if not match:
+            raise ValueError(f"无法解析成就条件: {definition['id']}: {cond!r}")
+        rule = FlagRule(definition['id'], match.group(1))
+    if rule.metric not in _METRIC_EVENTS:
+        raise ValueError(f"未知的成就指标: {definition['id']}: {rule.metric}")
+    return rule
+
+
+class LearnerCounters:
+    """单个学习者的运行计数器"""
+
+    def __init__(self, basics_ids, total_modules: int):
+        self._basics_ids = frozenset(basics_ids)
+        self._total_modules = total_modules
+        self.completed_modules = set()
+        self.visited_modules = set()
+        self.exercise_ids = set()
+        self.perfect_quiz = False
+        self.streak = 0
+        self.last_day = None
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_progress(cls, progress: dict, basics_ids, total_modules: int) -> 'LearnerCounters':
+        """从已有进度构建计数器（每个学习者只在首次使用时执行一次）"""
+        counters = cls(basics_ids, total_modules)
+        for module_id, info in progress.get('modules', {}).items():
+            counters.visited_modules.add(module_id)
+            if info.get('status') == 'completed':
+                counters.completed_modules.add(module_id)
+        counters.exercise_ids = {str(e.get('id')) for e in progress.get('exercises', [])}
+        counters.perfect_quiz = any(q.get('score', 0) == 100 for q in progress.get('quizzes', []))
+        for day in sorted({date.fromisoformat(d[:10]) for d in progress.get('learning_days', [])}):
+            counters.record_day(day)
+        return counters
+
+    def record_day(self, day: date):
+        """记录学习日，维护截止到最近学习日的连续天数"""
+        if self.last_day is None or day > self.last_day + timedelta(days=1):
+            self.streak = 1
+        elif day == self.last_day + timedelta(days=1):
+            self.streak += 1
+        else:
+            return
+        self.last_day = day
+
+    def apply(self, event: str, payload: dict):
+        """根据事件更新计数器"""
+        if event == EVENT_MODULE:
+            module_id = payload['module_id']
+            self.visited_modules.add(module_id)
+            if payload.get('status') == 'completed':
+                self.completed_modules.add(module_id)
+            else:
+                self.completed_modules.discard(module_id)
+            self.record_day(payload.get('day') or datetime.now().date())
+        elif event == EVENT_EXERCISE:
+            self.exercise_ids.add(str(payload['exercise_id']))
+        elif event == EVENT_QUIZ:
+            if payload.get('score', 0) == 100:
+                self.perfect_quiz = True
+
+    def metric(self, name: str):
+        if name == 'modules_completed':
+            return len(self.completed_modules)
+        if name == 'exercises_completed':
+            return len(self.exercise_ids)
+        if name == 'streak':
+            return self.streak
+        if name == 'perfect_quiz':
+            return self.perfect_quiz
+        if name == 'all_basics_completed':
+            return self._basics_ids <= self.completed_modules
+        if name == 'all_modules_visited':
+            return len(self.visited_modules) >= self._total_modules
+        raise KeyError(name)
+
+
+class AchievementEngine:
+    """事件驱动的成就引擎"""
+
+    def __init__(self, definitions: list, basics_ids, total_modules: int, max_age: float = None,
+                 max_users: int = 1024):
+        self.max_age = max_age
+        self.max_users = max_users
+        self.rules = [compile_rule(d) for d in definitions]
+        self._rules_by_event = {}
+        for rule in self.rules:
+            for event in _METRIC_EVENTS[rule.metric]:
+                self._rules_by_event.setdefault(event, []).append(rule)
+        self._basics_ids = list(basics_ids)
+        self._total_modules = total_modules
+        self._counters = OrderedDict()      # 最近活跃的学习者在末尾，超过 max_users 时淘汰最久未活跃的
+        self._lock = threading.Lock()
+
+    def handle(self, user_id: str, event: str, payload: dict, unlocked_ids, load_progress) -> list:
+        """处理一个进度事件，返回新解锁的成就 ID 列表
+
+        load_progress 仅在该学习者的计数器尚未建立时调用一次；
+        计数器刚建立时会检查全部规则，之后只检查与事件相关的规则。
+        设置了 max_age 时（多进程部署，其他进程的事件不会经过本进程），
+        计数器超过 max_age 秒后从存储的进度重新构建
+        """
+        with self._lock:
+            counters = self._counters.get(user_id)
+            if counters is not None and self.max_age is not None \
+                    and time.monotonic() - counters.built_at > self.max_age:
+                counters = None
+            if counters is None:
+                # 进度中已包含本次事件，无需再 apply
+                counters = LearnerCounters.from_progress(load_progress(), self._basics_ids, self._total_modules)
+                self._counters[user_id] = counters
+                while len(self._counters) > self.max_users:
+                    self._counters.popitem(last=False)
+                rules = self.rules
+            else:
+                self._counters.move_to_end(user_id)
+                counters.apply(event, payload)
+                rules = self._rules_by_event.get(event, [])
+            unlocked_ids = set(unlocked_ids)
+            return [rule.achievement_id for rule in rules
+                    if rule.achievement_id not in unlocked_ids and rule(counters)]
+
+    def reset(self, user_id: str = None):
+        """丢弃计数器（进度被整体覆盖时调用），下次事件时重新构建"""
+        with self._lock:
+            if user_id is None:
+                self._counters.clear()
+            else:
+                self._counters.pop(user_id, None)
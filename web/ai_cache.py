@@ -0,0 +1,190 @@
+"""
+Python 教程 Web 平台 - AI 回复缓存
+相同的 (服务商, 模型, 规范化后的消息列表) 直接返回缓存的回复，省去一次上游调用：
+- LRU + TTL 淘汰，按字节数限制缓存总大小
+- 可选 SQLite 持久化（进程重启、多 worker 之间共享）：同样受字节上限约束，
+  每写入 PRUNE_EVERY 次（或写入量达到上限的 1/4）清理一次：删除过期的行，超出上限时删除最早写入的行
+- 统计命中/未命中/绕过/淘汰次数
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+
+def normalize_messages(messages: list) -> list:
+    """规范化消息：角色小写，内容去除首尾空白并合并连续空白"""
+    normalized = []
+    for msg in messages or []:
+        content = msg.get('content', '')
+        if isinstance(content, str):
+            content = ' '.join(content.split())
+        normalized.append({'role': str(msg.get('role', 'user')).strip().lower(), 'content': content})
+    return normalized
+
+
+def make_cache_key(provider: str, model: str, messages: list, **params) -> str:
+    """生成缓存键（SHA-256）"""
+    raw = json.dumps({
+        'provider': provider,
+        'model': model,
+        'messages': normalize_messages(messages),
+        'params': {k: v for k, v in params.items() if v is not None},
+    }, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL 的回复缓存"""
+
+    # 持久化数据的清理间隔（写入次数）；清理需要扫描整张表，不在每次写入时执行
+    PRUNE_EVERY = 64
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, ttl: float = 24 * 3600, persist_path=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (content, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._db_path = Path(persist_path) if persist_path else None
+        self._local = threading.local()
+        self._unpruned_writes = 0
+        self._unpruned_bytes = 0
+        if self._db_path is not None:
+            conn = self._db()
+            with conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS ai_cache ('
+                             'key TEXT PRIMARY KEY, content TEXT NOT NULL, expires_at REAL NOT NULL)')
+                conn.execute('CREATE INDEX IF NOT EXISTS ai_cache_expires ON ai_cache (expires_at)')
+                self._db_prune(conn, time.time())
+            conn.close()
+            self._local = threading.local()
+
+    def get(self, key: str):
+        """读取缓存，未命中或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._drop(key)
+        row = self._db_get(key, now)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put(key, row[0], row[1])
+            return row[0]
+
+    def set(self, key: str, content: str):
+        """写入缓存"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._put(key, content, expires_at)
+        size = len(content.encode('utf-8'))
+        if self._db_path is not None and size <= self.max_bytes:
+            with self._lock:
+                self._unpruned_writes += 1
+                self._unpruned_bytes += size
+                prune = (self._unpruned_writes >= self.PRUNE_EVERY
+                         or self._unpruned_bytes * 4 >= self.max_bytes)
+                if prune:
+                    self._unpruned_writes = self._unpruned_bytes = 0
+            with self._db() as conn:
+                conn.execute('INSERT OR REPLACE INTO ai_cache (key, content, expires_at) VALUES (?, ?, ?)',
+                             (key, content, expires_at))
+                if prune:
+                    self._db_prune(conn, time.time())
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self):
+        """清空缓存（包括持久化数据）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._db_path is not None:
+            with self._db() as conn:
+                conn.execute('DELETE FROM ai_cache')
+
+    def reset_after_fork(self):
+        """fork 之后调用，丢弃从父进程继承的连接"""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'persistent': self._db_path is not None,
+            }
+
+    # ---------- 内部实现（调用方持有锁） ----------
+
+    def _put(self, key, content, expires_at):
+        size = len(content.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (content, size, expires_at)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self._db_path), timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _db_prune(self, conn, now):
+        """删除过期的行；总字节数超过上限时从最早写入（最早过期）的行开始删除"""
+        conn.execute('DELETE FROM ai_cache WHERE expires_at <= ?', (now,))
+        conn.execute(
+            'DELETE FROM ai_cache WHERE key IN ('
+            ' SELECT key FROM ('
+            '  SELECT key, SUM(length(CAST(content AS BLOB))) OVER (ORDER BY expires_at DESC, key) AS total'
+            '  FROM ai_cache'
+            ' ) WHERE total > ?)',
+            (self.max_bytes,)
+        )
+
+    def _db_get(self, key, now):
+        if self._db_path is None:
+            return None
+        row = self._db().execute('SELECT content, expires_at FROM ai_cache WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        return row
@@ -0,0 +1,204 @@
+"""
+Python 教程 Web 平台 - AI 对话客户端
+- 每个服务商一个长连接 Session（连接池复用 TCP/TLS 连接）
+- 每个服务商的并发上游请求数有上限，超出时快速失败而不是无限堆积
+- 支持流式输出：逐个返回上游生成的文本片段，用于 SSE 转发
+"""
+
+import json
+import threading
+from abc import ABC, abstractmethod
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ProviderBusyError(RuntimeError):
+    """服务商并发请求数已达上限"""
+
+
+class ChatProvider(ABC):
+    """单个 AI 服务商的客户端"""
+
+    name = None
+    default_model = None
+
+    def __init__(self, max_concurrency: int = 4, pool_size: int = 8, timeout: float = 60,
+                 acquire_timeout: float = 5):
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    # ---------- 子类实现 ----------
+
+    @abstractmethod
+    def build_request(self, messages: list, config: dict, stream: bool):
+        """返回 (url, headers, payload)"""
+        pass
+
+    @abstractmethod
+    def parse_response(self, result: dict) -> str:
+        """从非流式响应中提取回复文本"""
+        pass
+
+    @abstractmethod
+    def parse_stream_line(self, line: str):
+        """解析流式响应的一行，返回 (文本片段, 是否结束)；该行没有文本时片段为 None"""
+        pass
+
+    # ---------- 公共接口 ----------
+
+    def chat(self, messages: list, config: dict) -> str:
+        """非流式对话，返回完整回复"""
+        url, headers, payload = self.build_request(messages, config, stream=False)
+        with self._slot():
+            response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+            return self.parse_response(response.json())
+
+    def stream_chat(self, messages: list, config: dict):
+        """流式对话，逐个产出文本片段（生成器结束前一直占用并发名额）"""
+        url, headers, payload = self.build_request(messages, config, stream=True)
+        with self._slot():
+            with self.session.post(url, headers=headers, json=payload, timeout=self.timeout,
+                                   stream=True) as response:
+                response.raise_for_status()
+                for raw in response.iter_lines(decode_unicode=False):
+                    if not raw:
+                        continue
+                    delta, done = self.parse_stream_line(raw.decode('utf-8'))
+                    if delta:
+                        yield delta
+                    if done:
+                        break
+
+    def _slot(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise ProviderBusyError(f'{self.name} 当前请求过多，请稍后再试')
+        return _SlotGuard(self._slots)
+
+
+class _SlotGuard:
+    """退出时释放并发名额"""
+
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._semaphore.release()
+
+
+def _sse_data(line: str):
+    """提取 SSE 的 data 字段，非 data 行返回 None"""
+    if line.startswith('data:'):
+        return line[5:].strip()
+    return None
+
+
+class OllamaProvider(ChatProvider):
+    name = 'ollama'
+    default_model = 'llama3'
+
+    def build_request(self, messages, config, stream):
+        api_url = config.get('api_url', 'http://localhost:11434').rstrip('/')
+        payload = {'model': config.get('model') or self.default_model, 'messages': messages, 'stream': stream}
+        if config.get('temperature') is not None:
+            payload['options'] = {'temperature': config['temperature']}
+        return f'{api_url}/api/chat', {}, payload
+
+    def parse_response(self, result):
+        return result.get('message', {}).get('content', '')
+
+    def parse_stream_line(self, line):
+        # Ollama 流式输出为逐行 JSON
+        chunk = json.loads(line)
+        return chunk.get('message', {}).get('content'), bool(chunk.get('done'))
+
+
+class OpenAIProvider(ChatProvider):
+    name = 'openai'
+    default_model = 'gpt-3.5-turbo'
+
+    def build_request(self, messages, config, stream):
+        base_url = config.get('base_url', 'https://api.openai.com').rstrip('/')
+        headers = {
+            'Authorization': f"Bearer {config.get('api_key', '')}",
+            'Content-Type': 'application/json'
+        }
+        payload = {'model': config.get('model') or self.default_model, 'messages': messages}
+        if config.get('temperature') is not None:
+            payload['temperature'] = config['temperature']
+        if stream:
+            payload['stream'] = True
+        return f'{base_url}/v1/chat/completions', headers, payload
+
+    def parse_response(self, result):
+        return result['choices'][0]['message']['content']
+
+    def parse_stream_line(self, line):
+        data = _sse_data(line)
+        if data is None:
+            return None, False
+        if data == '[DONE]':
+            return None, True
+        choices = json.loads(data).get('choices') or [{}]
+        return choices[0].get('delta', {}).get('content'), False
+
+
+class ClaudeProvider(ChatProvider):
+    name = 'claude'
+    default_model = 'claude-3-haiku-20240307'
+
+    def build_request(self, messages, config, stream):
+        base_url = config.get('base_url', 'https://api.anthropic.com').rstrip('/')
+        headers = {
+            'x-api-key': config.get('api_key', ''),
+            'anthropic-version': '2023-06-01',
+            'Content-Type': 'application/json'
+        }
+        payload = {'model': config.get('model') or self.default_model, 'max_tokens': 1024, 'messages': messages}
+        if config.get('temperature') is not None:
+            payload['temperature'] = config['temperature']
+        if stream:
+            payload['stream'] = True
+        return f'{base_url}/v1/messages', headers, payload
+
+    def parse_response(self, result):
+        return result['content'][0]['text']
+
+    def parse_stream_line(self, line):
+        data = _sse_data(line)
+        if data is None:
+            return None, False
+        event = json.loads(data)
+        if event.get('type') == 'content_block_delta':
+            return event.get('delta', {}).get('text'), False
+        return None, event.get('type') == 'message_stop'
+
+
+PROVIDER_CLASSES = {cls.name: cls for cls in (OllamaProvider, OpenAIProvider, ClaudeProvider)}
+
+
+class ProviderRegistry:
+    """按名称懒加载并复用各服务商客户端（进程内共享）"""
+
+    def __init__(self, **options):
+        self._options = options
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> ChatProvider:
+        """获取服务商客户端，未知服务商返回 None"""
+        provider = self._providers.get(name)
+        if provider is None and name in PROVIDER_CLASSES:
+            with self._lock:
+                provider = self._providers.get(name)
+                if provider is None:
+                    provider = self._providers[name] = PROVIDER_CLASSES[name](**self._options)
+        return provider
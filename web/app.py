@@ -6,11 +6,21 @@ Python 教程 Web 平台 - Flask 主应用
 
 import os
 import sys
+import copy
 import json
+import time
+import atexit
+import hashlib
 from pathlib import Path
 from datetime import datetime, timedelta
 
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for
+# 冷启动计时起点（模块开始导入）
+BOOT_STARTED = time.perf_counter()
+
+from flask import (
+    Flask, Response, render_template, make_response, jsonify, request, session, redirect, url_for, stream_with_context,
+    has_request_context
+)
 
 # 添加当前目录到路径
 BASE_DIR = Path(__file__).parent
@@ -18,145 +28,214 @@ sys.path.insert(0, str(BASE_DIR))
 
 from config import (
     MODULES, MODULE_CATEGORIES, APP_NAME, APP_ICON, APP_VERSION,
-    get_module_info, get_category_modules, get_learning_path, get_module_dependencies, APP_PORT
+    MODULE_CATALOG, get_module_info, get_learning_path, get_dependency_modules, APP_PORT,
+    PROGRESS_BACKEND, MULTI_TENANT, ADOPT_LEGACY_USER, SECRET_KEY, USER_CACHE_SIZE, PROGRESS_WRITE_BEHIND, PROGRESS_BATCH_LINGER_MS, PROGRESS_BATCH_MAX, AI_MAX_CONCURRENCY, AI_POOL_SIZE, AI_REQUEST_TIMEOUT,
+    AI_CACHE_ENABLED, AI_CACHE_MAX_BYTES, AI_CACHE_TTL, AI_CACHE_DB, DEBUG,
+    GRADER_ENABLED, GRADER_SANDBOX, GRADER_UID, GRADER_GID, GRADER_WORKERS, GRADER_QUEUE_SIZE, GRADER_CPU_SECONDS, GRADER_MEMORY_MB, GRADER_TIMEOUT,
+    METRICS_ENABLED, PROFILE_SLOW_MS, PROFILE_INTERVAL_MS, PROFILE_DIR,
+    HTTP_COMPRESS_ENABLED, HTTP_COMPRESS_MIN_BYTES, HTTP_COMPRESS_LEVEL, HTTP_COMPRESS_CACHE_BYTES,
+    CONTENT_SNAPSHOT_ENABLED, CONTENT_SNAPSHOT_FILE
 )
+import metrics
+import http_cache
+from state_store import state_store, atomic_write_json, file_lock
+from progress_store import create_progress_backend, DEFAULT_USER
+from achievement_engine import AchievementEngine, EVENT_MODULE, EVENT_EXERCISE, EVENT_QUIZ
+from learning_stats import StatsAggregator
+from event_queue import ProgressEventQueue
+from user_state import new_user_id, is_valid_user_id, user_state_path, claim_legacy_state, load_secret_key
+from content_repo import ContentRepository, HIDDEN_FIELDS, public_item
+from content_io import import_jsonl, export_jsonl, IMPORT_MODES
+from pagination import list_response, parse_list, CursorError
+from ai_client import ProviderRegistry, ProviderBusyError
+from ai_cache import ResponseCache, make_cache_key
+from render_cache import RenderCache, HIGHLIGHT_CSS, renderer_version
+from snapshot import source_version, read_snapshot, write_snapshot, LOADED
+from grader import GradingEngine, GraderBusyError, GraderUnavailableError
+from search_index import InvertedIndex, module_fields, exercise_fields, quiz_fields
 
 # 绝对路径
 MODULES_DIR = BASE_DIR.parent
-DATA_DIR = BASE_DIR / 'data'
+# 数据目录可通过 TUTORIAL_DATA_DIR 覆盖（压测等场景使用临时副本）
+DATA_DIR = Path(os.environ.get('TUTORIAL_DATA_DIR') or BASE_DIR / 'data')
 PROGRESS_FILE = DATA_DIR / 'progress.json'
-ACHIEVEMENTS_FILE = DATA_DIR / 'achievements.json'
-FAVORITES_FILE = DATA_DIR / 'favorites.json'
+PROGRESS_DB_FILE = DATA_DIR / 'progress.db'
+CONTENT_SNAPSHOT_FILE = Path(CONTENT_SNAPSHOT_FILE or DATA_DIR / 'content.snapshot')
 
 # Flask 应用
 app = Flask(__name__)
-app.secret_key = 'python-tutorial-secret-key-v2'
+if SECRET_KEY:
+    app.secret_key = SECRET_KEY
+elif MULTI_TENANT and __name__ != '__main__':
+    # 多学习者模式下会话 cookie 决定访问哪个学习者的数据，密钥必须由部署方提供，不能随镜像/代码分发
+    raise RuntimeError('多学习者模式（MULTI_TENANT=1）需要设置 SECRET_KEY 环境变量，'
+                       '例如 SECRET_KEY=$(python -c "import secrets; print(secrets.token_hex(32))")')
+else:
+    # 开发服务器（python app.py）或单学习者模式：使用本机生成并保存的密钥
+    app.secret_key = load_secret_key(DATA_DIR / '.secret_key')
+# 学习者 ID 保存在 session 中，会话 cookie 保留一年
+app.permanent_session_lifetime = timedelta(days=365)
 app.config['BASE_DIR'] = BASE_DIR
 app.config['DATA_DIR'] = DATA_DIR
 app.config['MODULES_DIR'] = MODULES_DIR
 
+# 请求延迟、文件读写、模板渲染等运行指标
+if METRICS_ENABLED:
+    metrics.init_app(app, profiler=metrics.SlowRequestProfiler(
+        PROFILE_DIR or DATA_DIR / 'profiles', PROFILE_SLOW_MS, PROFILE_INTERVAL_MS
+    ) if PROFILE_SLOW_MS > 0 else None)
 
-# ==================== 数据加载器 ====================
+# 静态资源指纹、响应压缩及压缩结果缓存
+compressed_cache = http_cache.init_app(
+    app, HTTP_COMPRESS_MIN_BYTES, HTTP_COMPRESS_LEVEL, HTTP_COMPRESS_CACHE_BYTES, HTTP_COMPRESS_ENABLED
+)
 
-def load_json(filepath):
-    """加载 JSON 文件"""
-    if not filepath.exists():
-        return None
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+# 题库（练习题/测验题）内存索引
+content_repo = ContentRepository(DATA_DIR)
+
+# 模块知识点/示例代码渲染缓存
+render_cache = RenderCache(MODULES_DIR)
 
+# 学习进度存储
+progress_backend = create_progress_backend(
+    PROGRESS_BACKEND, PROGRESS_FILE, PROGRESS_DB_FILE,
+    path_for=lambda user_id: user_state_path(DATA_DIR, user_id, 'progress.json')
+)
+
+# 进度事件写回队列：按学习者批量写入后在后台更新统计、检查成就
+progress_events = ProgressEventQueue(
+    lambda user_id, events: progress_backend.apply_events(events, user_id),
+    on_applied=lambda user_id, event, payload: on_progress_event(event, user_id, **payload),
+    linger=PROGRESS_BATCH_LINGER_MS / 1000,
+    max_batch=PROGRESS_BATCH_MAX
+) if PROGRESS_WRITE_BEHIND else None
+if progress_events is not None:
+    atexit.register(progress_events.close)
+
+
+# ==================== 数据加载器 ====================
 
 def save_json(filepath, data):
     """保存 JSON 文件"""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    atomic_write_json(filepath, data)
 
 
-def get_progress():
-    """获取学习进度"""
-    data = load_json(PROGRESS_FILE)
-    if data is None:
-        return {
-            'modules': {},
-            'exercises': [],
-            'quizzes': [],
-            'learning_days': [],
-            'last_visit': None,
-            'total_time': 0
-        }
-    return data
+def current_user_id() -> str:
+    """当前学习者 ID：多学习者模式下来自 Flask session（首次访问时分配），请求之外为默认学习者"""
+    if not MULTI_TENANT or not has_request_context():
+        return DEFAULT_USER
+    user_id = session.get('uid')
+    if not is_valid_user_id(user_id):
+        user_id = session['uid'] = new_user_id()
+        session.permanent = True
+        if ADOPT_LEGACY_USER:
+            adopt_legacy_user(user_id)
+    return user_id
 
 
-def save_progress(data):
+def adopt_legacy_user(user_id: str) -> bool:
+    """升级到多学习者模式后，第一个新会话接管原默认学习者的进度、成就、收藏（复制，原文件保留作备份）"""
+    legacy = get_progress(DEFAULT_USER)
+    names = [name for name in ('achievements.json', 'favorites.json')
+             if state_store.get(user_file(DEFAULT_USER, name)) is not None]
+    if not names and not any(legacy.get(k) for k in ('modules', 'exercises', 'quizzes', 'learning_days')):
+        return False
+    if not claim_legacy_state(DATA_DIR, user_id):
+        return False
+    save_progress(copy.deepcopy(legacy), user_id)
+    for name in names:
+        state_store.set(user_file(user_id, name), copy.deepcopy(state_store.get(user_file(DEFAULT_USER, name))))
+    app.logger.info('学习者 %s 接管了升级前默认学习者的数据', user_id)
+    return True
+
+
+def user_file(user_id: str, filename: str) -> Path:
+    """学习者的成就/收藏文件（默认学习者使用 data/ 下原有文件）"""
+    return user_state_path(DATA_DIR, user_id, filename)
+
+
+def settle_progress(user_id: str):
+    """等待该学习者队列中的进度事件写入完成（读取进度、成就、统计前调用，保证读到自己的写入）"""
+    if progress_events is not None:
+        progress_events.flush(user_id)
+
+
+def get_progress(user_id: str = None):
+    """获取学习进度（默认当前学习者）"""
+    user_id = user_id or current_user_id()
+    settle_progress(user_id)
+    return progress_backend.get_progress(user_id)
+
+
+def save_progress(data, user_id: str = None):
     """保存学习进度"""
-    save_json(PROGRESS_FILE, data)
+    user_id = user_id or current_user_id()
+    settle_progress(user_id)
+    progress_backend.save_progress(data, user_id)
+    # 进度被整体覆盖，成就计数器和统计需要重建
+    achievement_engine.reset(user_id)
+    learning_stats.reset(user_id)
 
 
-def get_achievements():
+def get_achievements(user_id: str = None):
     """获取成就数据"""
-    data = load_json(ACHIEVEMENTS_FILE)
+    user_id = user_id or current_user_id()
+    settle_progress(user_id)
+    data = state_store.get(user_file(user_id, 'achievements.json'))
     if data is None:
         return {'achievements': [], 'unlocked': []}
     return data
 
 
-def save_achievements(data):
-    """保存成就数据"""
-    save_json(ACHIEVEMENTS_FILE, data)
+def update_achievements(mutator, user_id: str = None):
+    """读-改-写成就数据（多进程部署时在文件锁内完成）"""
+    return state_store.update(user_file(user_id or current_user_id(), 'achievements.json'), mutator,
+                              default_factory=lambda: {'achievements': [], 'unlocked': []})
 
 
-def get_favorites():
+def get_favorites(user_id: str = None):
     """获取收藏数据"""
-    data = load_json(FAVORITES_FILE)
+    data = state_store.get(user_file(user_id or current_user_id(), 'favorites.json'))
     if data is None:
         return {'modules': [], 'exercises': [], 'quizzes': []}
     return data
 
 
-def save_favorites(data):
-    """保存收藏数据"""
-    save_json(FAVORITES_FILE, data)
+def update_favorites(mutator, user_id: str = None):
+    """读-改-写收藏数据（多进程部署时在文件锁内完成）"""
+    return state_store.update(user_file(user_id or current_user_id(), 'favorites.json'), mutator,
+                              default_factory=lambda: {'modules': [], 'exercises': [], 'quizzes': []})
+
+
+def record_progress_event(event: str, **payload):
+    """记录当前学习者的进度事件：写回队列开启时只入队即返回，否则同步写入并处理"""
+    user_id = current_user_id()
+    if progress_events is not None:
+        progress_events.put(user_id, event, **payload)
+        return
+    progress_backend.apply_events([(event, payload, None)], user_id)
+    on_progress_event(event, user_id, **payload)
 
 
 def update_module_status(module_id: str, status: str):
     """更新模块学习状态"""
-    # 保存到JSON文件
-    progress = get_progress()
-    progress['modules'][module_id] = {
-        'status': status,
-        'updated_at': datetime.now().isoformat()
-    }
-    
-    # 记录学习日期
-    today = datetime.now().date().isoformat()
-    if today not in progress.get('learning_days', []):
-        progress.setdefault('learning_days', []).append(today)
-    progress['last_visit'] = datetime.now().isoformat()
-    
-    save_progress(progress)
-    
-    # 检查成就
-    check_achievements()
+    record_progress_event(EVENT_MODULE, module_id=module_id, status=status)
 
 
 def mark_exercise_completed(exercise_id: str, correct: bool = False):
     """标记练习题完成"""
-    # 保存到JSON文件
-    progress = get_progress()
-    existing = [i for i, e in enumerate(progress['exercises']) if str(e.get('id')) == str(exercise_id)]
-    if not existing:
-        progress['exercises'].append({
-            'id': exercise_id,
-            'completed_at': datetime.now().isoformat(),
-            'correct': correct
-        })
-    else:
-        # 更新为正确的
-        if correct:
-            progress['exercises'][existing[0]]['correct'] = True
-            progress['exercises'][existing[0]]['completed_at'] = datetime.now().isoformat()
-    save_progress(progress)
-    check_achievements()
+    record_progress_event(EVENT_EXERCISE, exercise_id=exercise_id, correct=correct)
 
 
 def mark_quiz_completed(quiz_id: str, score: int):
     """标记测验完成"""
-    # 保存到JSON文件
-    progress = get_progress()
-    existing = [i for i, q in enumerate(progress['quizzes']) if str(q.get('id')) == str(quiz_id)]
-    if not existing:
-        progress['quizzes'].append({
-            'id': quiz_id,
-            'score': score,
-            'completed_at': datetime.now().isoformat()
-        })
-    else:
-        # 更新最高分
-        if score > progress['quizzes'][existing[0]].get('score', 0):
-            progress['quizzes'][existing[0]]['score'] = score
-            progress['quizzes'][existing[0]]['completed_at'] = datetime.now().isoformat()
-    save_progress(progress)
-    check_achievements()
+    record_progress_event(EVENT_QUIZ, quiz_id=quiz_id, score=score)
+
+
+def on_progress_event(event: str, user_id: str, **payload):
+    """进度事件持久化之后：增量更新该学习者的统计并检查成就"""
+    learning_stats.handle(user_id, event, payload)
+    check_achievements(event, user_id, **payload)
 
 
 # ==================== 成就系统 ====================
@@ -172,92 +251,75 @@ ACHIEVEMENT_DEFINITIONS = [
 ]
 
 
-def check_achievements():
-    """检查并解锁成就"""
-    progress = get_progress()
-    achievements = get_achievements()
-    unlocked_ids = achievements.get('unlocked', [])
-    
-    completed_count = sum(1 for m in progress['modules'].values() if m.get('status') == 'completed')
-    exercises_count = len(progress.get('exercises', []))
-    quizzes = progress.get('quizzes', [])
-    
-    # 检查连续学习
-    learning_days = progress.get('learning_days', [])
-    streak = 0
-    if learning_days:
-        dates = [datetime.fromisoformat(d).date() for d in learning_days]
-        today = datetime.now().date()
-        for i in range(len(dates) - 1, -1, -1):
-            if (today - dates[i]).days <= i + 1:
-                streak += 1
-            else:
-                break
-    
-    # 检查基础阶段完成
-    basics_modules = [m['id'] for m in MODULES if m['category'] == '基础阶段']
-    basics_completed = sum(1 for m in basics_modules if progress['modules'].get(m, {}).get('status') == 'completed')
-    all_basics_done = basics_completed == len(basics_modules)
-    
-    # 检查满分测验
-    perfect_quiz = any(q.get('score', 0) == 100 for q in quizzes)
-    
-    # 检查所有模块访问
-    all_visited = len(progress['modules']) >= len(MODULES)
-    
-    for achievement in ACHIEVEMENT_DEFINITIONS:
-        if achievement['id'] in unlocked_ids:
-            continue
-        
-        # 评估条件
-        cond = achievement['condition']
-        should_unlock = False
-        
-        if 'modules_completed' in cond:
-            threshold = int(cond.split('>=')[1])
-            should_unlock = completed_count >= threshold
-        elif 'exercises_completed' in cond:
-            threshold = int(cond.split('>=')[1])
-            should_unlock = exercises_count >= threshold
-        elif 'all_basics_completed' in cond:
-            should_unlock = all_basics_done
-        elif 'streak' in cond:
-            threshold = int(cond.split('>=')[1])
-            should_unlock = streak >= threshold
-        elif 'perfect_quiz' in cond:
-            should_unlock = perfect_quiz
-        elif 'all_modules_visited' in cond:
-            should_unlock = all_visited
-        
-        if should_unlock:
-            unlocked_ids.append(achievement['id'])
-            achievements['achievements'].append({
-                'id': achievement['id'],
-                'unlocked_at': datetime.now().isoformat()
-            })
+# 条件在启动时编译一次，之后按事件增量检查；
+# 多进程部署时其他 worker 的进度事件不经过本进程，计数器定期从存储重建
+achievement_engine = AchievementEngine(
+    ACHIEVEMENT_DEFINITIONS,
+    basics_ids=[m['id'] for m in MODULES if m['category'] == '基础阶段'],
+    total_modules=len(MODULES),
+    max_age=30 if state_store.multiprocess else None,
+    max_users=USER_CACHE_SIZE
+)
+
+
+def _item_module(kind: str, item_id: str):
+    """练习/测验所属模块"""
+    if kind == EVENT_EXERCISE:
+        item = content_repo.exercises.get(item_id)
+        return item.get('module') if item else None
+    item = content_repo.quizzes.get(item_id)
+    return item.get('module_id') if item else None
+
+
+# 学习统计（物化聚合，按事件增量更新）
+learning_stats = StatsAggregator(
+    MODULES,
+    module_of=_item_module,
+    max_age=30 if state_store.multiprocess else None,
+    max_users=USER_CACHE_SIZE
+)
+
+
+def get_learning_stats(user_id: str = None) -> dict:
+    """获取学习统计聚合结果"""
+    user_id = user_id or current_user_id()
+    settle_progress(user_id)
+    return learning_stats.get(user_id, lambda: get_progress(user_id))
+
+
+def check_achievements(event: str, user_id: str = None, **payload):
+    """根据进度事件检查并解锁成就"""
+    user_id = user_id or current_user_id()
+    achievements = get_achievements(user_id)
+    newly_unlocked = achievement_engine.handle(
+        user_id, event, payload, achievements.get('unlocked', []), lambda: get_progress(user_id)
+    )
     
-    achievements['unlocked'] = unlocked_ids
-    save_achievements(achievements)
+    # 没有新解锁的成就时无需写回
+    if newly_unlocked:
+        now = datetime.now().isoformat()
+
+        def unlock(data):
+            # 其他进程可能已解锁同一成就，写入前重新检查
+            unlocked = data.setdefault('unlocked', [])
+            for ach_id in newly_unlocked:
+                if ach_id not in unlocked:
+                    unlocked.append(ach_id)
+                    data.setdefault('achievements', []).append({'id': ach_id, 'unlocked_at': now})
+
+        update_achievements(unlock, user_id)
 
 
 # ==================== 内容加载 ====================
 
 def get_module_description(module_id: str) -> str:
     """获取模块知识点内容"""
-    md_file = MODULES_DIR / module_id / 'description.md'
-    if md_file.exists():
-        with open(md_file, 'r', encoding='utf-8') as f:
-            return f.read()
-    return ""
+    return render_cache.description(module_id).text
 
 
 def get_module_example(module_id: str) -> str:
     """获取模块示例代码"""
-    py_file = MODULES_DIR / module_id / 'example.py'
-    if py_file.exists():
-        with open(py_file, 'r', encoding='utf-8') as f:
-            return f.read()
-    return ""
+    return render_cache.example(module_id).text
 
 
 def get_categories():
@@ -267,38 +329,92 @@ def get_categories():
 
 def get_all_exercises() -> list:
     """获取所有练习题"""
-    exercises_file = DATA_DIR / 'exercises.json'
-    if exercises_file.exists():
-        return load_json(exercises_file)
-    return []
+    return list(content_repo.exercises.all())
 
 
 def get_exercises(module_id: str = None) -> list:
     """获取指定模块的练习题"""
-    all_ex = get_all_exercises()
     if module_id:
-        return [e for e in all_ex if e.get('module') == module_id]
-    return all_ex
+        return list(content_repo.exercises.by_module(module_id))
+    return get_all_exercises()
 
 
 def get_all_quizzes() -> list:
     """获取所有测验题"""
-    quizzes_file = DATA_DIR / 'quizzes.json'
-    if quizzes_file.exists():
-        return load_json(quizzes_file)
-    return []
+    return list(content_repo.quizzes.all())
 
 
 def get_quizzes(module_id: str = None) -> list:
     """获取指定模块的测验题"""
-    all_q = get_all_quizzes()
     if module_id:
-        return [q for q in all_q if q.get('module_id') == module_id]
-    return all_q
+        return list(content_repo.quizzes.by_module(module_id))
+    return get_all_quizzes()
+
+
+# 全文检索索引（模块名称/知识点/示例代码、练习题、测验题）
+search_index = InvertedIndex()
+
+# 每类搜索结果的最大返回数量
+SEARCH_RESULT_LIMIT = 20
+
+
+def index_exercise(exercise: dict):
+    """（重新）索引单道练习题"""
+    search_index.add_document('exercise', exercise.get('id'), exercise_fields(exercise), public_item(exercise))
+
+
+def index_quiz(quiz: dict):
+    """（重新）索引单道测验题"""
+    search_index.add_document('quiz', quiz.get('id'), quiz_fields(quiz), quiz)
+
+
+# 已索引内容的版本：题库快照版本号、每个模块的内容哈希
+_indexed_versions = {'exercises': None, 'quizzes': None, 'modules': {}}
+
+
+def index_module(module_id: str):
+    """（重新）索引单个模块的名称、知识点和示例代码"""
+    module = get_module_info(module_id)
+    if module:
+        fields = module_fields(module, get_module_description(module_id), get_module_example(module_id))
+        search_index.add_document('module', module_id, fields, module)
+        _indexed_versions['modules'][module_id] = render_cache.version(module_id)[0]
+
+
+def build_search_index():
+    """启动时构建全文检索索引"""
+    for module in MODULES:
+        index_module(module['id'])
+    for ex in get_all_exercises():
+        index_exercise(ex)
+    for q in get_all_quizzes():
+        index_quiz(q)
+    _indexed_versions['exercises'] = content_repo.exercises.generation
+    _indexed_versions['quizzes'] = content_repo.quizzes.generation
+
+
+def sync_search_index():
+    """题库或知识点文件被修改（批量导入、其他进程写入）后，增量更新检索索引"""
+    for key, kind, index, index_item in (('exercises', 'exercise', content_repo.exercises, index_exercise),
+                                         ('quizzes', 'quiz', content_repo.quizzes, index_quiz)):
+        generation = index.generation
+        if generation == _indexed_versions[key]:
+            continue
+        current = {str(item.get('id')): item for item in index.all()}
+        for doc_id in search_index.doc_ids(kind) - current.keys():
+            search_index.remove_document(kind, doc_id)
+        for doc_id, item in current.items():
+            if search_index.payload(kind, doc_id) != item:
+                index_item(item)
+        _indexed_versions[key] = generation
+    for module in MODULES:
+        module_id = module['id']
+        if render_cache.version(module_id)[0] != _indexed_versions['modules'].get(module_id):
+            index_module(module_id)
 
 
 def search_content(keyword: str) -> dict:
-    """全局搜索"""
+    """全局搜索（按 BM25 相关度排序）"""
     results = {
         'modules': [],
         'exercises': [],
@@ -308,22 +424,12 @@ def search_content(keyword: str) -> dict:
     if not keyword:
         return results
     
-    keyword = keyword.lower()
-    
-    # 搜索模块
-    for module in MODULES:
-        if keyword in module['name'].lower():
-            results['modules'].append(module)
-    
-    # 搜索练习题
-    for ex in get_all_exercises():
-        if keyword in ex.get('title', '').lower() or keyword in ex.get('description', '').lower():
-            results['exercises'].append(ex)
-    
-    # 搜索测验题
-    for q in get_all_quizzes():
-        if keyword in q.get('question', '').lower():
-            results['quizzes'].append(q)
+    sync_search_index()
+    kind_keys = {'module': 'modules', 'exercise': 'exercises', 'quiz': 'quizzes'}
+    for _score, kind, payload in search_index.search(keyword, limit=None):
+        bucket = results[kind_keys[kind]]
+        if len(bucket) < SEARCH_RESULT_LIMIT:
+            bucket.append(payload)
     
     return results
 
@@ -333,13 +439,9 @@ EXERCISES_FILE = DATA_DIR / 'exercises.json'
 
 
 def save_exercises(exercises_list: list):
-    """保存练习题列表到 JSON 文件"""
-    # 备份原文件
-    if EXERCISES_FILE.exists():
-        import shutil
-        backup_file = DATA_DIR / 'exercises.json.bak'
-        shutil.copy2(EXERCISES_FILE, backup_file)
+    """保存练习题列表到 JSON 文件（原子写入，不再需要 .bak 备份）"""
     save_json(EXERCISES_FILE, exercises_list)
+    content_repo.exercises.replace(exercises_list)
 
 
 def generate_exercise_id(module_id: str) -> str:
@@ -356,6 +458,85 @@ def save_module_description(module_id: str, content: str):
     md_file.parent.mkdir(parents=True, exist_ok=True)
     with open(md_file, 'w', encoding='utf-8') as f:
         f.write(content)
+    render_cache.invalidate(module_id)
+    index_module(module_id)
+
+
+# ==================== 内容启动快照 ====================
+
+# 启动信息：内容来源、快照状态、耗时（秒），由 /api/metrics 和启动日志输出
+startup_report = {'source': None, 'snapshot': None, 'content_seconds': None, 'boot_seconds': None}
+
+
+def content_snapshot_version() -> str:
+    """快照版本：全部模块内容、题库文件、影响渲染/索引的代码和依赖版本"""
+    paths = [MODULES_DIR / m['id'] / name for m in MODULES for name in ('description.md', 'example.py')]
+    paths += [content_repo.exercises.filepath, content_repo.quizzes.filepath]
+    paths += [BASE_DIR / name for name in ('config.py', 'render_cache.py', 'search_index.py')]
+    return source_version(paths, extra=(APP_VERSION, renderer_version()))
+
+
+def write_content_snapshot(path=None) -> tuple:
+    """渲染全部内容、构建检索索引后写入快照，返回 (路径, 字节数)"""
+    path = Path(path or CONTENT_SNAPSHOT_FILE)
+    # 先计算版本：构建期间源文件被修改时，快照会被判定为过期而不是带着旧内容生效
+    version = content_snapshot_version()
+    warm_caches()
+    sync_search_index()
+    state = {
+        'rendered': render_cache.export_entries(),
+        'exercises': content_repo.exercises.export_state(),
+        'quizzes': content_repo.quizzes.export_state(),
+        'search': search_index.export_state(),
+        'module_versions': dict(_indexed_versions['modules']),
+    }
+    return path, write_snapshot(path, version, state)
+
+
+def load_content_snapshot() -> str:
+    """从快照恢复渲染缓存、题库和检索索引，返回快照状态（loaded/missing/stale/corrupt）"""
+    state, status = read_snapshot(CONTENT_SNAPSHOT_FILE, content_snapshot_version())
+    if state is None:
+        return status
+    render_cache.load_entries(state['rendered'])
+    content_repo.exercises.load_state(*state['exercises'])
+    content_repo.quizzes.load_state(*state['quizzes'])
+    search_index.load_state(state['search'])
+    _indexed_versions['modules'].update(state['module_versions'])
+    _indexed_versions['exercises'] = content_repo.exercises.generation
+    _indexed_versions['quizzes'] = content_repo.quizzes.generation
+    return status
+
+
+def load_content():
+    """启动时加载内容：快照可用时直接使用，否则从源文件渲染并构建检索索引"""
+    started = time.perf_counter()
+    status = load_content_snapshot() if CONTENT_SNAPSHOT_ENABLED else 'disabled'
+    if status != LOADED:
+        build_search_index()
+    startup_report.update(source='snapshot' if status == LOADED else 'files', snapshot=status,
+                          content_seconds=time.perf_counter() - started)
+
+
+load_content()
+
+
+def warm_caches():
+    """预热内容缓存（gunicorn preload 时在 fork 前调用，各 worker 共享已渲染的内容）"""
+    for module in MODULES:
+        render_cache.description(module['id'])
+        render_cache.example(module['id'])
+    content_repo.exercises.all()
+    content_repo.quizzes.all()
+
+
+def reset_after_fork():
+    """worker 进程 fork 之后调用：重建后台定时器，丢弃继承自父进程的数据库连接"""
+    state_store.reset_after_fork()
+    progress_backend.reset_after_fork()
+    if progress_events is not None:
+        progress_events.reset_after_fork()
+    ai_cache.reset_after_fork()
 
 
 # ==================== 路由 ====================
@@ -371,13 +552,9 @@ def index():
     in_progress = sum(1 for m in progress['modules'].values() if m.get('status') == 'in_progress')
     unlocked_count = len(achievements.get('unlocked', []))
     
-    # 按分类组织模块
+    # 分类索引和学习路径在启动时构建
     categories = get_categories()
-    modules_by_category = {}
-    for cat in categories:
-        modules_by_category[cat] = get_category_modules(cat)
-    
-    # 获取学习路径
+    modules_by_category = MODULE_CATALOG.by_category
     learning_path = get_learning_path()
     
     # 今日成就检查
@@ -413,12 +590,11 @@ def learn(module_id):
     if not module_info:
         return "模块不存在", 404
     
-    description = get_module_description(module_id)
-    example = get_module_example(module_id)
+    description = render_cache.description(module_id)
+    example = render_cache.example(module_id)
     
     # 获取依赖
-    dependencies = get_module_dependencies(module_id)
-    dependency_modules = [get_module_info(d) for d in dependencies]
+    dependency_modules = get_dependency_modules(module_id)
     
     # 进度状态
     progress = get_progress()
@@ -436,18 +612,34 @@ def learn(module_id):
         update_module_status(module_id, 'in_progress')
         module_status = 'in_progress'
     
-    return render_template('learn.html',
-                         APP_NAME=APP_NAME,
-                         APP_ICON=APP_ICON,
-                         module_info=module_info,
-                         description=description,
-                         example=example,
-                         dependencies=dependency_modules,
-                         module_status=module_status,
-                         is_favorited=is_favorited,
-                         modules=all_modules,
-                         categories=categories,
-                         progress=progress)
+    # 页面由模块内容和学习者状态共同决定，内容和状态都未变时返回 304
+    content_version, last_modified = render_cache.version(module_id)
+    etag = hashlib.sha1(
+        f'{content_version}:{module_status}:{is_favorited}:{APP_VERSION}'.encode()
+    ).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(render_template('learn.html',
+                             APP_NAME=APP_NAME,
+                             APP_ICON=APP_ICON,
+                             module_info=module_info,
+                             description=description.text,
+                             description_html=description.html,
+                             example=example.text,
+                             example_html=example.html,
+                             highlight_css=HIGHLIGHT_CSS,
+                             dependencies=dependency_modules,
+                             module_status=module_status,
+                             is_favorited=is_favorited,
+                             modules=all_modules,
+                             categories=categories,
+                             progress=progress))
+    response.set_etag(etag)
+    response.last_modified = datetime.fromtimestamp(last_modified)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route('/exercises')
@@ -472,12 +664,11 @@ def exercises(module_id=None):
     
     # 按难度筛选
     if difficulty and difficulty != 'all':
-        exercises_list = [ex for ex in exercises_list if ex.get('difficulty') == difficulty]
+        exercises_list = content_repo.exercises.filter(module=module_id, difficulty=difficulty)
     
-    # 添加收藏状态
-    favorited_ids = favorites.get('exercises', [])
-    for ex in exercises_list:
-        ex['is_favorited'] = ex.get('id') in favorited_ids
+    # 添加收藏状态（复制一份，避免修改缓存中的题目）
+    favorited_ids = set(favorites.get('exercises', []))
+    exercises_list = [dict(ex, is_favorited=ex.get('id') in favorited_ids) for ex in exercises_list]
     
     # 计算当前题目
     total_count = len(exercises_list)
@@ -554,34 +745,20 @@ def quiz(module_id=None):
 @app.route('/stats')
 def stats():
     """学习统计页面"""
-    progress = get_progress()
-    achievements = get_achievements()
-    exercises_list = get_all_exercises()
-    quizzes_list = get_all_quizzes()
-    categories = get_categories()
-    
-    # 计算统计数据
-    completed_count = sum(1 for m in progress['modules'].values() if m.get('status') == 'completed')
-    exercises_count = len(progress.get('exercises', []))
-    quizzes_count = len(progress.get('quizzes', []))
-    
-    # 正确率
-    correct_count = sum(1 for e in progress.get('exercises', []) if e.get('correct', False))
-    correct_rate = (correct_count / exercises_count * 100) if exercises_count > 0 else 0
+    summary = get_learning_stats()
     
     return render_template('stats.html',
                          APP_NAME=APP_NAME,
                          APP_ICON=APP_ICON,
                          modules=MODULES,
-                         categories=categories,
-                         progress=progress,
-                         achievements=achievements,
-                         exercises=exercises_list,
-                         quizzes=quizzes_list,
-                         completed_count=completed_count,
-                         exercises_count=exercises_count,
-                         quizzes_count=quizzes_count,
-                         correct_rate=correct_rate)
+                         categories=get_categories(),
+                         stats=summary,
+                         module_status=summary['modules']['status'],
+                         achievements=get_achievements(),
+                         completed_count=summary['modules']['completed'],
+                         exercises_count=summary['exercises']['attempted'],
+                         quizzes_count=summary['quizzes']['completed'],
+                         correct_rate=summary['exercises']['correct_rate'])
 
 
 @app.route('/achievements')
@@ -627,10 +804,10 @@ def favorites_page():
     favorited_modules = [get_module_info(mid) for mid in favorites.get('modules', [])]
     
     # 获取收藏的练习题
-    favorited_exercises = [ex for ex in get_all_exercises() if ex.get('id') in favorites.get('exercises', [])]
+    favorited_exercises = [ex for ex in map(content_repo.exercises.get, favorites.get('exercises', [])) if ex]
     
     # 获取收藏的测验
-    favorited_quizzes = [q for q in get_all_quizzes() if q.get('id') in favorites.get('quizzes', [])]
+    favorited_quizzes = [q for q in map(content_repo.quizzes.get, favorites.get('quizzes', [])) if q]
     
     return render_template('favorites.html',
                          APP_NAME=APP_NAME,
@@ -650,6 +827,14 @@ def api_progress():
     return jsonify(get_progress())
 
 
+@app.route('/api/stats', methods=['GET'])
+def api_stats():
+    """学习统计 API（预先聚合的结果）"""
+    summary = get_learning_stats()
+    summary['achievements'] = {'unlocked': len(get_achievements().get('unlocked', []))}
+    return jsonify(summary)
+
+
 @app.route('/api/progress/module/<module_id>', methods=['POST'])
 def api_update_module(module_id):
     """更新模块状态"""
@@ -659,27 +844,123 @@ def api_update_module(module_id):
     return jsonify({'success': True})
 
 
-@app.route('/api/exercises', methods=['GET'])
-def api_exercises():
-    """获取练习题 API"""
-    module_id = request.args.get('module')
-    return jsonify(get_exercises(module_id))
-
-
 @app.route('/api/exercises/<exercise_id>/complete', methods=['POST'])
 def api_exercise_complete(exercise_id):
-    """标记练习题完成"""
+    """标记练习题完成（启用服务端评测时只记录尝试，答对需通过 /submit 评测）"""
     data = request.get_json()
-    correct = data.get('correct', False)
+    correct = data.get('correct', False) and not GRADER_ENABLED
     mark_exercise_completed(exercise_id, correct)
     return jsonify({'success': True})
 
 
+# 练习题评测引擎（评测进程在第一次提交时启动）
+grader = GradingEngine(
+    workers=GRADER_WORKERS,
+    queue_size=GRADER_QUEUE_SIZE,
+    cpu_seconds=GRADER_CPU_SECONDS,
+    memory_mb=GRADER_MEMORY_MB,
+    timeout=GRADER_TIMEOUT,
+    sandbox=GRADER_SANDBOX,
+    uid=GRADER_UID,
+    gid=GRADER_GID
+)
+atexit.register(grader.shutdown)
+
+
+@app.route('/api/exercises/<exercise_id>/submit', methods=['POST'])
+def api_exercise_submit(exercise_id):
+    """提交代码，服务端评测通过后记为答对"""
+    if not GRADER_ENABLED:
+        return jsonify({'success': False, 'error': '服务端评测未启用'}), 404
+    exercise = content_repo.exercises.get(exercise_id)
+    if exercise is None:
+        return jsonify({'success': False, 'error': '练习题不存在'}), 404
+    data = request.get_json() or {}
+    code = data.get('code', '')
+    if not code.strip():
+        return jsonify({'success': False, 'error': '代码不能为空'}), 400
+    
+    try:
+        result = grader.grade(exercise, code)
+    except (GraderBusyError, GraderUnavailableError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    
+    mark_exercise_completed(exercise_id, result['passed'])
+    return jsonify({'success': True, **result})
+
+
+def _collect_runtime_metrics():
+    """评测队列、AI 缓存等组件的当前状态"""
+    grading = grader.stats()
+    cache = ai_cache.stats()
+    compressed = compressed_cache.stats()
+    state = state_store.stats()
+    events = progress_events.stats() if progress_events is not None else None
+    samples = [
+        ('tutorial_grader_queue_depth', 'gauge', '评测队列中等待的提交数', [({}, grading['queue_depth'])]),
+        ('tutorial_grader_busy_workers', 'gauge', '正在执行的评测进程数', [({}, grading['busy'])]),
+        ('tutorial_grader_submissions_total', 'counter', '评测提交数',
+         [({'result': 'completed'}, grading['completed']), ({'result': 'rejected'}, grading['rejected']),
+          ({'result': 'timeout'}, grading['timeouts'])]),
+        ('tutorial_ai_cache_requests_total', 'counter', 'AI 回复缓存查询数',
+         [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses']),
+          ({'result': 'bypass'}, cache['bypassed'])]),
+        ('tutorial_ai_cache_bytes', 'gauge', 'AI 回复缓存占用字节数', [({}, cache['bytes'])]),
+        ('tutorial_compressed_cache_requests_total', 'counter', '压缩结果缓存查询数',
+         [({'result': 'hit'}, compressed['hits']), ({'result': 'miss'}, compressed['misses'])]),
+        ('tutorial_compressed_cache_bytes', 'gauge', '压缩结果缓存占用字节数', [({}, compressed['bytes'])]),
+        ('tutorial_state_cache_entries', 'gauge', '内存中缓存的状态文件数', [({}, state['entries'])]),
+        ('tutorial_state_cache_evictions_total', 'counter', '被淘汰的状态文件数', [({}, state['evictions'])]),
+        ('tutorial_startup_seconds', 'gauge', '应用冷启动耗时',
+         [({'phase': 'content', 'source': startup_report['source']}, startup_report['content_seconds']),
+          ({'phase': 'boot', 'source': startup_report['source']}, startup_report['boot_seconds'])]),
+    ]
+    if events is not None:
+        samples += [
+            ('tutorial_progress_events_pending', 'gauge', '等待写入的进度事件数', [({}, events['pending'])]),
+            ('tutorial_progress_events_total', 'counter', '已写入的进度事件数', [({}, events['events'])]),
+            ('tutorial_progress_event_batches_total', 'counter', '进度事件写入批次数', [({}, events['batches'])]),
+            ('tutorial_progress_event_errors_total', 'counter', '写入失败的批次数', [({}, events['errors'])]),
+        ]
+    return samples
+
+
+metrics.registry.register_collector(_collect_runtime_metrics)
+
+
+@app.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    """运行指标（Prometheus 文本格式）"""
+    if not METRICS_ENABLED:
+        return jsonify({'success': False, 'error': '运行指标未启用'}), 404
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/api/grader/stats', methods=['GET'])
+def api_grader_stats():
+    """评测引擎状态：队列深度、延迟等"""
+    return jsonify(grader.stats())
+
+
+def _content_list_response(index):
+    """题库列表：服务端筛选后分页、投影（参数见 pagination.list_response）"""
+    items = index.filter(
+        module=request.args.get('module', ''),
+        difficulty=request.args.get('difficulty', ''),
+        tag=request.args.get('tag', ''),
+        tags=parse_list(request.args.get('tags'))
+    )
+    try:
+        return list_response(items, request.args, index.position, HIDDEN_FIELDS)
+    except CursorError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
 @app.route('/api/quizzes', methods=['GET'])
+@http_cache.conditional(lambda: content_repo.quizzes.version)
 def api_quizzes():
-    """获取测验题 API"""
-    module_id = request.args.get('module')
-    return jsonify(get_quizzes(module_id))
+    """获取测验题 API（筛选、分页、字段投影参数同 /api/exercises）"""
+    return _content_list_response(content_repo.quizzes)
 
 
 @app.route('/api/quizzes/<quiz_id>/complete', methods=['POST'])
@@ -693,6 +974,7 @@ def api_quiz_complete(quiz_id):
 
 
 @app.route('/api/modules', methods=['GET'])
+@http_cache.conditional(lambda: APP_VERSION)
 def api_modules():
     """获取所有模块 API"""
     return jsonify(MODULES)
@@ -713,23 +995,51 @@ def api_favorites():
         fav_type = data.get('type')  # 'modules', 'exercises', 'quizzes'
         item_id = data.get('id')
         
-        favorites = get_favorites()
-        if item_id not in favorites.get(fav_type, []):
-            favorites.setdefault(fav_type, []).append(item_id)
-            save_favorites(favorites)
+        def add(favorites):
+            if item_id not in favorites.get(fav_type, []):
+                favorites.setdefault(fav_type, []).append(item_id)
+
+        update_favorites(add)
         
         return jsonify({'success': True})
-    else:
+    fav_type = request.args.get('type')
+    if not fav_type:
         return jsonify(get_favorites())
+    return _favorite_list_response(fav_type)
+
+
+def _favorite_list_response(fav_type: str):
+    """?type=modules|exercises|quizzes 时返回收藏的条目内容（按收藏顺序，支持筛选、分页、字段投影）"""
+    lookups = {'modules': get_module_info, 'exercises': content_repo.exercises.get, 'quizzes': content_repo.quizzes.get}
+    if fav_type not in lookups:
+        return jsonify({'success': False, 'error': 'type 必须是 modules/exercises/quizzes'}), 400
+    ids = [str(i) for i in get_favorites().get(fav_type, [])]
+    positions = {item_id: i for i, item_id in enumerate(ids)}
+    items = [item for item in map(lookups[fav_type], ids) if item]
+    module = request.args.get('module')
+    difficulty = request.args.get('difficulty')
+    tags = parse_list(request.args.get('tags'))
+    if module or difficulty or tags:
+        items = [
+            item for item in items
+            if (not module or module in (item.get('module'), item.get('module_id'), item.get('id')))
+            and (not difficulty or item.get('difficulty') == difficulty)
+            and all(t in (item.get('tags') or []) for t in tags)
+        ]
+    try:
+        return list_response(items, request.args, positions.get, HIDDEN_FIELDS)
+    except CursorError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
 
 
 @app.route('/api/favorites/<fav_type>/<item_id>', methods=['DELETE'])
 def api_remove_favorite(fav_type, item_id):
     """取消收藏"""
-    favorites = get_favorites()
-    if item_id in favorites.get(fav_type, []):
-        favorites[fav_type].remove(item_id)
-        save_favorites(favorites)
+    def remove(favorites):
+        if item_id in favorites.get(fav_type, []):
+            favorites[fav_type].remove(item_id)
+
+    update_favorites(remove)
     return jsonify({'success': True})
 
 
@@ -742,15 +1052,10 @@ def api_achievements():
 # ==================== 内容管理 API ====================
 
 @app.route('/api/exercises', methods=['GET'])
+@http_cache.conditional(lambda: content_repo.exercises.version)
 def api_get_exercises():
-    """获取所有练习题（支持按模块筛选）"""
-    module_filter = request.args.get('module', '')
-    exercises_list = get_all_exercises()
-    
-    if module_filter:
-        exercises_list = [e for e in exercises_list if e.get('module') == module_filter]
-    
-    return jsonify(exercises_list)
+    """获取练习题（按模块/难度/标签筛选，cursor 或 offset/limit 分页，fields 字段投影）"""
+    return _content_list_response(content_repo.exercises)
 
 
 @app.route('/api/exercises', methods=['POST'])
@@ -783,60 +1088,114 @@ def api_create_exercise():
         'tags': [t.strip() for t in data.get('tags', '').split(',') if t.strip()] if isinstance(data.get('tags'), str) else (data.get('tags') or [])
     }
     
-    exercises_list = get_all_exercises()
-    exercises_list.append(new_exercise)
-    save_exercises(exercises_list)
+    # 持锁读取-追加-写入，避免多个 worker 并发创建时互相覆盖
+    with file_lock(EXERCISES_FILE):
+        exercises_list = get_all_exercises()
+        exercises_list.append(new_exercise)
+        save_exercises(exercises_list)
+    index_exercise(new_exercise)
     
     return jsonify({'success': True, 'exercise': new_exercise})
 
 
+def _import_response(kind: str):
+    """批量导入：请求体为 JSONL，逐行流式读取"""
+    mode = request.args.get('mode', 'upsert')
+    if mode not in IMPORT_MODES:
+        return jsonify({'success': False, 'error': f"mode 必须是 {'/'.join(IMPORT_MODES)}"}), 400
+    report = import_jsonl(
+        getattr(content_repo, kind), kind, request.stream, mode,
+        skip_invalid=request.args.get('skip_invalid') == '1',
+        dry_run=request.args.get('dry_run') == '1',
+        allow_empty=request.args.get('allow_empty') == '1'
+    )
+    if report['total'] is None:
+        return jsonify({'success': False, **report}), 400
+    if report['written']:
+        sync_search_index()
+    return jsonify({'success': True, **report})
+
+
+def _export_response(kind: str):
+    """批量导出为 JSONL（逐条流式输出；不含 checks 等隐藏字段，完整备份使用命令行导出）"""
+    index = getattr(content_repo, kind)
+    module_id = request.args.get('module')
+    items = index.by_module(module_id) if module_id else index.all()
+    return Response(export_jsonl(map(public_item, items)), mimetype='application/x-ndjson', headers={
+        'Content-Disposition': f'attachment; filename={kind}.jsonl'
+    })
+
+
+@app.route('/api/exercises/import', methods=['POST'])
+def api_import_exercises():
+    """批量导入练习题（JSONL，?mode=upsert|skip|replace&skip_invalid=1&dry_run=1&allow_empty=1）"""
+    return _import_response('exercises')
+
+
+@app.route('/api/exercises/export', methods=['GET'])
+def api_export_exercises():
+    """批量导出练习题（JSONL，?module= 按模块筛选）"""
+    return _export_response('exercises')
+
+
+@app.route('/api/quizzes/import', methods=['POST'])
+def api_import_quizzes():
+    """批量导入测验题（JSONL，参数同练习题导入）"""
+    return _import_response('quizzes')
+
+
+@app.route('/api/quizzes/export', methods=['GET'])
+def api_export_quizzes():
+    """批量导出测验题（JSONL，?module= 按模块筛选）"""
+    return _export_response('quizzes')
+
+
 @app.route('/api/exercises/<exercise_id>', methods=['PUT'])
 def api_update_exercise(exercise_id):
     """更新练习题"""
     data = request.get_json()
-    exercises_list = get_all_exercises()
-    
-    # 查找目标题目
-    target_idx = None
-    for i, ex in enumerate(exercises_list):
-        if str(ex.get('id')) == str(exercise_id):
-            target_idx = i
-            break
-    
-    if target_idx is None:
-        return jsonify({'success': False, 'error': '题目不存在'}), 404
     
-    # 更新字段（保留未提供的字段）
-    ex = exercises_list[target_idx]
-    ex['title'] = data.get('title', ex.get('title', ''))
-    ex['module'] = data.get('module', ex.get('module', ''))
-    ex['difficulty'] = data.get('difficulty', ex.get('difficulty', 'easy'))
-    ex['points'] = int(data.get('points', ex.get('points', 10)))
-    ex['description'] = data.get('description', ex.get('description', ''))
-    ex['starter_code'] = data.get('starter_code', ex.get('starter_code', ''))
-    ex['solution'] = data.get('solution', ex.get('solution', ''))
-    
-    tags_data = data.get('tags')
-    if isinstance(tags_data, str):
-        ex['tags'] = [t.strip() for t in tags_data.split(',') if t.strip()]
-    elif isinstance(tags_data, list):
-        ex['tags'] = tags_data
-    
-    save_exercises(exercises_list)
-    return jsonify({'success': True, 'exercise': ex})
+    # 持锁定位并读-改-写：位置与列表取自同一份题库，期间其他 worker 无法写入
+    with file_lock(EXERCISES_FILE):
+        target_idx = content_repo.exercises.position(exercise_id)
+        if target_idx is None:
+            return jsonify({'success': False, 'error': '题目不存在'}), 404
+        
+        # 更新字段（保留未提供的字段），在副本上修改
+        exercises_list = get_all_exercises()
+        ex = dict(exercises_list[target_idx])
+        exercises_list[target_idx] = ex
+        ex['title'] = data.get('title', ex.get('title', ''))
+        ex['module'] = data.get('module', ex.get('module', ''))
+        ex['difficulty'] = data.get('difficulty', ex.get('difficulty', 'easy'))
+        ex['points'] = int(data.get('points', ex.get('points', 10)))
+        ex['description'] = data.get('description', ex.get('description', ''))
+        ex['starter_code'] = data.get('starter_code', ex.get('starter_code', ''))
+        ex['solution'] = data.get('solution', ex.get('solution', ''))
+        
+        tags_data = data.get('tags')
+        if isinstance(tags_data, str):
+            ex['tags'] = [t.strip() for t in tags_data.split(',') if t.strip()]
+        elif isinstance(tags_data, list):
+            ex['tags'] = tags_data
+        
+        save_exercises(exercises_list)
+    index_exercise(ex)
+    return jsonify({'success': True, 'exercise': public_item(ex)})
 
 
 @app.route('/api/exercises/<exercise_id>', methods=['DELETE'])
 def api_delete_exercise(exercise_id):
     """删除练习题"""
-    exercises_list = get_all_exercises()
-    original_len = len(exercises_list)
-    exercises_list = [ex for ex in exercises_list if str(ex.get('id')) != str(exercise_id)]
-    
-    if len(exercises_list) == original_len:
-        return jsonify({'success': False, 'error': '题目不存在'}), 404
-    
-    save_exercises(exercises_list)
+    with file_lock(EXERCISES_FILE):
+        target_idx = content_repo.exercises.position(exercise_id)
+        if target_idx is None:
+            return jsonify({'success': False, 'error': '题目不存在'}), 404
+        
+        exercises_list = get_all_exercises()
+        del exercises_list[target_idx]
+        save_exercises(exercises_list)
+    search_index.remove_document('exercise', exercise_id)
     return jsonify({'success': True})
 
 
@@ -894,93 +1253,122 @@ def admin():
 
 # ==================== AI 助手 ====================
 
+# 各服务商共享的长连接客户端
+ai_providers = ProviderRegistry(
+    max_concurrency=AI_MAX_CONCURRENCY,
+    pool_size=AI_POOL_SIZE,
+    timeout=AI_REQUEST_TIMEOUT
+)
+
+# 确定性请求的回复缓存
+ai_cache = ResponseCache(max_bytes=AI_CACHE_MAX_BYTES, ttl=AI_CACHE_TTL, persist_path=AI_CACHE_DB or None)
+
+
+def _ai_cache_key(data: dict, provider, messages: list, api_config: dict):
+    """返回缓存键；请求未开启缓存或不可缓存时返回 None
+
+    只有显式指定 temperature=0 的请求结果是确定的；未指定时使用服务商的默认温度（非 0），
+    与非 0 一样默认绕过缓存，除非同时指定 cache_nondeterministic=true。
+    键中包含实际请求的上游地址（api_url / base_url 可由客户端指定），不同服务器的回复不会混用
+    """
+    if not AI_CACHE_ENABLED or not data.get('cache'):
+        return None
+    temperature = api_config.get('temperature')
+    if (temperature is None or temperature != 0) and not data.get('cache_nondeterministic'):
+        ai_cache.record_bypass()
+        return None
+    model = api_config.get('model') or provider.default_model
+    endpoint, _headers, _payload = provider.build_request(messages, api_config, stream=False)
+    return make_cache_key(provider.name, model, messages, temperature=temperature, endpoint=endpoint)
+
+
+def _sse_event(payload: dict, event: str = None) -> str:
+    """格式化一条 Server-Sent Events 消息"""
+    prefix = f'event: {event}\n' if event else ''
+    return f'{prefix}data: {json.dumps(payload, ensure_ascii=False)}\n\n'
+
+
 @app.route('/api/ai/chat', methods=['POST'])
 def api_ai_chat():
-    """AI 对话 API"""
+    """AI 对话 API（stream=true 时以 SSE 逐段返回）"""
     data = request.get_json()
     messages = data.get('messages', [])
-    provider = data.get('provider', 'ollama')
+    provider_name = data.get('provider', 'ollama')
     api_config = data.get('config', {})
     
-    # 这里需要实现具体的 AI 调用逻辑
-    # 可以支持 Ollama, OpenAI, Claude 等
-    import requests
-    
-    try:
-        if provider == 'ollama':
-            api_url = api_config.get('api_url', 'http://localhost:11434')
-            model = api_config.get('model', 'llama3')
-            
-            response = requests.post(
-                f'{api_url}/api/chat',
-                json={
-                    'model': model,
-                    'messages': messages,
-                    'stream': False
-                },
-                timeout=60
-            )
-            result = response.json()
-            return jsonify({
-                'success': True,
-                'message': {'role': 'assistant', 'content': result.get('message', {}).get('content', '')}
-            })
-        
-        elif provider == 'openai':
-            api_key = api_config.get('api_key', '')
-            model = api_config.get('model', 'gpt-3.5-turbo')
-            
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers={
-                    'Authorization': f'Bearer {api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': model,
-                    'messages': messages
-                },
-                timeout=60
-            )
-            result = response.json()
-            return jsonify({
-                'success': True,
-                'message': {'role': 'assistant', 'content': result['choices'][0]['message']['content']}
-            })
-        
-        elif provider == 'claude':
-            api_key = api_config.get('api_key', '')
-            model = api_config.get('model', 'claude-3-haiku-20240307')
-            
-            response = requests.post(
-                'https://api.anthropic.com/v1/messages',
-                headers={
-                    'x-api-key': api_key,
-                    'anthropic-version': '2023-06-01',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': model,
-                    'max_tokens': 1024,
-                    'messages': messages
-                },
-                timeout=60
-            )
-            result = response.json()
-            return jsonify({
-                'success': True,
-                'message': {'role': 'assistant', 'content': result['content'][0]['text']}
-            })
+    provider = ai_providers.get(provider_name)
+    if provider is None:
+        return jsonify({'success': False, 'error': 'Unknown provider'})
+    
+    cache_key = _ai_cache_key(data, provider, messages, api_config)
+    cached = ai_cache.get(cache_key) if cache_key else None
+    
+    if data.get('stream'):
+        def generate():
+            if cached is not None:
+                yield _sse_event({'delta': cached})
+                yield _sse_event({'done': True, 'cached': True}, event='done')
+                return
+            try:
+                parts = []
+                for delta in provider.stream_chat(messages, api_config):
+                    parts.append(delta)
+                    yield _sse_event({'delta': delta})
+                if cache_key:
+                    ai_cache.set(cache_key, ''.join(parts))
+                yield _sse_event({'done': True}, event='done')
+            except Exception as e:
+                yield _sse_event({'error': str(e)}, event='error')
         
-        else:
-            return jsonify({'success': False, 'error': 'Unknown provider'})
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    if cached is not None:
+        return jsonify({
+            'success': True,
+            'cached': True,
+            'message': {'role': 'assistant', 'content': cached}
+        })
     
+    try:
+        content = provider.chat(messages, api_config)
+        if cache_key:
+            ai_cache.set(cache_key, content)
+        return jsonify({
+            'success': True,
+            'message': {'role': 'assistant', 'content': content}
+        })
+    except ProviderBusyError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 
+@app.route('/api/ai/cache', methods=['GET'])
+def api_ai_cache_stats():
+    """AI 回复缓存统计"""
+    return jsonify(ai_cache.stats())
+
+
+@app.route('/api/ai/cache', methods=['DELETE'])
+def api_ai_cache_clear():
+    """清空 AI 回复缓存"""
+    ai_cache.clear()
+    return jsonify({'success': True})
+
+
 # ==================== 启动 ====================
 
+startup_report['boot_seconds'] = time.perf_counter() - BOOT_STARTED
+
+
+def startup_summary() -> str:
+    """启动日志中的一行耗时说明"""
+    source = '启动快照' if startup_report['source'] == 'snapshot' else f'源文件（快照: {startup_report["snapshot"]}）'
+    return (f'应用加载 {startup_report["boot_seconds"] * 1000:.0f} ms，'
+            f'其中内容 {startup_report["content_seconds"] * 1000:.0f} ms，来源: {source}')
+
+
 if __name__ == '__main__':
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
@@ -988,9 +1376,11 @@ if __name__ == '__main__':
     print("=" * 50)
     print(f"{APP_ICON} {APP_NAME}")
     print(f"版本: {APP_VERSION}")
+    print(startup_summary())
     print("=" * 50)
     print(f"访问地址: http://localhost:{APP_PORT}")
     print("按 Ctrl+C 停止服务")
+    print("生产部署请使用: gunicorn -c gunicorn.conf.py wsgi:app")
     print("=" * 50)
     
-    app.run(host='0.0.0.0', port=APP_PORT, debug=True)
+    app.run(host='0.0.0.0', port=APP_PORT, debug=DEBUG)
@@ -0,0 +1,325 @@
+"""
+Python 教程 Web 平台 - 压测基准
+按真实学习者的访问比例回放请求（浏览首页、学习模块、做练习、测验、搜索、提交进度），
+统计每个路由的吞吐量（req/s）和 p50/p95/p99 延迟，结果保存为 JSON，
+可与之前的结果对比，任一路由退化超过阈值时以非零状态退出
+
+用法:
+    # 进程内压测（Flask test client，使用数据目录的临时副本，不影响真实进度）
+    python web/benchmark.py --duration 10 --concurrency 8 --output bench.json
+
+    # 压测已启动的服务（例如 gunicorn）
+    python web/benchmark.py --url http://127.0.0.1:8502 --duration 30
+
+    # 与基线对比，p95 变慢或吞吐下降超过 20% 时失败
+    python web/benchmark.py --baseline bench.json --threshold 0.2
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import secrets
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+BASE_DIR = Path(__file__).parent
+
+# 搜索词（中英文、前缀、代码标识符混合）
+SEARCH_TERMS = ['函数', '装饰器', 'list', 'dict', '异常', 'async', '生成器', 'class', 'json', '文件', 'lambda', 'def']
+
+# (权重, 路由标签)；请求的具体参数在 build_request 中随机生成
+TRAFFIC_MIX = [
+    (10, 'GET /'),
+    (30, 'GET /learn/<module_id>'),
+    (12, 'GET /exercises'),
+    (8, 'GET /quiz'),
+    (15, 'GET /api/search'),
+    (10, 'POST /api/progress/module/<module_id>'),
+    (10, 'POST /api/exercises/<exercise_id>/complete'),
+    (5, 'POST /api/quizzes/<quiz_id>/complete'),
+]
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """最近秩法计算百分位数（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Workload:
+    """按权重随机生成请求"""
+
+    def __init__(self, module_ids: list, exercise_ids: list, quiz_ids: list, seed: int = None):
+        self.module_ids = module_ids
+        self.exercise_ids = exercise_ids or ['ex_unknown']
+        self.quiz_ids = quiz_ids or ['quiz_unknown']
+        self._labels = [label for _, label in TRAFFIC_MIX]
+        self._weights = [weight for weight, _ in TRAFFIC_MIX]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_request(self):
+        """返回 (路由标签, 方法, 路径, JSON 请求体)"""
+        with self._lock:
+            label = self._random.choices(self._labels, self._weights)[0]
+            return self.build_request(label, self._random)
+
+    def build_request(self, label: str, rnd: random.Random):
+        if label == 'GET /':
+            return label, 'GET', '/', None
+        if label == 'GET /learn/<module_id>':
+            return label, 'GET', f'/learn/{rnd.choice(self.module_ids)}', None
+        if label == 'GET /exercises':
+            return label, 'GET', '/exercises', None
+        if label == 'GET /quiz':
+            return label, 'GET', '/quiz', None
+        if label == 'GET /api/search':
+            return label, 'GET', f'/api/search?q={rnd.choice(SEARCH_TERMS)}', None
+        if label == 'POST /api/progress/module/<module_id>':
+            status = rnd.choice(['in_progress', 'completed'])
+            return label, 'POST', f'/api/progress/module/{rnd.choice(self.module_ids)}', {'status': status}
+        if label == 'POST /api/exercises/<exercise_id>/complete':
+            return label, 'POST', f'/api/exercises/{rnd.choice(self.exercise_ids)}/complete', {'correct': True}
+        if label == 'POST /api/quizzes/<quiz_id>/complete':
+            return label, 'POST', f'/api/quizzes/{rnd.choice(self.quiz_ids)}/complete', {'score': rnd.choice([60, 80, 100])}
+        raise ValueError(label)
+
+
+# ==================== 请求执行 ====================
+
+class InProcessClient:
+    """进程内执行：每个线程一个 Flask test client"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body) -> int:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        return response.status_code
+
+
+class HTTPClient:
+    """压测已启动的服务：每个线程一个 keep-alive 连接"""
+
+    def __init__(self, base_url: str, timeout: float = 30):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body) -> int:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.request(method, self.base_url + path, json=body, timeout=self.timeout)
+        return response.status_code
+
+
+def run_load(client, workload: Workload, duration: float, concurrency: int, warmup: float = 1.0) -> dict:
+    """并发回放请求，返回 {路由标签: {'latencies': [...], 'errors': n}} 和实际测量时长"""
+    samples = {label: {'latencies': [], 'errors': 0} for _, label in TRAFFIC_MIX}
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+
+    def worker():
+        local = {label: {'latencies': [], 'errors': 0} for _, label in TRAFFIC_MIX}
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            label, method, path, body = workload.next_request()
+            t0 = time.perf_counter()
+            try:
+                ok = client.request(method, path, body) < 400
+            except Exception:
+                ok = False
+            t1 = time.perf_counter()
+            if t0 < measure_from:
+                continue
+            if ok:
+                local[label]['latencies'].append(t1 - t0)
+            else:
+                local[label]['errors'] += 1
+        with lock:
+            for label, data in local.items():
+                samples[label]['latencies'].extend(data['latencies'])
+                samples[label]['errors'] += data['errors']
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 截止时仍在进行的请求也计入样本，时长按最后一个请求结束时计算
+    return samples, time.perf_counter() - measure_from
+
+
+def summarize(samples: dict, elapsed: float) -> dict:
+    """汇总为每个路由的 req/s 和延迟百分位（毫秒）"""
+    routes = {}
+    all_latencies = []
+    total_errors = 0
+    for label, data in samples.items():
+        latencies = sorted(data['latencies'])
+        all_latencies.extend(latencies)
+        total_errors += data['errors']
+        if not latencies and not data['errors']:
+            continue
+        routes[label] = _stats(latencies, data['errors'], elapsed)
+    all_latencies.sort()
+    return {'routes': routes, 'total': _stats(all_latencies, total_errors, elapsed)}
+
+
+def _stats(latencies: list, errors: int, elapsed: float) -> dict:
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'rps': round(count / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+# ==================== 基线对比 ====================
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """对比两次结果，返回退化描述列表（p95 变慢或吞吐下降超过阈值）"""
+    regressions = []
+    for label, base in baseline.get('routes', {}).items():
+        cur = current['routes'].get(label)
+        if cur is None or not base.get('requests'):
+            continue
+        if base['p95_ms'] > 0 and cur['p95_ms'] > base['p95_ms'] * (1 + threshold):
+            regressions.append(f"{label}: p95 {base['p95_ms']}ms -> {cur['p95_ms']}ms")
+        if base['rps'] > 0 and cur['rps'] < base['rps'] * (1 - threshold):
+            regressions.append(f"{label}: rps {base['rps']} -> {cur['rps']}")
+        if cur['errors'] > base.get('errors', 0):
+            regressions.append(f"{label}: errors {base.get('errors', 0)} -> {cur['errors']}")
+    return regressions
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_report(result: dict):
+    header = f"{'路由':<44}{'请求数':>8}{'错误':>6}{'req/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print('-' * len(header))
+    rows = list(result['routes'].items()) + [('总计', result['total'])]
+    for label, s in rows:
+        print(f"{label:<44}{s['requests']:>8}{s['errors']:>6}{s['rps']:>10}"
+              f"{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}")
+    print('（延迟单位: 毫秒）')
+
+
+# ==================== 入口 ====================
+
+def _load_ids(data_dir: Path, filename: str) -> list:
+    path = data_dir / filename
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [str(item['id']) for item in json.load(f) if 'id' in item]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Python 教程 Web 平台压测')
+    parser.add_argument('--url', help='压测已启动的服务（默认进程内压测）')
+    parser.add_argument('--duration', type=float, default=10, help='测量时长（秒）')
+    parser.add_argument('--warmup', type=float, default=1, help='预热时长（秒，不计入结果）')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发客户端数')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子（固定请求序列）')
+    parser.add_argument('--output', help='结果 JSON 输出路径')
+    parser.add_argument('--baseline', help='基线结果 JSON，用于检测退化')
+    parser.add_argument('--threshold', type=float, default=0.2, help='允许的退化比例（默认 0.2）')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(BASE_DIR))
+    if not args.url:
+        # 进程内压测只导入应用、不对外服务，使用一次性会话密钥（需在导入 config 之前设置）
+        os.environ.setdefault('SECRET_KEY', secrets.token_hex(32))
+    from config import MODULES
+
+    data_dir = BASE_DIR / 'data'
+    tmp_dir = None
+    if args.url:
+        client = HTTPClient(args.url)
+    else:
+        # 进程内压测使用数据目录的临时副本，进度提交不会写入真实数据
+        tmp_dir = tempfile.mkdtemp(prefix='tutorial-bench-')
+        shutil.copytree(data_dir, Path(tmp_dir) / 'data',
+                        ignore=shutil.ignore_patterns('*.db', '*.db-*', '*.lock', '*.py'))
+        os.environ['TUTORIAL_DATA_DIR'] = str(Path(tmp_dir) / 'data')
+        import app as web_app
+        client = InProcessClient(web_app.app)
+
+    workload = Workload([m['id'] for m in MODULES], _load_ids(data_dir, 'exercises.json'),
+                        _load_ids(data_dir, 'quizzes.json'), seed=args.seed)
+    try:
+        samples, elapsed = run_load(client, workload, args.duration, args.concurrency, args.warmup)
+    finally:
+        if tmp_dir is not None:
+            # 先写完并停止写回队列（写线程仍可能在写临时目录），再落盘状态、删除临时目录
+            if web_app.progress_events is not None:
+                web_app.progress_events.close()
+            web_app.state_store.flush()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    result = summarize(samples, elapsed)
+    result['meta'] = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'target': args.url or 'in-process',
+        'duration': args.duration,
+        'concurrency': args.concurrency,
+        'python': platform.python_version(),
+    }
+    print_report(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f'结果已保存: {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f'性能退化（阈值 {args.threshold:.0%}）:')
+            for line in regressions:
+                print(f'  - {line}')
+            return 1
+        print(f"未发现超过 {args.threshold:.0%} 的性能退化（基线 {baseline.get('meta', {}).get('revision')}）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,9 @@ Python 教程 Web 平台 - 模块配置
 包含24个知识模块的定义
 """
 
+import os
+import heapq
+
 # ==================== 模块定义 ====================
 
 MODULES = [
@@ -110,37 +113,167 @@ MODULE_DEPENDENCIES = {
 APP_NAME = "Python 教程学习平台"
 APP_ICON = "🐍"
 APP_VERSION = "3.0.0"
-APP_PORT = 8502
+APP_PORT = int(os.environ.get('PORT', 8502))
+
+# 开发服务器（python app.py）是否开启调试模式；生产环境使用 gunicorn，见 gunicorn.conf.py
+DEBUG = os.environ.get('FLASK_DEBUG', '1') == '1'
+
+# 学习进度存储后端: sqlite（默认，支持多进程并发写入）或 json（兼容旧版 progress.json）
+PROGRESS_BACKEND = os.environ.get('PROGRESS_BACKEND', 'sqlite')
+# 多学习者：每个浏览器会话一个学习者，进度/成就/收藏按学习者分片存储（0 时所有访问者共用默认学习者）
+MULTI_TENANT = os.environ.get('MULTI_TENANT', '1') == '1'
+# 开启多学习者后，第一个新会话认领升级前默认学习者的进度/成就/收藏（只认领一次，原文件保留）；
+# 公开部署且不希望任何访客继承旧数据时设为 0
+ADOPT_LEGACY_USER = os.environ.get('ADOPT_LEGACY_USER', '1') == '1'
+# 会话签名密钥：多学习者模式下必须设置（gunicorn 等部署未设置时拒绝启动）；
+# 开发服务器（python app.py）和单学习者模式未设置时随机生成并保存在 data/.secret_key
+SECRET_KEY = os.environ.get('SECRET_KEY', '')
+# 内存中保留的活跃学习者数量（成就计数器、学习统计），超过后淘汰最久未活跃的
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+# 进度事件写回队列：请求只入队，后台线程在 linger 窗口内合并一批事件一次写入（0 关闭，改为同步写入）
+PROGRESS_WRITE_BEHIND = os.environ.get('PROGRESS_WRITE_BEHIND', '1') == '1'
+PROGRESS_BATCH_LINGER_MS = float(os.environ.get('PROGRESS_BATCH_LINGER_MS', 20))
+PROGRESS_BATCH_MAX = int(os.environ.get('PROGRESS_BATCH_MAX', 500))
+
+# AI 助手：每个服务商的最大并发上游请求数、连接池大小、请求超时（秒）
+AI_MAX_CONCURRENCY = int(os.environ.get('AI_MAX_CONCURRENCY', 4))
+AI_POOL_SIZE = int(os.environ.get('AI_POOL_SIZE', 8))
+AI_REQUEST_TIMEOUT = int(os.environ.get('AI_REQUEST_TIMEOUT', 60))
+
+# AI 回复缓存（只用于带 cache=true 且显式 temperature=0 的请求）：总字节上限（内存和 SQLite 各自）、
+# 过期时间（秒）、可选的 SQLite 持久化路径
+AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', '1') == '1'
+AI_CACHE_MAX_BYTES = int(os.environ.get('AI_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', 24 * 3600))
+AI_CACHE_DB = os.environ.get('AI_CACHE_DB', '')
+
+# 练习题服务端评测：会执行访问者提交的任意代码，默认关闭（关闭时沿用前端自评）。
+# 启用后评测代码运行在沙箱中（见 grader.py）：GRADER_SANDBOX=auto 时以 root 运行用内核命名空间 + chroot
+# 并切换到 GRADER_UID/GRADER_GID，以普通用户运行用 bubblewrap；无法建立沙箱时拒绝评测。
+# none 不做任何隔离，只能用于本机开发
+GRADER_ENABLED = os.environ.get('GRADER_ENABLED', '0') == '1'
+GRADER_SANDBOX = os.environ.get('GRADER_SANDBOX', 'auto')
+GRADER_UID = int(os.environ.get('GRADER_UID', 65534))
+GRADER_GID = int(os.environ.get('GRADER_GID', 65534))
+# 评测进程数、排队上限、单次提交的 CPU 时间（秒）/ 内存（MB）/ 墙钟超时（秒）
+GRADER_WORKERS = int(os.environ.get('GRADER_WORKERS', 2))
+GRADER_QUEUE_SIZE = int(os.environ.get('GRADER_QUEUE_SIZE', 16))
+GRADER_CPU_SECONDS = int(os.environ.get('GRADER_CPU_SECONDS', 2))
+GRADER_MEMORY_MB = int(os.environ.get('GRADER_MEMORY_MB', 256))
+GRADER_TIMEOUT = float(os.environ.get('GRADER_TIMEOUT', 5))
+
+# 运行指标（/api/metrics）；PROFILE_SLOW_MS > 0 时对超过该耗时（毫秒）的请求写出采样调用栈
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 0))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '')
+
+# 内容启动快照（python snapshot.py build 生成）：启动时优先从快照加载渲染结果、题库和检索索引；
+# 快照文件默认为数据目录下的 content.snapshot
+CONTENT_SNAPSHOT_ENABLED = os.environ.get('CONTENT_SNAPSHOT_ENABLED', '1') == '1'
+CONTENT_SNAPSHOT_FILE = os.environ.get('CONTENT_SNAPSHOT_FILE', '')
+
+# HTTP 压缩：超过该字节数的文本/JSON 响应按 Accept-Encoding 压缩（brotli 已安装时优先）
+HTTP_COMPRESS_ENABLED = os.environ.get('HTTP_COMPRESS_ENABLED', '1') == '1'
+HTTP_COMPRESS_MIN_BYTES = int(os.environ.get('HTTP_COMPRESS_MIN_BYTES', 1024))
+HTTP_COMPRESS_LEVEL = int(os.environ.get('HTTP_COMPRESS_LEVEL', 6))
+# 压缩结果缓存上限（字节）
+HTTP_COMPRESS_CACHE_BYTES = int(os.environ.get('HTTP_COMPRESS_CACHE_BYTES', 8 * 1024 * 1024))
+
+
+class CatalogError(ValueError):
+    """模块目录配置错误（如学习路径依赖成环）"""
+
+
+class ModuleCatalog:
+    """模块目录：导入时构建一次，之后只读
+
+    - 按 ID、分类建立索引，查询为 O(1)
+    - 按 MODULE_DEPENDENCIES 拓扑排序得到学习路径（无依赖关系时按 order 排列）
+    - 预先计算每个模块的直接依赖和传递闭包（全部前置模块）
+    依赖中不存在的模块 ID 会被忽略并记录在 unknown_dependencies 中；依赖成环时抛出 CatalogError
+    """
+
+    def __init__(self, modules: list, categories: list, dependencies: dict):
+        self.modules = modules
+        self.by_id = {m['id']: m for m in modules}
+        self.by_category = {cat: [] for cat in categories}
+        for m in modules:
+            self.by_category.setdefault(m['category'], []).append(m)
+
+        self.dependencies = {}
+        self.unknown_dependencies = {}
+        for m in modules:
+            deps = dependencies.get(m['id'], [])
+            self.dependencies[m['id']] = [d for d in deps if d in self.by_id]
+            unknown = [d for d in deps if d not in self.by_id]
+            if unknown:
+                self.unknown_dependencies[m['id']] = unknown
+
+        self.learning_path = self._topological_order()
+        self.position = {m['id']: i for i, m in enumerate(self.learning_path)}
+        self.dependency_modules = {
+            mid: [self.by_id[d] for d in deps] for mid, deps in self.dependencies.items()
+        }
+        self.prerequisites = {}
+        for m in self.learning_path:
+            closure = set(self.dependencies[m['id']])
+            for dep in self.dependencies[m['id']]:
+                closure.update(self.prerequisites[dep])
+            self.prerequisites[m['id']] = sorted(closure, key=self.position.__getitem__)
+
+    def _topological_order(self) -> list:
+        """Kahn 算法；同一时刻可学习的模块按 order 排序"""
+        indegree = {mid: len(deps) for mid, deps in self.dependencies.items()}
+        dependents = {mid: [] for mid in self.by_id}
+        for mid, deps in self.dependencies.items():
+            for dep in deps:
+                dependents[dep].append(mid)
+        ready = [(self.by_id[mid]['order'], mid) for mid, n in indegree.items() if n == 0]
+        heapq.heapify(ready)
+        path = []
+        while ready:
+            _, mid = heapq.heappop(ready)
+            path.append(self.by_id[mid])
+            for child in dependents[mid]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    heapq.heappush(ready, (self.by_id[child]['order'], child))
+        if len(path) != len(self.by_id):
+            cyclic = sorted(mid for mid, n in indegree.items() if n > 0)
+            raise CatalogError(f"模块依赖存在环（无法排序的模块: {', '.join(cyclic)}）")
+        return path
+
+
+# 模块目录（导入时构建并检查依赖）
+MODULE_CATALOG = ModuleCatalog(MODULES, MODULE_CATEGORIES, MODULE_DEPENDENCIES)
 
 
 def get_module_info(module_id: str) -> dict:
     """获取模块信息"""
-    for m in MODULES:
-        if m['id'] == module_id:
-            return m
-    return None
+    return MODULE_CATALOG.by_id.get(module_id)
 
 
 def get_category_modules(category: str) -> list:
-    """获取分类下的模块"""
-    return [m for m in MODULES if m['category'] == category]
+    """获取分类下的模块（返回共享列表，调用方不要修改）"""
+    return MODULE_CATALOG.by_category.get(category, [])
 
 
 def get_module_dependencies(module_id: str) -> list:
-    """获取模块的依赖"""
-    return MODULE_DEPENDENCIES.get(module_id, [])
+    """获取模块的直接依赖（模块 ID）"""
+    return MODULE_CATALOG.dependencies.get(module_id, [])
+
+
+def get_dependency_modules(module_id: str) -> list:
+    """获取模块的直接依赖（模块信息）"""
+    return MODULE_CATALOG.dependency_modules.get(module_id, [])
+
+
+def get_prerequisites(module_id: str) -> list:
+    """获取模块的全部前置模块（传递闭包，按学习路径顺序）"""
+    return MODULE_CATALOG.prerequisites.get(module_id, [])
 
 
 def get_learning_path() -> list:
-    """获取推荐学习路径（按顺序）"""
-    path = []
-    added = set()
-    
-    for order in range(1, 25):
-        for m in MODULES:
-            if m['order'] == order and m['id'] not in added:
-                path.append(m)
-                added.add(m['id'])
-                break
-    
-    return path
+    """获取推荐学习路径（按依赖拓扑排序，返回共享列表）"""
+    return MODULE_CATALOG.learning_path
@@ -0,0 +1,257 @@
+"""
+Python 教程 Web 平台 - 题库批量导入/导出（JSONL）
+- 导入：逐行读取、校验，按 id 去重（同一批次中后出现的覆盖先出现的），
+  全部通过后与现有题库合并，只做一次原子写入；有任一行不合法时默认整批不写入
+- 导出：逐条输出 JSON Lines，可按模块筛选
+HTTP 接口见 app.py（/api/exercises/import、/api/quizzes/export 等），也可直接在命令行使用
+
+用法:
+    python web/content_io.py import exercises new_exercises.jsonl
+    python web/content_io.py import quizzes - --mode skip < quizzes.jsonl
+    python web/content_io.py import exercises batch.jsonl --dry-run
+    python web/content_io.py export quizzes --module functions -o functions_quizzes.jsonl
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+
+from state_store import atomic_write_json, file_lock
+
+# 导入模式：upsert 新增并覆盖已有；skip 只新增，已有的跳过；replace 用导入内容替换整个题库
+IMPORT_MODES = ('upsert', 'skip', 'replace')
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+# 报告中最多列出的错误行数
+MAX_REPORTED_ERRORS = 100
+
+INVALID_LINES_ERROR = '存在不合法的行，未导入'
+EMPTY_REPLACE_ERROR = '没有合法的题目，replace 会清空整个题库，未导入（确认清空请使用 allow_empty）'
+
+
+class ContentValidationError(ValueError):
+    """单条题目不合法"""
+
+
+def _require_text(item: dict, field: str):
+    value = item.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise ContentValidationError(f'缺少必填字段: {field}')
+
+
+def validate_exercise(item: dict) -> dict:
+    """校验并规范化一道练习题"""
+    for field in ('id', 'module', 'title', 'description'):
+        _require_text(item, field)
+    if item.get('difficulty') not in DIFFICULTIES:
+        raise ContentValidationError('难度必须是 easy/medium/hard')
+    tags = item.get('tags') or []
+    if isinstance(tags, str):
+        tags = [t.strip() for t in tags.split(',') if t.strip()]
+    if not isinstance(tags, list):
+        raise ContentValidationError('tags 必须是列表或逗号分隔的字符串')
+    try:
+        points = int(item.get('points', 10))
+    except (TypeError, ValueError):
+        raise ContentValidationError('points 必须是整数')
+    if item.get('checks') is not None and not isinstance(item['checks'], str):
+        raise ContentValidationError('checks 必须是字符串（评测用的断言代码）')
+    return {
+        **item,
+        'points': points,
+        'starter_code': item.get('starter_code') or '',
+        'solution': item.get('solution') or '',
+        'tags': tags,
+    }
+
+
+def validate_quiz(item: dict) -> dict:
+    """校验并规范化一道测验题"""
+    for field in ('id', 'module_id', 'question', 'answer'):
+        _require_text(item, field)
+    options = item.get('options')
+    if not isinstance(options, list) or len(options) < 2:
+        raise ContentValidationError('options 至少需要两个选项')
+    answer = item['answer'].strip().upper()
+    if len(answer) != 1 or not 0 <= ord(answer) - ord('A') < len(options):
+        raise ContentValidationError(f'answer 必须是 A-{chr(ord("A") + len(options) - 1)} 之一')
+    return {**item, 'answer': answer}
+
+
+VALIDATORS = {
+    'exercises': validate_exercise,
+    'quizzes': validate_quiz,
+}
+
+
+def parse_jsonl(lines, validate):
+    """逐行解析并校验，产出 (行号, 题目, 错误信息)，题目和错误信息二者有一个为 None"""
+    for lineno, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8-sig' if lineno == 1 else 'utf-8', errors='replace')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield lineno, None, f'JSON 解析失败: {e.msg}'
+            continue
+        if not isinstance(item, dict):
+            yield lineno, None, '每行必须是一个 JSON 对象'
+            continue
+        if isinstance(item.get('id'), (int, float)):
+            item['id'] = str(item['id'])
+        try:
+            yield lineno, validate(item), None
+        except ContentValidationError as e:
+            yield lineno, None, str(e)
+
+
+def import_jsonl(index, kind: str, lines, mode: str = 'upsert',
+                 skip_invalid: bool = False, dry_run: bool = False, allow_empty: bool = False) -> dict:
+    """把 JSONL 行导入题库 index（ContentIndex），返回导入报告
+
+    校验在一次流式遍历中完成，期间只保留按 id 去重后的题目；
+    写入时持有跨进程文件锁，合并后整体原子写入一次并重建内存索引。
+    replace 模式下没有任何合法题目时（空文件或全部不合法）拒绝执行，除非 allow_empty 明确确认清空
+    """
+    if mode not in IMPORT_MODES:
+        raise ValueError(f'未知的导入模式: {mode}')
+    validate = VALIDATORS[kind]
+
+    incoming = {}
+    report = {'received': 0, 'duplicates': 0, 'invalid': 0, 'errors': [],
+              'created': 0, 'updated': 0, 'skipped': 0, 'removed': 0,
+              'total': None, 'written': False, 'error': None}
+    for lineno, item, error in parse_jsonl(lines, validate):
+        report['received'] += 1
+        if error is not None:
+            report['invalid'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'line': lineno, 'error': error})
+            continue
+        if item['id'] in incoming:
+            report['duplicates'] += 1
+            del incoming[item['id']]     # 重新插入，保持最后一次出现的位置
+        incoming[item['id']] = item
+
+    if report['invalid'] and not skip_invalid:
+        report['error'] = INVALID_LINES_ERROR
+        return report
+    if mode == 'replace' and not incoming and not allow_empty:
+        report['error'] = EMPTY_REPLACE_ERROR
+        return report
+
+    with file_lock(index.filepath):
+        existing = index.all()
+        if mode == 'replace':
+            merged = list(incoming.values())
+            for item_id, item in incoming.items():
+                position = index.position(item_id)
+                if position is None:
+                    report['created'] += 1
+                elif existing[position] != item:
+                    report['updated'] += 1
+                else:
+                    report['skipped'] += 1
+            report['removed'] = sum(1 for item in existing if str(item.get('id')) not in incoming)
+        else:
+            merged = list(existing)
+            for item_id, item in incoming.items():
+                position = index.position(item_id)
+                if position is None:
+                    merged.append(item)
+                    report['created'] += 1
+                elif mode == 'skip':
+                    report['skipped'] += 1
+                elif merged[position] != item:
+                    merged[position] = item
+                    report['updated'] += 1
+                else:
+                    report['skipped'] += 1
+        report['total'] = len(merged)
+        changed = report['created'] or report['updated'] or report['removed']
+        if mode == 'replace' and not changed:
+            # 内容相同但顺序不同时仍按导入顺序写入
+            changed = [str(item.get('id')) for item in existing] != list(incoming)
+        if changed and not dry_run:
+            atomic_write_json(index.filepath, merged)
+            index.replace(merged)
+            report['written'] = True
+    return report
+
+
+def export_jsonl(items):
+    """逐条产出 JSON Lines（每行以换行结尾）"""
+    for item in items:
+        yield json.dumps(item, ensure_ascii=False) + '\n'
+
+
+# ==================== 命令行 ====================
+
+def _print_report(report: dict):
+    print(f"读取 {report['received']} 行，重复 {report['duplicates']}，不合法 {report['invalid']}")
+    for error in report['errors']:
+        print(f"  第 {error['line']} 行: {error['error']}", file=sys.stderr)
+    if report['total'] is None:
+        print(report['error'])
+        if report['error'] == INVALID_LINES_ERROR:
+            print('使用 --skip-invalid 只导入合法的行')
+        return
+    print(f"新增 {report['created']}，更新 {report['updated']}，跳过 {report['skipped']}，"
+          f"删除 {report['removed']}，导入后共 {report['total']} 条"
+          + ('' if report['written'] else '（未写入）'))
+
+
+def main(argv=None) -> int:
+    from content_repo import ContentRepository
+
+    parser = argparse.ArgumentParser(description='题库批量导入/导出（JSONL）')
+    parser.add_argument('--data-dir', default=os.environ.get('TUTORIAL_DATA_DIR') or str(Path(__file__).parent / 'data'),
+                        help='数据目录（默认 web/data 或 TUTORIAL_DATA_DIR）')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    imp = sub.add_parser('import', help='从 JSONL 导入')
+    imp.add_argument('kind', choices=sorted(VALIDATORS))
+    imp.add_argument('file', help='JSONL 文件路径，- 表示标准输入')
+    imp.add_argument('--mode', choices=IMPORT_MODES, default='upsert', help='导入模式（默认 upsert）')
+    imp.add_argument('--skip-invalid', action='store_true', help='跳过不合法的行，只导入合法的行')
+    imp.add_argument('--dry-run', action='store_true', help='只校验和统计，不写入')
+    imp.add_argument('--allow-empty', action='store_true', help='replace 模式下没有合法题目时仍执行（清空题库）')
+
+    exp = sub.add_parser('export', help='导出为 JSONL')
+    exp.add_argument('kind', choices=sorted(VALIDATORS))
+    exp.add_argument('--module', help='只导出该模块的题目')
+    exp.add_argument('-o', '--output', help='输出文件（默认标准输出）')
+
+    args = parser.parse_args(argv)
+    repo = ContentRepository(args.data_dir)
+    index = getattr(repo, args.kind)
+
+    if args.command == 'import':
+        if args.file == '-':
+            report = import_jsonl(index, args.kind, sys.stdin, args.mode, args.skip_invalid, args.dry_run,
+                                  args.allow_empty)
+        else:
+            with open(args.file, 'r', encoding='utf-8-sig') as f:
+                report = import_jsonl(index, args.kind, f, args.mode, args.skip_invalid, args.dry_run,
+                                      args.allow_empty)
+        _print_report(report)
+        return 1 if report['total'] is None else 0
+
+    items = index.by_module(args.module) if args.module else index.all()
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        out.writelines(export_jsonl(items))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Python 教程 Web 平台 - 题库内容仓库
+exercises.json / quizzes.json 只加载一次，并预先建立索引：
+- 按 ID（含在列表中的位置）
+- 按模块、标签、难度
+列表页、按 ID 的查找/更新/删除都不再扫描整个题库；
+写入（save_exercises）后直接用新列表重建索引，文件被外部脚本修改时按 mtime 自动重新加载
+"""
+
+import json
+import itertools
+import threading
+from pathlib import Path
+
+from metrics import timed, JSON_IO_LATENCY
+from state_store import file_signature
+
+# 只在服务端使用、不随 API/搜索结果/HTTP 导出返回的字段（checks 为评测用的隐藏断言）
+HIDDEN_FIELDS = ('checks',)
+
+
+def public_item(item: dict) -> dict:
+    """去掉隐藏字段后的题目（没有隐藏字段时直接返回原对象，不复制）"""
+    if not any(field in item for field in HIDDEN_FIELDS):
+        return item
+    return {k: v for k, v in item.items() if k not in HIDDEN_FIELDS}
+
+
+class _Snapshot:
+    """某一时刻题库及其索引（构建后只读，整体替换以保证线程安全）"""
+
+    __slots__ = ('generation', 'items', 'by_id', 'position', 'by_module', 'by_tag', 'by_difficulty')
+
+    _generations = itertools.count(1)
+
+    def __init__(self, items: list, module_key: str):
+        self.generation = next(self._generations)
+        self.items = items
+        self.by_id = {}
+        self.position = {}
+        self.by_module = {}
+        self.by_tag = {}
+        self.by_difficulty = {}
+        for i, item in enumerate(items):
+            item_id = str(item.get('id'))
+            self.by_id[item_id] = item
+            self.position[item_id] = i
+            self.by_module.setdefault(item.get(module_key), []).append(item)
+            for tag in item.get('tags') or []:
+                self.by_tag.setdefault(tag, []).append(item)
+            if item.get('difficulty'):
+                self.by_difficulty.setdefault(item['difficulty'], []).append(item)
+
+
+class ContentIndex:
+    """单个题库文件的内存索引
+
+    返回的列表和字典与缓存共享，调用方不应原地修改；
+    需要修改时先复制，再通过 replace() 写回
+    """
+
+    def __init__(self, filepath, module_key: str):
+        self.filepath = Path(filepath)
+        self.module_key = module_key
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._signature = None
+
+    @property
+    def generation(self) -> int:
+        """快照版本号，每次重新加载或写入后递增"""
+        return self._current().generation
+
+    @property
+    def version(self) -> str:
+        """当前快照对应的文件签名（各进程一致，可用作 ETag）"""
+        self._current()
+        signature = self._signature
+        return f'{signature[0]:x}-{signature[1]:x}' if signature else 'empty'
+
+    def all(self) -> list:
+        """全部题目（保持文件中的顺序）"""
+        return self._current().items
+
+    def get(self, item_id):
+        """按 ID 查找，不存在返回 None"""
+        return self._current().by_id.get(str(item_id))
+
+    def position(self, item_id):
+        """题目在列表中的位置，不存在返回 None"""
+        return self._current().position.get(str(item_id))
+
+    def by_module(self, module_id: str) -> list:
+        return self._current().by_module.get(module_id, [])
+
+    def by_tag(self, tag: str) -> list:
+        return self._current().by_tag.get(tag, [])
+
+    def by_difficulty(self, difficulty: str) -> list:
+        return self._current().by_difficulty.get(difficulty, [])
+
+    def filter(self, module: str = None, difficulty: str = None, tag: str = None, tags=()) -> list:
+        """多条件筛选（tags 需全部包含）：从最小的候选集合出发，再逐项检查其余条件"""
+        snap = self._current()
+        tags = [t for t in (*tags, tag) if t]
+        if not (module or difficulty or tags):
+            return list(snap.items)
+        candidates = [snap.items]
+        if module:
+            candidates.append(snap.by_module.get(module, []))
+        if difficulty:
+            candidates.append(snap.by_difficulty.get(difficulty, []))
+        for t in tags:
+            candidates.append(snap.by_tag.get(t, []))
+        base = min(candidates, key=len)
+        return [
+            item for item in base
+            if (not module or item.get(self.module_key) == module)
+            and (not difficulty or item.get('difficulty') == difficulty)
+            and all(t in (item.get('tags') or []) for t in tags)
+        ]
+
+    def replace(self, items: list):
+        """用新的题目列表重建索引（由保存函数在写盘后调用）"""
+        with self._lock:
+            self._snapshot = _Snapshot(list(items), self.module_key)
+            self._signature = file_signature(self.filepath)
+
+    def export_state(self) -> tuple:
+        """(题目列表, 文件签名)，写入启动快照"""
+        self._current()
+        with self._lock:
+            return self._snapshot.items, self._signature
+
+    def load_state(self, items: list, signature):
+        """载入启动快照中的题库（签名与文件不一致时下次访问会重新加载）"""
+        with self._lock:
+            self._snapshot = _Snapshot(items, self.module_key)
+            self._signature = signature
+
+    def invalidate(self):
+        """丢弃缓存，下次访问时重新加载"""
+        with self._lock:
+            self._snapshot = None
+            self._signature = None
+
+    def _current(self) -> _Snapshot:
+        snap = self._snapshot
+        signature = file_signature(self.filepath)
+        if snap is not None and signature == self._signature:
+            return snap
+        with self._lock:
+            if self._snapshot is None or self._signature != signature:
+                items = []
+                if signature is not None:
+                    with timed(JSON_IO_LATENCY, op='load'), open(self.filepath, 'r', encoding='utf-8') as f:
+                        items = json.load(f)
+                self._snapshot = _Snapshot(items, self.module_key)
+                self._signature = signature
+            return self._snapshot
+
+
+class ContentRepository:
+    """练习题与测验题仓库"""
+
+    def __init__(self, data_dir):
+        data_dir = Path(data_dir)
+        self.exercises = ContentIndex(data_dir / 'exercises.json', module_key='module')
+        self.quizzes = ContentIndex(data_dir / 'quizzes.json', module_key='module_id')
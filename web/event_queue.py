@@ -0,0 +1,187 @@
+"""
+Python 教程 Web 平台 - 进度事件写回队列（write-behind）
+请求处理只把进度事件放入队列就返回；专用写线程把短时间内的一批事件合并后
+一次写入进度存储（JSON 一次读-改-写、SQLite 一个事务），再在请求路径之外
+更新学习统计、检查成就。
+
+- 合并：写线程取到第一个事件后再等待 linger 秒收集同一批事件（最多 max_batch 个），
+  按学习者分组，每个学习者一次写入；同一模块的多次状态更新只保留最后一次
+- 读己之写：读取进度前调用 flush(user_id)，只等待该学习者的事件写完（不受其他学习者积压影响），
+  该学习者没有待写事件时立即返回
+- 进程退出（atexit / gunicorn worker_exit）时 close() 把剩余事件写完
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+import traceback
+from datetime import datetime
+
+from achievement_engine import EVENT_MODULE
+
+
+class ProgressEventQueue:
+    """进度事件写回队列
+
+    write_batch(user_id, events) 持久化某个学习者的一批事件 [(事件, 参数, 发生时间), ...]；
+    on_applied(user_id, event, payload) 在事件持久化后逐个调用（统计、成就）
+    """
+
+    def __init__(self, write_batch, on_applied=None, linger: float = 0.02,
+                 max_batch: int = 500, max_pending: int = 10000):
+        self.write_batch = write_batch
+        self.on_applied = on_applied
+        self.linger = linger
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._reset()
+        self.batches = 0
+        self.events = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def _reset(self):
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._pending = 0
+        self._pending_by_user = {}      # 学习者 -> 尚未写完的事件数
+        self._idle = threading.Condition()
+        self._thread = None
+        self._pid = os.getpid()
+        self._closed = False
+
+    def put(self, user_id: str, event: str, **payload):
+        """放入一个事件（队列满时阻塞，形成背压）；队列已关闭时同步写入"""
+        if self._pid != os.getpid():
+            self._reset()
+        item = (user_id, event, payload, datetime.now())
+        with self._idle:
+            self._pending += 1
+            self._pending_by_user[user_id] = self._pending_by_user.get(user_id, 0) + 1
+        if self._closed:
+            self._process([item])
+            return
+        self._ensure_thread()
+        self._queue.put(item)
+
+    def flush(self, user_id: str = None, timeout: float = None) -> bool:
+        """等待已入队的事件写入并处理完（给出 user_id 时只等待该学习者的事件）；在写线程内调用时直接返回"""
+        if threading.current_thread() is self._thread:
+            return True
+        with self._idle:
+            if user_id is None:
+                return self._idle.wait_for(lambda: self._pending == 0, timeout)
+            return self._idle.wait_for(lambda: user_id not in self._pending_by_user, timeout)
+
+    def close(self, timeout: float = 10):
+        """写完剩余事件并停止写线程"""
+        if self._closed:
+            return
+        self.flush(timeout=timeout)
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def reset_after_fork(self):
+        """fork 之后调用：写线程不会被继承，丢弃父进程的队列状态"""
+        self._reset()
+
+    def stats(self) -> dict:
+        return {
+            'pending': self._pending,
+            'batches': self.batches,
+            'events': self.events,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+        }
+
+    # ---------- 写线程 ----------
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._idle:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='progress-writer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stop = self._collect(batch)
+            self._process(batch)
+            if stop:
+                return
+
+    def _collect(self, batch: list) -> bool:
+        """在 linger 窗口内继续收集事件，返回是否收到了停止信号"""
+        deadline = None
+        while len(batch) < self.max_batch:
+            try:
+                if deadline is None:
+                    deadline = time.monotonic() + self.linger
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return False
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    def _process(self, batch: list):
+        by_user = {}
+        for user_id, event, payload, at in batch:
+            by_user.setdefault(user_id, []).append((event, payload, at))
+        try:
+            for user_id in list(by_user):
+                # 某个学习者写入失败不影响同一批次中的其他学习者
+                user_batch = by_user[user_id]
+                events = self._coalesce(user_batch)
+                try:
+                    self.write_batch(user_id, events)
+                    if self.on_applied is not None:
+                        for event, payload, _at in user_batch:
+                            self.on_applied(user_id, event, payload)
+                except Exception:
+                    self.errors += 1
+                    traceback.print_exc(file=sys.stderr)
+                self.coalesced += len(user_batch) - len(events)
+                # 写完一个学习者就唤醒等待他的读请求，不等整批结束
+                self._settle({user_id: by_user.pop(user_id)})
+        finally:
+            self.batches += 1
+            self.events += len(batch)
+            self._settle(by_user)
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+    def _settle(self, by_user: dict):
+        """扣减各学习者的待写事件数并唤醒等待者"""
+        if not by_user:
+            return
+        with self._idle:
+            for user_id, user_batch in by_user.items():
+                left = self._pending_by_user.get(user_id, 0) - len(user_batch)
+                if left > 0:
+                    self._pending_by_user[user_id] = left
+                else:
+                    self._pending_by_user.pop(user_id, None)
+            self._idle.notify_all()
+
+    @staticmethod
+    def _coalesce(batch: list) -> list:
+        """同一模块的多次状态更新只保留最后一次（练习/测验的合并规则由存储保证，逐条保留）"""
+        last_module_event = {}
+        for i, (event, payload, _at) in enumerate(batch):
+            if event == EVENT_MODULE:
+                last_module_event[payload['module_id']] = i
+        return [
+            item for i, item in enumerate(batch)
+            if item[0] != EVENT_MODULE or last_module_event[item[1]['module_id']] == i
+        ]
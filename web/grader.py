@@ -0,0 +1,592 @@
+"""
+Python 教程 Web 平台 - 练习题评测引擎
+服务端运行学员提交的代码并判定对错，不再信任前端传来的 correct：
+- 评测进程池：启动时创建若干常驻 worker（预先导入常用标准库），提交无需每次启动解释器
+- 每次提交由 worker fork 出一次性子进程执行，子进程设置 CPU 时间 / 内存 / 文件大小 / 进程数 rlimit，
+  超过墙钟时间直接 kill；崩溃或资源耗尽不影响 worker 本身
+- 沙箱（提交的是任意代码，必须隔离）：子进程没有网络、看不到数据目录和系统配置，
+  以无特权用户运行（不能写入任何应用文件，进程数限制对非 root 用户才生效）
+  - namespaces：服务以 root 运行时，子进程进入新的网络/挂载/IPC/UTS 命名空间，
+    chroot 到只读挂载了 Python 与系统库的临时根目录，再切换到 GRADER_UID/GRADER_GID
+  - bwrap：服务以普通用户运行时，评测 worker 整体运行在 bubblewrap 沙箱中（需要安装 bwrap，
+    并允许创建用户命名空间；Docker 默认的 seccomp 配置不允许）
+  - 两者都不可用时拒绝评测（GraderUnavailableError）；none 不做隔离，只能用于本机开发
+- 提交进入有界队列，队列满时快速失败（GraderBusyError），而不是无限堆积
+- 判定方式：练习题带 checks（隐藏的断言代码）时，提交代码正常结束后再单独执行 checks，
+  checks 完整执行完才算通过（提交代码 exit() 提前退出、checks 抛出异常均不通过）；
+  否则比较提交代码与参考答案（solution / solution_alt）的标准输出
+- 记录每次提交的排队时间、运行时间和总延迟，以及当前队列深度
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import queue
+import select
+import builtins
+import signal
+import ctypes
+import shutil
+import hashlib
+import tempfile
+import threading
+import traceback
+import subprocess
+from collections import deque
+from concurrent.futures import Future
+from contextlib import redirect_stdout, redirect_stderr
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource，只能依靠墙钟超时
+    resource = None
+
+# 单次提交最多保留的输出字符数
+MAX_OUTPUT = 64 * 1024
+
+# worker 启动时预先导入的模块（fork 出的子进程直接继承）
+PREWARM_MODULES = (
+    'json', 're', 'math', 'random', 'string', 'collections', 'itertools', 'functools',
+    'datetime', 'dataclasses', 'typing', 'abc', 'enum', 'decimal', 'fractions', 'statistics',
+    'heapq', 'bisect', 'copy', 'operator', 'contextlib', 'textwrap', 'unittest',
+)
+
+
+class GraderBusyError(RuntimeError):
+    """评测队列已满"""
+
+
+class GraderUnavailableError(RuntimeError):
+    """当前环境无法建立评测沙箱"""
+
+
+# ==================== 沙箱 ====================
+
+SANDBOX_MODES = ('auto', 'namespaces', 'bwrap', 'none')
+
+# 沙箱中只读可见的系统目录（另加 Python 安装目录）；其余路径（/etc、/root、/home、应用和数据目录）都不可见
+_SYSTEM_PATHS = ('/usr', '/bin', '/lib', '/lib64')
+
+# unshare(2) / mount(2) 标志
+_CLONE_NEWNS = 0x00020000
+_CLONE_NEWUTS = 0x04000000
+_CLONE_NEWIPC = 0x08000000
+_CLONE_NEWNET = 0x40000000
+_MS_RDONLY = 0x1
+_MS_NOSUID = 0x2
+_MS_NODEV = 0x4
+_MS_REMOUNT = 0x20
+_MS_BIND = 0x1000
+_MS_REC = 0x4000
+_MS_PRIVATE = 0x40000
+
+
+def resolve_sandbox(mode: str) -> str:
+    """确定实际使用的沙箱；auto 时 root 用 namespaces，普通用户用 bwrap，都不可用时抛出 GraderUnavailableError"""
+    if mode not in SANDBOX_MODES:
+        raise GraderUnavailableError(f'未知的评测沙箱: {mode}')
+    if mode == 'none':
+        return mode
+    if not sys.platform.startswith('linux') or resource is None:
+        raise GraderUnavailableError('评测沙箱只支持 Linux')
+    is_root = os.geteuid() == 0
+    if mode == 'auto':
+        mode = 'namespaces' if is_root else 'bwrap'
+    if mode == 'namespaces' and not is_root:
+        raise GraderUnavailableError('namespaces 沙箱需要以 root 启动服务（评测代码会切换到无特权用户）')
+    if mode == 'bwrap' and shutil.which('bwrap') is None:
+        raise GraderUnavailableError('未找到 bwrap（bubblewrap），无法建立评测沙箱')
+    return mode
+
+
+def _sandbox_paths() -> list:
+    """需要在沙箱中只读可见的目录（去掉已被上级目录包含的）"""
+    paths = []
+    for path in sorted({*_SYSTEM_PATHS, sys.base_prefix, sys.prefix, sys.exec_prefix}):
+        if os.path.lexists(path) and not any(path.startswith(p.rstrip('/') + '/') for p in paths):
+            paths.append(path)
+    return paths
+
+
+def _libc_call(name: str, *args):
+    libc = ctypes.CDLL(None, use_errno=True)
+    if getattr(libc, name)(*args) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f'{name}: {os.strerror(errno)}')
+
+
+def _mount(source, target, flags: int):
+    _libc_call('mount', source and source.encode(), target.encode(), None, ctypes.c_ulong(flags), None)
+
+
+def _enter_namespaces(root: str, limits: dict):
+    """把当前（fork 出的）进程关进沙箱：新的网络/挂载/IPC/UTS 命名空间（没有任何网卡），
+    chroot 到 root（只读挂载 Python 与系统库，/tmp 可写），最后切换到无特权用户"""
+    _libc_call('unshare', _CLONE_NEWNET | _CLONE_NEWNS | _CLONE_NEWIPC | _CLONE_NEWUTS)
+    # 之后的挂载只在本进程的命名空间中可见
+    _mount(None, '/', _MS_REC | _MS_PRIVATE)
+    for path in _sandbox_paths():
+        target = root + path
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.islink(path):
+            os.symlink(os.readlink(path), target)
+            continue
+        os.makedirs(target, exist_ok=True)
+        _mount(path, target, _MS_BIND | _MS_REC)
+        _mount(None, target, _MS_BIND | _MS_REMOUNT | _MS_RDONLY | _MS_NOSUID | _MS_NODEV)
+    tmp = os.path.join(root, 'tmp')
+    os.makedirs(tmp)
+    os.chmod(tmp, 0o1777)
+    os.chroot(root)
+    os.chdir('/tmp')
+    os.setgroups([])
+    os.setgid(limits['gid'])
+    os.setuid(limits['uid'])
+    if os.getuid() == 0 or os.geteuid() == 0:
+        raise PermissionError('未能切换到无特权用户')
+
+
+def _bwrap_command(command: list, uid: int, gid: int) -> list:
+    """用 bubblewrap 包装评测 worker：独立的用户/网络/PID/IPC/UTS 命名空间，
+    只读可见 Python 与系统库，/tmp 为内存文件系统"""
+    args = ['bwrap', '--unshare-all', '--unshare-user', '--die-with-parent', '--new-session',
+            '--uid', str(uid), '--gid', str(gid)]
+    for path in _sandbox_paths():
+        if os.path.islink(path):
+            args += ['--symlink', os.readlink(path), path]
+        else:
+            args += ['--ro-bind', path, path]
+    args += ['--ro-bind', os.path.abspath(__file__), '/grader/grader.py',
+             '--tmpfs', '/tmp', '--dev', '/dev', '--proc', '/proc', '--chdir', '/tmp', '--']
+    return args + [command[0], '-I', '/grader/grader.py'] + command[3:]
+
+
+# ==================== worker 进程内执行 ====================
+
+class _LimitedStringIO(io.StringIO):
+    """超过上限后丢弃后续输出"""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.truncated = False
+
+    def write(self, s):
+        remaining = self.limit - self.tell()
+        if remaining <= 0:
+            self.truncated = True
+            return len(s)
+        if len(s) > remaining:
+            self.truncated = True
+            super().write(s[:remaining])
+            return len(s)
+        return super().write(s)
+
+
+def _execute(code: str, checks: str = None) -> dict:
+    """在当前进程中执行代码，捕获标准输出和异常
+
+    给出 checks 时，提交代码正常结束后在同一命名空间中单独执行 checks，
+    全部执行完才记 checks_passed；提交代码以 SystemExit 提前退出记为 error，checks 抛出异常记为 failed
+    """
+    # 提交的代码与评测共用 builtins，先取出 exec/compile，避免被替换后跳过 checks
+    run, build = builtins.exec, builtins.compile
+    stdout = _LimitedStringIO(MAX_OUTPUT)
+    stderr = _LimitedStringIO(MAX_OUTPUT)
+    namespace = {'__name__': '__main__', '__builtins__': builtins}
+    sys.stdin = io.StringIO('')
+    status, error, checks_passed = 'ok', None, False
+    stage = '<submission>'
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                run(build(code, stage, 'exec'), namespace)
+            except SystemExit:
+                if checks is not None:
+                    raise
+            if checks is not None:
+                stage = '<checks>'
+                run(build(checks, stage, 'exec'), namespace)
+                checks_passed = True
+    except MemoryError:
+        status, error = 'error', 'MemoryError: 内存超出限制'
+    except SystemExit:
+        status = 'error' if stage == '<submission>' else 'failed'
+        error = 'SystemExit: 代码提前退出，未完成检查'
+    except BaseException as exc:
+        status = 'error' if stage == '<submission>' else 'failed'
+        # 只保留提交代码内部的堆栈
+        frames = [f for f in traceback.extract_tb(exc.__traceback__) if f.filename == '<submission>']
+        error = ''.join(traceback.format_list(frames[-3:]) + traceback.format_exception_only(type(exc), exc))
+    return {
+        'status': status,
+        'stdout': stdout.getvalue(),
+        'stderr': stderr.getvalue(),
+        'error': error,
+        'truncated': stdout.truncated,
+        'checks_passed': checks_passed,
+        'run_ms': round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def _apply_limits(limits: dict):
+    """在子进程中设置资源限制"""
+    if resource is None:
+        return
+    cpu = limits['cpu_seconds']
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    memory = limits['memory_mb'] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (1024 * 1024, 1024 * 1024))
+    # 禁止再创建子进程（fork 炸弹）；root 不受 RLIMIT_NPROC 约束，沙箱保证此时已不是 root
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def _run_isolated(job: dict, limits: dict) -> dict:
+    """fork 一次性子进程执行代码，超过墙钟时间则 kill；沙箱建立失败时不执行代码"""
+    if not hasattr(os, 'fork'):
+        # 不支持 fork 的平台在 worker 内直接执行，超时由调度线程重启 worker
+        return _execute(job['code'], job.get('checks'))
+
+    with tempfile.TemporaryDirectory(prefix='grader-') as workdir:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(read_fd)
+                for fd in _CHANNEL_FDS:
+                    os.close(fd)
+                if limits['sandbox'] == 'namespaces':
+                    _enter_namespaces(os.path.join(workdir, 'root'), limits)
+                else:
+                    os.chdir(workdir)
+                _apply_limits(limits)
+                runner_pid = os.getpid()
+                data = json.dumps(_execute(job['code'], job.get('checks'))).encode('utf-8')
+                if os.getpid() != runner_pid:
+                    # 提交的代码自己 fork 出的进程不回写结果
+                    os._exit(0)
+            except BaseException as exc:
+                data = json.dumps({'status': 'error', 'error': f'{type(exc).__name__}: {exc}'}).encode('utf-8')
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(write_fd, view):]
+            finally:
+                os._exit(0)
+
+        os.close(write_fd)
+        chunks = []
+        timed_out = False
+        deadline = time.monotonic() + limits['timeout']
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+                    timed_out = True
+                    break
+                chunk = os.read(read_fd, 65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        finally:
+            if timed_out:
+                os.kill(pid, signal.SIGKILL)
+            os.close(read_fd)
+            _, status = os.waitpid(pid, 0)
+
+    if timed_out:
+        return {'status': 'timeout', 'error': f"运行时间超过 {limits['timeout']} 秒"}
+    if os.WIFSIGNALED(status):
+        sig = os.WTERMSIG(status)
+        if sig in (signal.SIGXCPU, signal.SIGKILL):
+            return {'status': 'timeout', 'error': f"CPU 时间超过 {limits['cpu_seconds']} 秒"}
+        return {'status': 'error', 'error': f'进程被信号 {sig} 终止'}
+    if not chunks:
+        return {'status': 'error', 'error': '进程异常退出'}
+    return json.loads(b''.join(chunks).decode('utf-8'))
+
+
+def _send_message(stream, obj):
+    """长度前缀 + JSON 的消息格式"""
+    data = json.dumps(obj).encode('utf-8')
+    stream.write(len(data).to_bytes(4, 'big') + data)
+    stream.flush()
+
+
+def _recv_message(stream):
+    header = stream.read(4)
+    if len(header) < 4:
+        raise EOFError
+    return json.loads(stream.read(int.from_bytes(header, 'big')).decode('utf-8'))
+
+
+# worker 与主进程通信用的文件描述符（fork 出的执行子进程需要关闭它们）
+_CHANNEL_FDS = ()
+
+
+def _worker_main(limits: dict):
+    """评测 worker 主循环：从标准输入逐个接收任务 {code, checks}，把执行结果写回标准输出"""
+    global _CHANNEL_FDS
+    # 通信改用复制出的描述符，0/1 指向 /dev/null，避免被执行的代码写乱消息
+    channel_in = os.fdopen(os.dup(0), 'rb')
+    channel_out = os.fdopen(os.dup(1), 'wb')
+    _CHANNEL_FDS = (channel_in.fileno(), channel_out.fileno())
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    for name in PREWARM_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    while True:
+        try:
+            job = _recv_message(channel_in)
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        _send_message(channel_out, _run_isolated(job, limits))
+
+
+# ==================== 主进程调度 ====================
+
+class _WorkerHandle:
+    """常驻评测 worker 进程（独立解释器，通过标准输入输出通信）"""
+
+    def __init__(self, limits: dict):
+        self._limits = limits
+        self._spawn()
+
+    def _spawn(self):
+        command = [sys.executable, '-I', os.path.abspath(__file__), '--worker', json.dumps(self._limits)]
+        # 不继承应用的环境变量（密钥、API Key 等）
+        options = {'env': {'PATH': os.defpath, 'LANG': 'C.UTF-8', 'PYTHONIOENCODING': 'utf-8'}}
+        if self._limits['sandbox'] == 'bwrap':
+            command = _bwrap_command(command, self._limits['uid'], self._limits['gid'])
+            if os.geteuid() == 0:
+                # 以 root 创建的用户命名空间仍对应 root，进程数限制无效，先切换到无特权用户
+                options.update(user=self._limits['uid'], group=self._limits['gid'], extra_groups=[])
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, **options)
+
+    def run(self, code: str, checks: str, timeout: float) -> dict:
+        """执行代码（及 checks）；worker 超过 timeout 秒未返回则被 kill（随后抛出 EOFError）"""
+        timer = threading.Timer(timeout, self.process.kill)
+        timer.start()
+        try:
+            _send_message(self.process.stdin, {'code': code, 'checks': checks})
+            return _recv_message(self.process.stdout)
+        finally:
+            timer.cancel()
+
+    def restart(self):
+        self.close(force=True)
+        self._spawn()
+
+    def close(self, force: bool = False):
+        try:
+            if not force:
+                _send_message(self.process.stdin, None)
+            self.process.stdin.close()
+        except OSError:
+            pass
+        if force:
+            self.process.kill()
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.process.stdout.close()
+
+
+class _Job:
+    __slots__ = ('code', 'checks', 'future', 'enqueued_at')
+
+    def __init__(self, code: str, checks: str = None):
+        self.code = code
+        self.checks = checks
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+def normalize_output(text: str) -> str:
+    """比较输出前去除行尾空白和末尾空行"""
+    return '\n'.join(line.rstrip() for line in (text or '').splitlines()).strip('\n')
+
+
+class GradingEngine:
+    """评测引擎：有界队列 + 常驻 worker 进程池
+
+    worker 在第一次提交时启动（gunicorn 下每个 web worker 各自拥有一组评测进程）；
+    sandbox 见模块说明，uid/gid 为 namespaces 沙箱中执行代码的用户
+    """
+
+    def __init__(self, workers: int = 2, queue_size: int = 16, cpu_seconds: int = 2,
+                 memory_mb: int = 256, timeout: float = 5, sandbox: str = 'auto',
+                 uid: int = 65534, gid: int = 65534):
+        self.workers = workers
+        self.sandbox = sandbox
+        self.limits = {'cpu_seconds': cpu_seconds, 'memory_mb': memory_mb, 'timeout': timeout,
+                       'sandbox': None, 'uid': uid, 'gid': gid}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._expected = {}         # 参考答案哈希 -> 规范化后的输出（答案无法运行时为 None）
+        self._latencies = deque(maxlen=1000)
+        self._busy = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """启动 worker 进程和调度线程（重复调用无副作用）；无法建立沙箱时抛出 GraderUnavailableError"""
+        with self._lock:
+            if self._threads:
+                return
+            self.limits['sandbox'] = resolve_sandbox(self.sandbox)
+            for _ in range(self.workers):
+                handle = _WorkerHandle(self.limits)
+                thread = threading.Thread(target=self._dispatch, args=(handle,), daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self):
+        """停止所有 worker（进程退出时调用）"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout=self.limits['timeout'] + 2)
+
+    def _dispatch(self, handle: _WorkerHandle):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                handle.close()
+                return
+            started = time.monotonic()
+            with self._lock:
+                self._busy += 1
+            try:
+                result = handle.run(job.code, job.checks, timeout=self.limits['timeout'] + 5)
+            except (EOFError, OSError, ValueError):
+                # worker 卡死或崩溃，重建后继续服务
+                handle.restart()
+                result = {'status': 'error', 'error': '评测进程异常，已重启'}
+            finished = time.monotonic()
+            result['queue_ms'] = round((started - job.enqueued_at) * 1000, 3)
+            result['latency_ms'] = round((finished - job.enqueued_at) * 1000, 3)
+            with self._lock:
+                self._busy -= 1
+                self.completed += 1
+                if result.get('status') == 'timeout':
+                    self.timeouts += 1
+                self._latencies.append(result['latency_ms'])
+            job.future.set_result(result)
+
+    # ---------- 执行与评测 ----------
+
+    def submit(self, code: str, checks: str = None) -> Future:
+        """提交代码（checks 在代码之后单独执行），返回 Future；
+        队列已满时抛出 GraderBusyError，无法建立沙箱时抛出 GraderUnavailableError"""
+        self.start()
+        job = _Job(code, checks)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise GraderBusyError('评测队列已满，请稍后再试')
+        with self._lock:
+            self.submitted += 1
+        return job.future
+
+    def run(self, code: str, checks: str = None) -> dict:
+        """执行代码并等待结果"""
+        return self.submit(code, checks).result()
+
+    def expected_outputs(self, exercise: dict) -> list:
+        """参考答案的规范化输出（按答案内容缓存）
+
+        答案在服务端无法运行（缺少第三方库等）或两次运行输出不同（随机数、时间等）时视为无法评测
+        """
+        outputs = []
+        for solution in (exercise.get('solution'), exercise.get('solution_alt')):
+            if not solution:
+                continue
+            key = hashlib.sha1(solution.encode('utf-8')).hexdigest()
+            if key not in self._expected:
+                runs = [self.run(solution) for _ in range(2)]
+                outputs_seen = {normalize_output(r.get('stdout')) for r in runs}
+                deterministic = all(r['status'] == 'ok' for r in runs) and len(outputs_seen) == 1
+                self._expected[key] = outputs_seen.pop() if deterministic else None
+            if self._expected[key] is not None:
+                outputs.append(self._expected[key])
+        return outputs
+
+    def grade(self, exercise: dict, code: str) -> dict:
+        """评测一次提交
+
+        verdict: passed / failed / error / timeout / ungradable（参考答案本身无法在服务端运行）
+        """
+        checks = exercise.get('checks')
+        if checks:
+            expected = None
+            result = self.run(code, checks)
+        else:
+            expected = self.expected_outputs(exercise)
+            result = self.run(code)
+
+        if result['status'] != 'ok':
+            verdict = result['status']
+        elif checks:
+            verdict = 'passed' if result.get('checks_passed') else 'failed'
+        elif not expected:
+            verdict = 'ungradable'
+        else:
+            verdict = 'passed' if normalize_output(result.get('stdout')) in expected else 'failed'
+
+        return {
+            'exercise_id': exercise.get('id'),
+            'verdict': verdict,
+            'passed': verdict == 'passed',
+            'stdout': result.get('stdout', ''),
+            'error': result.get('error'),
+            'truncated': result.get('truncated', False),
+            'run_ms': result.get('run_ms'),
+            'queue_ms': result.get('queue_ms'),
+            'latency_ms': result.get('latency_ms'),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'workers': len(self._threads),
+                'busy': self._busy,
+                'queue_depth': self._queue.qsize(),
+                'queue_size': self._queue.maxsize,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'latency_ms': {
+                    'p50': latencies[len(latencies) // 2] if latencies else 0.0,
+                    'p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+                    'max': latencies[-1] if latencies else 0.0,
+                },
+                'limits': dict(self.limits),
+            }
+
+
+if __name__ == '__main__' and sys.argv[1:2] == ['--worker']:
+    _worker_main(json.loads(sys.argv[2]))
@@ -0,0 +1,52 @@
+"""
+Python 教程 Web 平台 - gunicorn 配置
+用法（在 web 目录下）: gunicorn -c gunicorn.conf.py wsgi:app
+
+环境变量:
+    PORT              监听端口（默认 8502）
+    WEB_WORKERS       worker 进程数（默认 CPU 核数 * 2 + 1）
+    WEB_THREADS       每个 worker 的线程数（默认 4）
+    WEB_WORKER_CLASS  worker 类型（默认 gthread；AI 流式对话较多时可用 gevent）
+    WEB_TIMEOUT       请求超时（秒，默认 120，需大于 AI 请求超时）
+"""
+
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8502)}"
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# 主进程加载应用并预热缓存，worker 通过 fork 共享
+preload_app = True
+
+# 定期重启 worker，避免长期运行的内存增长
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+# 多个 worker 共享 JSON 状态文件时，状态存储改为文件锁 + 立即写盘；
+# 必须在 preload 导入应用之前设置
+if workers > 1:
+    os.environ.setdefault('STATE_MULTIPROCESS', '1')
+
+
+def post_fork(server, worker):
+    """worker fork 之后重建定时器线程和数据库连接"""
+    from app import reset_after_fork
+    reset_after_fork()
+
+
+def worker_exit(server, worker):
+    """worker 退出前写完队列中的进度事件，并把未落盘的状态写入磁盘"""
+    from app import progress_events
+    from state_store import state_store
+    if progress_events is not None:
+        progress_events.close()
+    state_store.flush()
@@ -0,0 +1,209 @@
+"""
+Python 教程 Web 平台 - HTTP 缓存与压缩
+- 静态资源：url_for('static', ...) 自动附加内容哈希 ?v=<hash>，
+  带正确哈希的请求返回 Cache-Control: public, max-age=一年, immutable
+- 内容 API：@conditional(version) 根据内容版本生成强 ETag，
+  If-None-Match 命中时直接返回 304，不再序列化响应体
+- 压缩：超过阈值的文本/JSON 响应按 Accept-Encoding 使用 brotli（已安装时）或 gzip
+- 带强 ETag 的响应（内容很少变化）的压缩结果按 (内容摘要, 编码) 缓存，重复请求不再重新压缩；
+  压缩后的表示使用带编码后缀的 ETag，条件请求同样可以得到 304
+"""
+
+import gzip
+import hashlib
+import threading
+from functools import wraps
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+# 可压缩的 MIME 类型
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/x-ndjson',
+    'application/xml', 'image/svg+xml',
+}
+
+# 静态资源长期缓存时长（秒）
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _is_compressible(mimetype: str) -> bool:
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+class StaticFingerprints:
+    """静态文件内容哈希（按 mtime/大小缓存，文件修改后自动重新计算）"""
+
+    def __init__(self, static_dir):
+        self.static_dir = Path(static_dir)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename: str):
+        """文件内容哈希前 12 位，文件不存在或不在静态目录内时返回 None"""
+        path = (self.static_dir / filename).resolve()
+        if self.static_dir.resolve() not in path.parents:
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        cached = self._cache.get(filename)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()[:12]
+        with self._lock:
+            self._cache[filename] = (signature, digest)
+        return digest
+
+
+class CompressedBodyCache:
+    """压缩结果的 LRU 缓存（按总字节数限制）"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._items[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._items), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=min(level, 11))
+    return gzip.compress(body, compresslevel=min(level, 9), mtime=0)
+
+
+def choose_encoding(accept_encodings) -> str:
+    """按客户端 Accept-Encoding 选择编码：优先 brotli，其次 gzip，都不支持返回 None"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def conditional(version_func):
+    """内容 API 装饰器：ETag 由 version_func() 返回的内容版本和请求 URL 决定
+
+    客户端 ETag 匹配时直接返回 304，视图函数不会执行
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import request, current_app, make_response
+            etag = hashlib.sha1(f'{version_func()}:{request.full_path}'.encode()).hexdigest()
+            # 压缩后的表示带编码后缀（强 ETag 按字节区分），比较时忽略后缀
+            candidates = [etag] + [f'{etag}-{enc}' for enc in ('gzip', 'br')]
+            matched = next((tag for tag in candidates if request.if_none_match.contains(tag)), None)
+            if matched is not None:
+                response = current_app.response_class(status=304)
+                response.set_etag(matched)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def init_app(app, min_size: int = 1024, level: int = 6, cache_bytes: int = 8 * 1024 * 1024,
+             compress_enabled: bool = True) -> CompressedBodyCache:
+    """注册静态资源指纹和响应压缩，返回压缩缓存（用于统计）"""
+    from flask import request
+
+    fingerprints = StaticFingerprints(app.static_folder)
+    body_cache = CompressedBodyCache(cache_bytes)
+
+    @app.url_defaults
+    def _static_fingerprint(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            digest = fingerprints.get(values['filename'])
+            if digest:
+                values['v'] = digest
+
+    @app.after_request
+    def _cache_and_compress(response):
+        if request.endpoint == 'static' and response.status_code in (200, 304):
+            digest = request.args.get('v')
+            if digest and digest == fingerprints.get(request.view_args.get('filename', '')):
+                response.cache_control.public = True
+                response.cache_control.max_age = IMMUTABLE_MAX_AGE
+                response.cache_control.immutable = True
+                response.cache_control.no_cache = None
+        if compress_enabled:
+            _compress(response)
+        return response
+
+    def _compress(response):
+        # send_file 的响应（静态文件）是 direct_passthrough，可以读出完整内容；真正的流式响应不压缩
+        if (response.status_code != 200 or (response.is_streamed and not response.direct_passthrough)
+                or 'Content-Encoding' in response.headers
+                or not _is_compressible(response.mimetype)):
+            return
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return
+        etag, weak = response.get_etag()
+        if etag and request.if_none_match.contains(f'{etag}-{encoding}'):
+            # 客户端持有同一内容的压缩表示
+            response.status_code = 304
+            response.set_data(b'')
+            response.headers.pop('Content-Length', None)
+            response.set_etag(f'{etag}-{encoding}', weak=weak)
+            return
+        response.direct_passthrough = False
+        body = response.get_data()
+        if len(body) < min_size:
+            return
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding) if etag and not weak else None
+        compressed = body_cache.get(key) if key else None
+        if compressed is None:
+            compressed = compress(body, encoding, level)
+            if key:
+                body_cache.put(key, compressed)
+        if len(compressed) >= len(body):
+            return
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak=weak)
+
+    return body_cache
@@ -0,0 +1,279 @@
+"""
+Python 教程 Web 平台 - 学习统计
+统计数据在进度事件发生时增量更新（物化），统计页面和 /api/stats 直接读取聚合结果：
+- 模块：各状态数量、按分类的完成情况
+- 练习：尝试数、答对数、正确率（总计和按模块）
+- 测验：完成数、平均分、满分数、最高分分布（总计和按模块）
+- 每日活动：每天有进度更新的模块/练习/测验数（每一项按最近一次更新的日期计）
+每个学习者的统计只在首次使用时从已有进度构建一次，之后每个事件 O(1) 更新
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+from achievement_engine import EVENT_MODULE, EVENT_EXERCISE, EVENT_QUIZ
+
+# 测验分数分段（下限, 名称）
+SCORE_BUCKETS = ((100, '100'), (80, '80-99'), (60, '60-79'), (0, '0-59'))
+
+# 返回的每日活动天数
+ACTIVITY_DAYS = 30
+
+
+def score_bucket(score: int) -> str:
+    for lower, name in SCORE_BUCKETS:
+        if score >= lower:
+            return name
+    return SCORE_BUCKETS[-1][1]
+
+
+def _day(value) -> str:
+    """ISO 时间字符串 / date -> 'YYYY-MM-DD'"""
+    if value is None:
+        return date.today().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)[:10]
+
+
+def _rate(part: int, whole: int) -> float:
+    return round(part / whole * 100, 1) if whole else 0.0
+
+
+class LearnerStats:
+    """单个学习者的物化统计"""
+
+    def __init__(self, module_categories: dict, category_totals: dict):
+        self._module_categories = module_categories
+        self._category_totals = category_totals
+        self.built_at = time.monotonic()
+        self.module_status = {}
+        self.status_counts = {'completed': 0, 'in_progress': 0}
+        self.category_counts = {cat: {'completed': 0, 'in_progress': 0} for cat in category_totals}
+        self.exercise_correct = {}      # 练习 ID -> 是否答对
+        self.exercises = {'attempted': 0, 'correct': 0}
+        self.exercises_by_module = {}
+        self.quiz_scores = {}           # 测验 ID -> 最高分
+        self.quizzes = {'completed': 0, 'score_sum': 0, 'perfect': 0}
+        self.quizzes_by_module = {}
+        self.score_distribution = {name: 0 for _, name in reversed(SCORE_BUCKETS)}
+        self.daily = {}                 # 'YYYY-MM-DD' -> {'modules': n, 'exercises': n, 'quizzes': n}
+        self._item_days = {}            # (类型, ID) -> 最近一次更新的日期
+        self.learning_days = set()
+
+    @classmethod
+    def from_progress(cls, progress: dict, module_categories: dict, category_totals: dict,
+                      module_of) -> 'LearnerStats':
+        """从已有进度构建（每个学习者只在首次使用时执行一次）
+
+        module_of(kind, item_id) 返回练习/测验所属模块
+        """
+        stats = cls(module_categories, category_totals)
+        events = []
+        for module_id, info in progress.get('modules', {}).items():
+            events.append((_day(info.get('updated_at')), EVENT_MODULE, module_id, info.get('status')))
+        for record in progress.get('exercises', []):
+            events.append((_day(record.get('completed_at')), EVENT_EXERCISE, record.get('id'), record.get('correct')))
+        for record in progress.get('quizzes', []):
+            events.append((_day(record.get('completed_at')), EVENT_QUIZ, record.get('id'), record.get('score', 0)))
+        # 按日期顺序重放，每日活动保持时间顺序
+        for day, event, item_id, value in sorted(events, key=lambda e: e[0]):
+            if event == EVENT_MODULE:
+                stats.on_module(item_id, value, day)
+            elif event == EVENT_EXERCISE:
+                stats.on_exercise(item_id, bool(value), module_of(EVENT_EXERCISE, item_id), day)
+            else:
+                stats.on_quiz(item_id, value, module_of(EVENT_QUIZ, item_id), day)
+        stats.learning_days.update(_day(d) for d in progress.get('learning_days', []))
+        return stats
+
+    # ---------- 事件 ----------
+
+    def on_module(self, module_id: str, status: str, day=None):
+        old = self.module_status.get(module_id)
+        if old == status:
+            return
+        category = self._module_categories.get(module_id)
+        for value, delta in ((old, -1), (status, 1)):
+            if value in self.status_counts:
+                self.status_counts[value] += delta
+                if category in self.category_counts:
+                    self.category_counts[category][value] += delta
+        self.module_status[module_id] = status
+        day = _day(day)
+        self.learning_days.add(day)
+        self._activity('modules', module_id, day)
+
+    def on_exercise(self, exercise_id: str, correct: bool, module_id: str = None, day=None):
+        exercise_id = str(exercise_id)
+        by_module = self.exercises_by_module.setdefault(module_id or '', {'attempted': 0, 'correct': 0})
+        previous = self.exercise_correct.get(exercise_id)
+        if previous is None:
+            self.exercises['attempted'] += 1
+            by_module['attempted'] += 1
+        elif previous or not correct:
+            # 已答对，或仍然答错：状态不变
+            return
+        if correct:
+            self.exercises['correct'] += 1
+            by_module['correct'] += 1
+        self.exercise_correct[exercise_id] = bool(correct)
+        self._activity('exercises', exercise_id, _day(day))
+
+    def on_quiz(self, quiz_id: str, score: int, module_id: str = None, day=None):
+        quiz_id = str(quiz_id)
+        score = score or 0
+        by_module = self.quizzes_by_module.setdefault(module_id or '', {'completed': 0, 'score_sum': 0})
+        previous = self.quiz_scores.get(quiz_id)
+        if previous is None:
+            self.quizzes['completed'] += 1
+            by_module['completed'] += 1
+            previous_score = 0
+        elif score <= previous:
+            # 只保留最高分
+            return
+        else:
+            previous_score = previous
+            self.score_distribution[score_bucket(previous)] -= 1
+            if previous == 100:
+                self.quizzes['perfect'] -= 1
+        self.quizzes['score_sum'] += score - previous_score
+        by_module['score_sum'] += score - previous_score
+        self.score_distribution[score_bucket(score)] += 1
+        if score == 100:
+            self.quizzes['perfect'] += 1
+        self.quiz_scores[quiz_id] = score
+        self._activity('quizzes', quiz_id, _day(day))
+
+    def _activity(self, kind: str, item_id: str, day: str):
+        """把该项的活动日期移到 day"""
+        key = (kind, item_id)
+        previous = self._item_days.get(key)
+        if previous == day:
+            return
+        if previous is not None:
+            self.daily[previous][kind] -= 1
+        counts = self.daily.get(day)
+        if counts is None:
+            counts = self.daily[day] = {'modules': 0, 'exercises': 0, 'quizzes': 0}
+        counts[kind] += 1
+        self._item_days[key] = day
+
+    # ---------- 读取 ----------
+
+    def snapshot(self, days: int = ACTIVITY_DAYS) -> dict:
+        """聚合结果（开销与历史记录长度无关）"""
+        total_modules = sum(self._category_totals.values())
+        completed = self.status_counts['completed']
+        attempted = self.exercises['attempted']
+        quizzes_done = self.quizzes['completed']
+        recent = []
+        for day in reversed(self.daily):
+            if len(recent) >= days:
+                break
+            recent.append({'date': day, **self.daily[day]})
+        recent.sort(key=lambda d: d['date'])
+        return {
+            'modules': {
+                'total': total_modules,
+                'completed': completed,
+                'in_progress': self.status_counts['in_progress'],
+                'not_started': total_modules - completed - self.status_counts['in_progress'],
+                'completion_rate': _rate(completed, total_modules),
+                'status': dict(self.module_status),
+            },
+            'categories': {
+                cat: {'total': self._category_totals[cat], **counts,
+                      'completion_rate': _rate(counts['completed'], self._category_totals[cat])}
+                for cat, counts in self.category_counts.items()
+            },
+            'exercises': {
+                'attempted': attempted,
+                'correct': self.exercises['correct'],
+                'correct_rate': _rate(self.exercises['correct'], attempted),
+                'by_module': {
+                    mid: {**counts, 'correct_rate': _rate(counts['correct'], counts['attempted'])}
+                    for mid, counts in self.exercises_by_module.items() if mid
+                },
+            },
+            'quizzes': {
+                'completed': quizzes_done,
+                'perfect': self.quizzes['perfect'],
+                'average_score': round(self.quizzes['score_sum'] / quizzes_done, 1) if quizzes_done else 0.0,
+                'distribution': dict(self.score_distribution),
+                'by_module': {
+                    mid: {'completed': counts['completed'],
+                          'average_score': round(counts['score_sum'] / counts['completed'], 1)
+                          if counts['completed'] else 0.0}
+                    for mid, counts in self.quizzes_by_module.items() if mid
+                },
+            },
+            'activity': {
+                'learning_days': len(self.learning_days),
+                'daily': recent,
+            },
+        }
+
+
+class StatsAggregator:
+    """按学习者维护物化统计"""
+
+    def __init__(self, modules: list, module_of, max_age: float = None, max_users: int = 1024):
+        self._module_categories = {m['id']: m['category'] for m in modules}
+        self._category_totals = {}
+        for m in modules:
+            self._category_totals[m['category']] = self._category_totals.get(m['category'], 0) + 1
+        self._module_of = module_of
+        self.max_age = max_age
+        self.max_users = max_users
+        self._stats = OrderedDict()     # 最近活跃的学习者在末尾，超过 max_users 时淘汰最久未活跃的
+        self._lock = threading.Lock()
+
+    def handle(self, user_id: str, event: str, payload: dict):
+        """处理一个进度事件（统计尚未建立时不做任何事，下次读取时从进度构建）"""
+        with self._lock:
+            stats = self._fresh(user_id)
+            if stats is None:
+                return
+            day = datetime.now().date()
+            if event == EVENT_MODULE:
+                stats.on_module(payload['module_id'], payload.get('status'), day)
+            elif event == EVENT_EXERCISE:
+                exercise_id = payload['exercise_id']
+                stats.on_exercise(exercise_id, payload.get('correct', False),
+                                  self._module_of(EVENT_EXERCISE, exercise_id), day)
+            elif event == EVENT_QUIZ:
+                quiz_id = payload['quiz_id']
+                stats.on_quiz(quiz_id, payload.get('score', 0), self._module_of(EVENT_QUIZ, quiz_id), day)
+
+    def get(self, user_id: str, load_progress, days: int = ACTIVITY_DAYS) -> dict:
+        """读取聚合统计"""
+        with self._lock:
+            stats = self._fresh(user_id)
+            if stats is None:
+                stats = self._stats[user_id] = LearnerStats.from_progress(
+                    load_progress(), self._module_categories, self._category_totals, self._module_of
+                )
+                while len(self._stats) > self.max_users:
+                    self._stats.popitem(last=False)
+            return stats.snapshot(days)
+
+    def reset(self, user_id: str = None):
+        """丢弃统计（进度被整体覆盖时调用）"""
+        with self._lock:
+            if user_id is None:
+                self._stats.clear()
+            else:
+                self._stats.pop(user_id, None)
+
+    def _fresh(self, user_id: str):
+        stats = self._stats.get(user_id)
+        if stats is None:
+            return None
+        if self.max_age is not None and time.monotonic() - stats.built_at > self.max_age:
+            del self._stats[user_id]
+            return None
+        self._stats.move_to_end(user_id)
+        return stats
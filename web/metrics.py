@@ -0,0 +1,280 @@
+"""
+Python 教程 Web 平台 - 运行指标
+- 每个路由的请求延迟直方图、请求计数（按状态码）
+- JSON 文件读写耗时、写入磁盘的字节数、模板渲染耗时
+- /api/metrics 以 Prometheus 文本格式输出（gunicorn 多 worker 时每个进程各自统计）
+- 可选的采样分析器：请求耗时超过阈值时，把该请求期间采样到的调用栈
+  以 folded 格式（flamegraph.pl / speedscope 可直接读取）写入文件
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+from collections import Counter
+
+# 延迟直方图的桶上界（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class CounterMetric:
+    """单调递增计数器（按标签区分）"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name + '_total', dict(zip(self.label_names, key)), value
+
+
+class Histogram:
+    """累积直方图（按标签区分）"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}   # 标签 -> [各桶计数..., 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.label_names)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for upper, count in zip(self.buckets, state):
+                cumulative += count
+                yield self.name + '_bucket', {**labels, 'le': _format_value(float(upper))}, cumulative
+            yield self.name + '_bucket', {**labels, 'le': '+Inf'}, state[-1]
+            yield self.name + '_sum', labels, state[-2]
+            yield self.name + '_count', labels, state[-1]
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, documentation: str, label_names=()) -> CounterMetric:
+        metric = CounterMetric(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, label_names=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """注册采集函数：调用时返回 [(名称, 类型, 说明, [(标签, 值), ...]), ...]"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# ==================== 采样分析器 ====================
+
+class SlowRequestProfiler:
+    """对进行中的请求定时采样调用栈，耗时超过阈值的请求写出 folded 格式的栈文件"""
+
+    def __init__(self, output_dir, threshold_ms: float, interval_ms: float = 5, max_files: int = 200):
+        self.output_dir = Path(output_dir)
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.max_files = max_files
+        self._active = {}       # 线程 ID -> Counter(折叠栈 -> 采样次数)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dumps = 0
+
+    def begin(self):
+        """当前线程开始处理请求"""
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._sample_loop, name='request-profiler', daemon=True)
+                self._thread.start()
+
+    def end(self, duration: float, route: str):
+        """当前线程请求结束；超过阈值时写出采样结果，返回文件路径"""
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+        if not stacks or duration < self.threshold or self.dumps >= self.max_files:
+            return None
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        safe_route = ''.join(c if c.isalnum() else '_' for c in route).strip('_') or 'root'
+        path = self.output_dir / f"{datetime.now():%Y%m%d-%H%M%S-%f}-{safe_route}-{int(duration * 1000)}ms.folded"
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        self.dumps += 1
+        return path
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for ident, stacks in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stacks[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f'{Path(code.co_filename).name}:{code.co_name}')
+            frame = frame.f_back
+        return ';'.join(reversed(parts))
+
+
+# ==================== 应用指标 ====================
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    'tutorial_http_request_duration_seconds', '请求处理耗时（秒）', ('method', 'route'))
+REQUESTS = registry.counter(
+    'tutorial_http_requests', '请求数', ('method', 'route', 'status'))
+JSON_IO_LATENCY = registry.histogram(
+    'tutorial_json_io_duration_seconds', 'JSON 文件读写耗时（秒）', ('op',))
+DISK_BYTES_WRITTEN = registry.counter(
+    'tutorial_disk_written_bytes', '写入磁盘的字节数', ('file',))
+TEMPLATE_LATENCY = registry.histogram(
+    'tutorial_template_render_duration_seconds', '模板渲染耗时（秒）', ('template',))
+SLOW_REQUEST_PROFILES = registry.counter(
+    'tutorial_slow_request_profiles', '写出的慢请求采样文件数', ('route',))
+
+
+class timed:
+    """计时上下文管理器：with timed(JSON_IO_LATENCY, op='load'): ..."""
+
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram: Histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+def record_disk_write(filepath, nbytes: int):
+    DISK_BYTES_WRITTEN.inc(nbytes, file=Path(filepath).name)
+
+
+def init_app(app, profiler: SlowRequestProfiler = None):
+    """注册请求计时钩子和模板渲染信号"""
+    from flask import g, request, before_render_template, template_rendered
+
+    @app.before_request
+    def _metrics_begin():
+        g._metrics_start = time.perf_counter()
+        if profiler is not None:
+            profiler.begin()
+
+    @app.after_request
+    def _metrics_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _metrics_end(exc):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        status = g.pop('_metrics_status', 500 if exc is not None else 200)
+        REQUEST_LATENCY.observe(duration, method=request.method, route=route)
+        REQUESTS.inc(method=request.method, route=route, status=status)
+        if profiler is not None and profiler.end(duration, route) is not None:
+            SLOW_REQUEST_PROFILES.inc(route=route)
+
+    render_starts = threading.local()
+
+    def _template_begin(sender, template, context, **extra):
+        render_starts.start = time.perf_counter()
+
+    def _template_end(sender, template, context, **extra):
+        start = getattr(render_starts, 'start', None)
+        if start is not None:
+            TEMPLATE_LATENCY.observe(time.perf_counter() - start, template=template.name or 'string')
+            render_starts.start = None
+
+    before_render_template.connect(_template_begin, app, weak=False)
+    template_rendered.connect(_template_end, app, weak=False)
@@ -0,0 +1,103 @@
+"""
+Python 教程 Web 平台 - 列表 API 的游标分页与字段投影
+- 游标分页：游标记录上一页最后一项的 ID 和位置（base64url 编码，对客户端不透明），
+  下一页从该项之后开始；翻页期间插入或删除其他题目不会导致重复或遗漏
+- 字段投影：fields=id,title,difficulty 只返回需要的字段（id 始终返回），
+  列表页不必传输 solution / starter_code 等大字段
+响应仍是 JSON 数组，分页信息放在响应头中（与已有的 X-Total-Count 一致）：
+X-Next-Cursor 和 Link: <...>; rel="next"，最后一页没有这两个头
+"""
+
+import json
+import base64
+import binascii
+from bisect import bisect_right
+from urllib.parse import urlencode
+
+# 指定 cursor 但未指定 limit 时的每页数量、每页数量上限
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class CursorError(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(item_id, position: int) -> str:
+    raw = json.dumps({'id': str(item_id), 'p': position}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """-> (ID, 位置)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return str(data['id']), int(data['p'])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise CursorError('无效的 cursor')
+
+
+def parse_list(value: str) -> list:
+    """'a, b,,c' -> ['a', 'b', 'c']"""
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+def paginate(items: list, cursor: str, limit: int, position_of) -> tuple:
+    """按游标取一页，返回 (本页题目, 下一页游标或 None)
+
+    items 需按 position_of(item) 升序排列；position_of 返回题目在完整列表中的位置，
+    游标中的题目已被删除时退回使用游标记录的位置
+    """
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    start = 0
+    if cursor:
+        item_id, position = decode_cursor(cursor)
+        current = position_of(item_id)
+        after = current if current is not None else position - 0.5
+        start = bisect_right(items, after, key=lambda item: position_of(str(item.get('id'))))
+    page = items[start:start + limit]
+    if start + limit >= len(items) or not page:
+        return page, None
+    last_id = str(page[-1].get('id'))
+    return page, encode_cursor(last_id, position_of(last_id))
+
+
+def project(items: list, fields: list, hidden=()) -> list:
+    """只保留指定字段（id 始终保留），hidden 中的字段始终去掉；两者都为空时原样返回"""
+    if not fields:
+        if not hidden:
+            return items
+        return [{k: v for k, v in item.items() if k not in hidden} if any(h in item for h in hidden) else item
+                for item in items]
+    keys = ['id'] + [f for f in fields if f != 'id' and f not in hidden]
+    return [{k: item[k] for k in keys if k in item} for item in items]
+
+
+def list_response(items: list, args, position_of, hidden=()):
+    """按请求参数（cursor/limit、offset/limit、fields）生成列表响应，hidden 为不返回的字段
+
+    cursor 参数存在（首页可为空字符串）时使用游标分页；
+    否则保留原有的 offset/limit 行为，两者都未指定时返回全部
+    """
+    from flask import jsonify, request
+
+    total = len(items)
+    next_cursor = None
+    limit = args.get('limit', type=int)
+    if 'cursor' in args:
+        items, next_cursor = paginate(items, args.get('cursor'), limit, position_of)
+    else:
+        offset = args.get('offset', 0, type=int)
+        if offset or limit is not None:
+            items = items[offset:offset + limit if limit is not None else None]
+
+    response = jsonify(project(items, parse_list(args.get('fields')), hidden))
+    response.headers['X-Total-Count'] = str(total)
+    if next_cursor:
+        query = args.copy()
+        query['cursor'] = next_cursor
+        next_url = request.base_url + '?' + urlencode(list(query.items(multi=True)))
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
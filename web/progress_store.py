@@ -0,0 +1,399 @@
+"""
+Python 教程 Web 平台 - 学习进度存储后端
+提供可插拔的进度存储：
+- JSONProgressBackend: 兼容原有的 progress.json，其他学习者各自一个分片文件（经由 state_store 缓存）
+- SQLiteProgressBackend: WAL 模式的 SQLite，按 (用户, 条目) 建主键索引，
+  单条记录 upsert，多个 gunicorn worker 并发写入互不覆盖
+
+一次性迁移：
+    python web/progress_store.py migrate [progress.json] [progress.db]
+"""
+
+import sys
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from collections import OrderedDict
+from datetime import datetime
+
+from state_store import state_store
+from achievement_engine import EVENT_MODULE, EVENT_EXERCISE, EVENT_QUIZ
+
+DEFAULT_USER = 'default'
+
+
+def empty_progress() -> dict:
+    """空的进度数据结构"""
+    return {
+        'modules': {},
+        'exercises': [],
+        'quizzes': [],
+        'learning_days': [],
+        'last_visit': None,
+        'total_time': 0
+    }
+
+
+class ProgressBackend(ABC):
+    """进度存储后端接口"""
+
+    @abstractmethod
+    def get_progress(self, user_id: str = DEFAULT_USER) -> dict:
+        """获取完整进度（与 progress.json 结构一致）"""
+        pass
+
+    @abstractmethod
+    def save_progress(self, data: dict, user_id: str = DEFAULT_USER):
+        """整体覆盖保存进度"""
+        pass
+
+    @abstractmethod
+    def set_module_status(self, module_id: str, status: str, user_id: str = DEFAULT_USER, at: datetime = None):
+        """更新模块状态，并记录当天为学习日（at 为事件发生时间，默认当前时间）"""
+        pass
+
+    @abstractmethod
+    def mark_exercise(self, exercise_id: str, correct: bool, user_id: str = DEFAULT_USER, at: datetime = None):
+        """记录练习完成（重复提交时只会由错改对）"""
+        pass
+
+    @abstractmethod
+    def mark_quiz(self, quiz_id: str, score: int, user_id: str = DEFAULT_USER, at: datetime = None):
+        """记录测验成绩（重复提交时保留最高分）"""
+        pass
+
+    def apply_events(self, events, user_id: str = DEFAULT_USER):
+        """批量写入进度事件 [(事件, 参数, 发生时间), ...]（默认逐条写入，子类合并为一次写入）"""
+        for event, payload, at in events:
+            if event == EVENT_MODULE:
+                self.set_module_status(payload['module_id'], payload['status'], user_id, at)
+            elif event == EVENT_EXERCISE:
+                self.mark_exercise(payload['exercise_id'], payload.get('correct', False), user_id, at)
+            elif event == EVENT_QUIZ:
+                self.mark_quiz(payload['quiz_id'], payload.get('score', 0), user_id, at)
+
+    def reset_after_fork(self):
+        """fork 之后调用，丢弃从父进程继承的连接等资源"""
+
+
+class JSONProgressBackend(ProgressBackend):
+    """基于 JSON 文件的存储后端
+
+    默认学习者使用 progress.json；传入 path_for(user_id) 时其他学习者各自一个分片文件，
+    不同学习者的写入由状态存储的分条锁隔离，可以并行
+    """
+
+    # 缓存 ID 索引的学习者数量上限
+    MAX_INDEXED_USERS = 256
+
+    def __init__(self, filepath, path_for=None):
+        self.filepath = Path(filepath)
+        self.path_for = path_for
+        # 学习者 -> (进度对象, 练习 ID -> 记录, 测验 ID -> 记录)，避免每次线性扫描列表
+        self._index_cache = OrderedDict()
+        self._index_lock = threading.Lock()
+
+    def _path(self, user_id: str) -> Path:
+        if user_id == DEFAULT_USER or self.path_for is None:
+            return self.filepath
+        return self.path_for(user_id)
+
+    def get_progress(self, user_id: str = DEFAULT_USER) -> dict:
+        data = state_store.get(self._path(user_id))
+        if data is None:
+            return empty_progress()
+        return data
+
+    def save_progress(self, data: dict, user_id: str = DEFAULT_USER):
+        state_store.set(self._path(user_id), data)
+
+    def set_module_status(self, module_id: str, status: str, user_id: str = DEFAULT_USER, at: datetime = None):
+        self._update(user_id, self._module_mutator(module_id, status, at))
+
+    def mark_exercise(self, exercise_id: str, correct: bool, user_id: str = DEFAULT_USER, at: datetime = None):
+        self._update(user_id, self._exercise_mutator(user_id, exercise_id, correct, at))
+
+    def mark_quiz(self, quiz_id: str, score: int, user_id: str = DEFAULT_USER, at: datetime = None):
+        self._update(user_id, self._quiz_mutator(user_id, quiz_id, score, at))
+
+    def apply_events(self, events, user_id: str = DEFAULT_USER):
+        """整批事件在一次读-改-写中完成，只落盘一次"""
+        mutators = []
+        for event, payload, at in events:
+            if event == EVENT_MODULE:
+                mutators.append(self._module_mutator(payload['module_id'], payload['status'], at))
+            elif event == EVENT_EXERCISE:
+                mutators.append(self._exercise_mutator(user_id, payload['exercise_id'], payload.get('correct', False), at))
+            elif event == EVENT_QUIZ:
+                mutators.append(self._quiz_mutator(user_id, payload['quiz_id'], payload.get('score', 0), at))
+
+        def apply(progress):
+            for mutate in mutators:
+                mutate(progress)
+        self._update(user_id, apply)
+
+    @staticmethod
+    def _module_mutator(module_id: str, status: str, at: datetime = None):
+        def apply(progress):
+            now = at or datetime.now()
+            progress['modules'][module_id] = {
+                'status': status,
+                'updated_at': now.isoformat()
+            }
+            today = now.date().isoformat()
+            if today not in progress.get('learning_days', []):
+                progress.setdefault('learning_days', []).append(today)
+            progress['last_visit'] = now.isoformat()
+        return apply
+
+    def _exercise_mutator(self, user_id: str, exercise_id: str, correct: bool, at: datetime = None):
+        def apply(progress):
+            now = (at or datetime.now()).isoformat()
+            index = self._indexes(user_id, progress)[0]
+            record = index.get(str(exercise_id))
+            if record is None:
+                record = {
+                    'id': exercise_id,
+                    'completed_at': now,
+                    'correct': correct
+                }
+                progress['exercises'].append(record)
+                index[str(exercise_id)] = record
+            elif correct:
+                record['correct'] = True
+                record['completed_at'] = now
+        return apply
+
+    def _quiz_mutator(self, user_id: str, quiz_id: str, score: int, at: datetime = None):
+        def apply(progress):
+            now = (at or datetime.now()).isoformat()
+            index = self._indexes(user_id, progress)[1]
+            record = index.get(str(quiz_id))
+            if record is None:
+                record = {
+                    'id': quiz_id,
+                    'score': score,
+                    'completed_at': now
+                }
+                progress['quizzes'].append(record)
+                index[str(quiz_id)] = record
+            elif score > record.get('score', 0):
+                record['score'] = score
+                record['completed_at'] = now
+        return apply
+
+    def _update(self, user_id: str, apply):
+        state_store.update(self._path(user_id), apply, default_factory=empty_progress)
+
+    def _indexes(self, user_id: str, progress: dict):
+        """ID 索引（在该学习者文件的锁内调用），进度对象被替换（如文件被外部修改）时重建"""
+        with self._index_lock:
+            cached = self._index_cache.get(user_id)
+            if cached is not None and cached[0] is progress:
+                self._index_cache.move_to_end(user_id)
+                return cached[1], cached[2]
+        exercise_index = {str(e.get('id')): e for e in progress.setdefault('exercises', [])}
+        quiz_index = {str(q.get('id')): q for q in progress.setdefault('quizzes', [])}
+        with self._index_lock:
+            self._index_cache[user_id] = (progress, exercise_index, quiz_index)
+            self._index_cache.move_to_end(user_id)
+            while len(self._index_cache) > self.MAX_INDEXED_USERS:
+                self._index_cache.popitem(last=False)
+        return exercise_index, quiz_index
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id     TEXT PRIMARY KEY,
+    last_visit  TEXT,
+    total_time  INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS module_progress (
+    user_id     TEXT NOT NULL,
+    module_id   TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    updated_at  TEXT,
+    PRIMARY KEY (user_id, module_id)
+);
+CREATE TABLE IF NOT EXISTS exercise_progress (
+    user_id      TEXT NOT NULL,
+    exercise_id  TEXT NOT NULL,
+    correct      INTEGER NOT NULL DEFAULT 0,
+    completed_at TEXT,
+    PRIMARY KEY (user_id, exercise_id)
+);
+CREATE TABLE IF NOT EXISTS quiz_progress (
+    user_id      TEXT NOT NULL,
+    quiz_id      TEXT NOT NULL,
+    score        INTEGER NOT NULL DEFAULT 0,
+    completed_at TEXT,
+    PRIMARY KEY (user_id, quiz_id)
+);
+CREATE TABLE IF NOT EXISTS learning_days (
+    user_id  TEXT NOT NULL,
+    day      TEXT NOT NULL,
+    PRIMARY KEY (user_id, day)
+);
+"""
+
+
+class SQLiteProgressBackend(ProgressBackend):
+    """基于 SQLite 的存储后端（多用户，每个线程一个连接）"""
+
+    def __init__(self, db_path, migrate_from=None):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        is_new = not self.db_path.exists()
+        conn = self._conn()
+        with conn:
+            conn.executescript(SQLITE_SCHEMA)
+        # 新建数据库时自动导入旧的 progress.json
+        if is_new and migrate_from is not None and Path(migrate_from).exists():
+            migrate_json_to_sqlite(migrate_from, self)
+        # 不在初始化线程上保留连接，避免预加载（preload）后连接被 fork 到子进程
+        conn.close()
+        self._local = threading.local()
+
+    def reset_after_fork(self):
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=10000')
+            self._local.conn = conn
+        return conn
+
+    # 一条语句读出学习者的全部进度：单次往返，且在同一个读快照内，不会读到写入到一半的数据
+    _PROGRESS_QUERY = """
+        SELECT 0, NULL, last_visit, total_time, 0 FROM users WHERE user_id = :u
+        UNION ALL SELECT 1, module_id, status, updated_at, rowid FROM module_progress WHERE user_id = :u
+        UNION ALL SELECT 2, exercise_id, correct, completed_at, rowid FROM exercise_progress WHERE user_id = :u
+        UNION ALL SELECT 3, quiz_id, score, completed_at, rowid FROM quiz_progress WHERE user_id = :u
+        UNION ALL SELECT 4, day, NULL, NULL, day FROM learning_days WHERE user_id = :u
+        ORDER BY 1, 5
+    """
+
+    def get_progress(self, user_id: str = DEFAULT_USER) -> dict:
+        progress = empty_progress()
+        modules, exercises, quizzes, days = (progress['modules'], progress['exercises'],
+                                             progress['quizzes'], progress['learning_days'])
+        for kind, key, a, b, _ in self._conn().execute(self._PROGRESS_QUERY, {'u': user_id}):
+            if kind == 1:
+                modules[key] = {'status': a, 'updated_at': b}
+            elif kind == 2:
+                exercises.append({'id': key, 'completed_at': b, 'correct': bool(a)})
+            elif kind == 3:
+                quizzes.append({'id': key, 'score': a, 'completed_at': b})
+            elif kind == 4:
+                days.append(key)
+            else:
+                progress['last_visit'], progress['total_time'] = a, b
+        return progress
+
+    def save_progress(self, data: dict, user_id: str = DEFAULT_USER):
+        conn = self._conn()
+        with conn:
+            for table in ('module_progress', 'exercise_progress', 'quiz_progress', 'learning_days'):
+                conn.execute(f'DELETE FROM {table} WHERE user_id = ?', (user_id,))
+            self._insert_progress(conn, data, user_id)
+
+    def set_module_status(self, module_id: str, status: str, user_id: str = DEFAULT_USER, at: datetime = None):
+        self.apply_events([(EVENT_MODULE, {'module_id': module_id, 'status': status}, at)], user_id)
+
+    def mark_exercise(self, exercise_id: str, correct: bool, user_id: str = DEFAULT_USER, at: datetime = None):
+        self.apply_events([(EVENT_EXERCISE, {'exercise_id': exercise_id, 'correct': correct}, at)], user_id)
+
+    def mark_quiz(self, quiz_id: str, score: int, user_id: str = DEFAULT_USER, at: datetime = None):
+        self.apply_events([(EVENT_QUIZ, {'quiz_id': quiz_id, 'score': score}, at)], user_id)
+
+    def apply_events(self, events, user_id: str = DEFAULT_USER):
+        """整批事件在一个事务中写入"""
+        conn = self._conn()
+        with conn:
+            for event, payload, at in events:
+                now = at or datetime.now()
+                if event == EVENT_MODULE:
+                    conn.execute(
+                        'INSERT INTO module_progress (user_id, module_id, status, updated_at) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT(user_id, module_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at',
+                        (user_id, payload['module_id'], payload['status'], now.isoformat()))
+                    conn.execute('INSERT OR IGNORE INTO learning_days (user_id, day) VALUES (?, ?)',
+                                 (user_id, now.date().isoformat()))
+                    self._touch_user(conn, user_id, now.isoformat())
+                elif event == EVENT_EXERCISE:
+                    conn.execute(
+                        'INSERT INTO exercise_progress (user_id, exercise_id, correct, completed_at) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT(user_id, exercise_id) DO UPDATE SET correct = 1, completed_at = excluded.completed_at '
+                        'WHERE excluded.correct = 1',
+                        (user_id, str(payload['exercise_id']), int(bool(payload.get('correct'))), now.isoformat()))
+                elif event == EVENT_QUIZ:
+                    conn.execute(
+                        'INSERT INTO quiz_progress (user_id, quiz_id, score, completed_at) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT(user_id, quiz_id) DO UPDATE SET score = excluded.score, completed_at = excluded.completed_at '
+                        'WHERE excluded.score > quiz_progress.score',
+                        (user_id, str(payload['quiz_id']), int(payload.get('score') or 0), now.isoformat()))
+
+    @staticmethod
+    def _touch_user(conn, user_id, last_visit):
+        conn.execute(
+            'INSERT INTO users (user_id, last_visit) VALUES (?, ?) '
+            'ON CONFLICT(user_id) DO UPDATE SET last_visit = excluded.last_visit',
+            (user_id, last_visit))
+
+    @staticmethod
+    def _insert_progress(conn, data: dict, user_id: str):
+        conn.execute(
+            'INSERT INTO users (user_id, last_visit, total_time) VALUES (?, ?, ?) '
+            'ON CONFLICT(user_id) DO UPDATE SET last_visit = excluded.last_visit, total_time = excluded.total_time',
+            (user_id, data.get('last_visit'), int(data.get('total_time') or 0)))
+        conn.executemany(
+            'INSERT OR REPLACE INTO module_progress (user_id, module_id, status, updated_at) VALUES (?, ?, ?, ?)',
+            [(user_id, module_id, info.get('status', 'not_started'), info.get('updated_at') or info.get('completed_at'))
+             for module_id, info in data.get('modules', {}).items()])
+        conn.executemany(
+            'INSERT OR REPLACE INTO exercise_progress (user_id, exercise_id, correct, completed_at) VALUES (?, ?, ?, ?)',
+            [(user_id, str(e.get('id')), int(bool(e.get('correct'))), e.get('completed_at'))
+             for e in data.get('exercises', [])])
+        conn.executemany(
+            'INSERT OR REPLACE INTO quiz_progress (user_id, quiz_id, score, completed_at) VALUES (?, ?, ?, ?)',
+            [(user_id, str(q.get('id')), int(q.get('score') or 0), q.get('completed_at'))
+             for q in data.get('quizzes', [])])
+        conn.executemany(
+            'INSERT OR IGNORE INTO learning_days (user_id, day) VALUES (?, ?)',
+            [(user_id, day) for day in data.get('learning_days', [])])
+
+
+def migrate_json_to_sqlite(json_path, backend, user_id: str = DEFAULT_USER) -> dict:
+    """把 progress.json 一次性导入 SQLite，返回导入的数据"""
+    if not isinstance(backend, SQLiteProgressBackend):
+        backend = SQLiteProgressBackend(backend)
+    data = state_store.get(json_path) or empty_progress()
+    backend.save_progress(data, user_id)
+    return data
+
+
+def create_progress_backend(name: str, json_path, db_path, path_for=None) -> ProgressBackend:
+    """按名称创建存储后端（json / sqlite）；path_for(user_id) 为 JSON 后端各学习者的分片文件路径"""
+    if name == 'json':
+        return JSONProgressBackend(json_path, path_for)
+    if name == 'sqlite':
+        return SQLiteProgressBackend(db_path, migrate_from=json_path)
+    raise ValueError(f'未知的进度存储后端: {name}')
+
+
+if __name__ == '__main__':
+    data_dir = Path(__file__).parent / 'data'
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print('用法: python web/progress_store.py migrate [progress.json] [progress.db]')
+        sys.exit(1)
+    src = Path(sys.argv[2]) if len(sys.argv) > 2 else data_dir / 'progress.json'
+    dst = Path(sys.argv[3]) if len(sys.argv) > 3 else data_dir / 'progress.db'
+    migrated = migrate_json_to_sqlite(src, SQLiteProgressBackend(dst))
+    print(f"已迁移: {len(migrated.get('modules', {}))} 个模块, "
+          f"{len(migrated.get('exercises', []))} 道练习, {len(migrated.get('quizzes', []))} 个测验 -> {dst}")
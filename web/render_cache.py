@@ -0,0 +1,153 @@
+"""
+Python 教程 Web 平台 - 模块内容渲染缓存
+每个模块的 description.md 只渲染一次为 HTML，example.py 只高亮一次：
+- 缓存按文件签名（mtime, size）命中，签名变化时再比较内容哈希，内容未变则不重新渲染
+- 每个条目带内容哈希和修改时间，供页面生成 ETag / Last-Modified
+- 保存知识点内容后调用 invalidate() 使缓存失效
+
+Markdown 渲染依赖 markdown 包，代码高亮依赖 pygments；
+缺少依赖时只缓存原文，由前端（marked.js）渲染
+"""
+
+import sys
+import hashlib
+import threading
+from pathlib import Path
+
+from state_store import file_signature
+
+try:
+    import markdown as _markdown
+except ImportError:  # 可选依赖
+    _markdown = None
+
+try:
+    from pygments import highlight as _highlight
+    from pygments.lexers import PythonLexer
+    from pygments.formatters import HtmlFormatter
+except ImportError:  # 可选依赖
+    _highlight = None
+
+PYGMENTS_STYLE = 'github-dark'
+
+
+def _build_highlight_css() -> str:
+    if _highlight is None:
+        return ''
+    return HtmlFormatter(style=PYGMENTS_STYLE).get_style_defs(['.highlight', '.codehilite'])
+
+
+# 代码高亮样式（代码示例和 Markdown 中的代码块共用）
+HIGHLIGHT_CSS = _build_highlight_css()
+
+
+def renderer_version() -> str:
+    """渲染依赖的版本（写入启动快照的版本哈希，依赖升级后快照自动失效）"""
+    versions = []
+    for name in ('markdown', 'pygments'):
+        module = sys.modules.get(name)
+        versions.append(f'{name}={getattr(module, "__version__", None)}')
+    return ','.join(versions)
+
+
+def render_markdown(text: str):
+    """Markdown -> HTML，未安装 markdown 时返回 None"""
+    if _markdown is None or not text:
+        return None
+    extensions = ['fenced_code', 'tables', 'sane_lists']
+    extension_configs = {}
+    if _highlight is not None:
+        extensions.append('codehilite')
+        extension_configs['codehilite'] = {'guess_lang': False, 'pygments_style': PYGMENTS_STYLE}
+    return _markdown.markdown(text, extensions=extensions, extension_configs=extension_configs)
+
+
+def highlight_python(code: str):
+    """Python 代码 -> 高亮后的 HTML，未安装 pygments 时返回 None"""
+    if _highlight is None or not code:
+        return None
+    return _highlight(code, PythonLexer(), HtmlFormatter(style=PYGMENTS_STYLE))
+
+
+class RenderedFile:
+    """单个文件的原文、渲染结果和版本信息"""
+
+    __slots__ = ('text', 'html', 'digest', 'mtime', 'signature')
+
+    def __init__(self, text: str, html_text, digest: str, mtime: float, signature):
+        self.text = text
+        self.html = html_text
+        self.digest = digest
+        self.mtime = mtime
+        self.signature = signature
+
+
+_EMPTY = RenderedFile('', None, '', 0.0, None)
+
+
+class RenderCache:
+    """按模块缓存知识点和示例代码的渲染结果"""
+
+    def __init__(self, modules_dir):
+        self.modules_dir = Path(modules_dir)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def description(self, module_id: str) -> RenderedFile:
+        """模块知识点（description.md）"""
+        return self._get(module_id, 'description.md', render_markdown)
+
+    def example(self, module_id: str) -> RenderedFile:
+        """模块示例代码（example.py）"""
+        return self._get(module_id, 'example.py', highlight_python)
+
+    def version(self, module_id: str):
+        """模块内容版本：(内容哈希, 最后修改时间)，用于 HTTP 缓存校验"""
+        desc = self.description(module_id)
+        example = self.example(module_id)
+        digest = hashlib.sha1(f'{desc.digest}:{example.digest}'.encode()).hexdigest()
+        return digest, max(desc.mtime, example.mtime)
+
+    def export_entries(self) -> dict:
+        """全部渲染结果（写入启动快照）"""
+        with self._lock:
+            return dict(self._entries)
+
+    def load_entries(self, entries: dict):
+        """载入启动快照中的渲染结果（仍按文件签名校验，文件被修改时会重新渲染）"""
+        with self._lock:
+            self._entries.update(entries)
+
+    def invalidate(self, module_id: str = None):
+        """使某个模块（或全部）的缓存失效"""
+        with self._lock:
+            if module_id is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == module_id]:
+                    del self._entries[key]
+
+    def _get(self, module_id: str, filename: str, renderer) -> RenderedFile:
+        path = self.modules_dir / module_id / filename
+        key = (module_id, filename)
+        signature = file_signature(path)
+        entry = self._entries.get(key)
+        if entry is not None and entry.signature == signature:
+            return entry
+        if signature is None:
+            with self._lock:
+                self._entries.pop(key, None)
+            return _EMPTY
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        mtime = signature[0] / 1e9
+        if entry is not None and entry.digest == digest:
+            # 只是文件被 touch，内容未变，沿用已有渲染结果
+            rendered = RenderedFile(entry.text, entry.html, digest, mtime, signature)
+        else:
+            rendered = RenderedFile(text, renderer(text), digest, mtime, signature)
+        with self._lock:
+            self._entries[key] = rendered
+        return rendered
+
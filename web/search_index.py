@@ -0,0 +1,206 @@
+"""
+Python 教程 Web 平台 - 全文检索索引
+倒排索引 + BM25 排序：
+- 中文按字符二元组（bigram）切分，建索引时每个汉字也作为单字词项（单字查询可命中词中任意位置）
+- 英文/代码按单词切分，snake_case 标识符同时拆出各段
+- 英文查询词支持前缀匹配（有序词表 + 二分查找），扩展过多时保留文档频率最高的词项
+- 文档可单独增删，内容修改时增量更新
+"""
+
+import re
+import math
+import heapq
+import bisect
+import threading
+from collections import Counter
+
+# 连续的中日韩字符 / 英文数字单词
+_CJK_RUN = re.compile(r'[㐀-䶿一-鿿豈-﫿]+')
+_WORD = re.compile(r'[a-z0-9_]+')
+
+# 每个查询词最多扩展的前缀词项数量
+MAX_PREFIX_EXPANSION = 64
+
+
+def tokenize(text: str, for_query: bool = False) -> list:
+    """把文本切分为词项列表（for_query 时连续汉字只切二元组，不再重复产生单字词项）"""
+    if not text:
+        return []
+    text = text.lower()
+    tokens = []
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if not for_query:
+                tokens.extend(run)
+    for word in _WORD.findall(text):
+        tokens.append(word)
+        if '_' in word:
+            tokens.extend(part for part in word.split('_') if part)
+    return tokens
+
+
+class InvertedIndex:
+    """支持增量更新的倒排索引
+
+    文档键为 (kind, doc_id)，kind 如 'module' / 'exercise' / 'quiz'；
+    fields 为 [(文本, 权重), ...]，权重用于提高标题等字段的词频
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings = {}      # term -> {doc_key: tf}
+        self._terms = []         # 有序词表，用于前缀匹配
+        self._doc_terms = {}     # doc_key -> Counter(term -> tf)
+        self._doc_len = {}       # doc_key -> 文档长度
+        self._payloads = {}      # doc_key -> 返回给调用方的对象
+        self._total_len = 0
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def add_document(self, kind: str, doc_id, fields: list, payload=None):
+        """添加或替换文档"""
+        key = (kind, str(doc_id))
+        counts = Counter()
+        for text, weight in fields:
+            for token in tokenize(text):
+                counts[token] += weight
+        with self._lock:
+            self._remove(key)
+            for term, tf in counts.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    bisect.insort(self._terms, term)
+                postings[key] = tf
+            length = sum(counts.values())
+            self._doc_terms[key] = counts
+            self._doc_len[key] = length
+            self._payloads[key] = payload
+            self._total_len += length
+
+    def export_state(self) -> dict:
+        """索引的全部数据（写入启动快照）"""
+        with self._lock:
+            return {
+                'postings': self._postings, 'terms': self._terms, 'doc_terms': self._doc_terms,
+                'doc_len': self._doc_len, 'payloads': self._payloads, 'total_len': self._total_len,
+            }
+
+    def load_state(self, state: dict):
+        """用启动快照中的数据替换整个索引"""
+        with self._lock:
+            self._postings = state['postings']
+            self._terms = state['terms']
+            self._doc_terms = state['doc_terms']
+            self._doc_len = state['doc_len']
+            self._payloads = state['payloads']
+            self._total_len = state['total_len']
+
+    def remove_document(self, kind: str, doc_id):
+        """删除文档"""
+        with self._lock:
+            self._remove((kind, str(doc_id)))
+
+    def doc_ids(self, kind: str) -> set:
+        """某类文档的全部 ID"""
+        with self._lock:
+            return {doc_id for k, doc_id in self._doc_len if k == kind}
+
+    def payload(self, kind: str, doc_id):
+        """已索引文档的 payload，不存在返回 None"""
+        return self._payloads.get((kind, str(doc_id)))
+
+    def search(self, query: str, kind: str = None, limit: int = 20) -> list:
+        """BM25 检索，返回 [(score, kind, payload), ...]，所有查询词都需命中"""
+        query_terms = list(dict.fromkeys(tokenize(query, for_query=True)))
+        if not query_terms:
+            return []
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if n_docs == 0:
+                return []
+            avgdl = self._total_len / n_docs
+            scores = None
+            for term in query_terms:
+                term_scores = {}
+                for expanded in self._expand(term):
+                    postings = self._postings[expanded]
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    # 前缀扩展出的词项略微降权，精确匹配优先
+                    boost = 1.0 if expanded == term else 0.8
+                    for key, tf in postings.items():
+                        if kind is not None and key[0] != kind:
+                            continue
+                        norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * self._doc_len[key] / avgdl))
+                        term_scores[key] = term_scores.get(key, 0.0) + boost * idf * norm
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {key: s + term_scores[key] for key, s in scores.items() if key in term_scores}
+                if not scores:
+                    return []
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [(score, key[0], self._payloads[key]) for key, score in ranked]
+
+    def _expand(self, term: str) -> list:
+        """前缀扩展：以 term 开头的词项，精确匹配在前
+
+        超过 MAX_PREFIX_EXPANSION 个时保留文档频率最高的（而不是按字母序截断）；
+        中文词项只做精确匹配（单字已按字索引，二元组没有更长的词项）
+        """
+        if _CJK_RUN.match(term):
+            return [term] if term in self._postings else []
+        start = bisect.bisect_left(self._terms, term)
+        end = bisect.bisect_left(self._terms, term + '\U0010ffff', start)
+        if end - start <= MAX_PREFIX_EXPANSION:
+            return self._terms[start:end]
+        exact = [term] if term in self._postings else []
+        others = (candidate for candidate in self._terms[start:end] if candidate != term)
+        return exact + heapq.nlargest(MAX_PREFIX_EXPANSION - len(exact), others,
+                                      key=lambda candidate: len(self._postings[candidate]))
+
+    def _remove(self, key):
+        counts = self._doc_terms.pop(key, None)
+        if counts is None:
+            return
+        for term in counts:
+            postings = self._postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+                idx = bisect.bisect_left(self._terms, term)
+                del self._terms[idx]
+        self._total_len -= self._doc_len.pop(key)
+        self._payloads.pop(key, None)
+
+
+# ==================== 文档字段 ====================
+
+def module_fields(module: dict, description: str, example: str) -> list:
+    """模块文档字段：名称权重最高，其次是知识点和示例代码"""
+    return [(module.get('name', ''), 5), (module.get('id', ''), 3), (description, 1), (example, 1)]
+
+
+def exercise_fields(exercise: dict) -> list:
+    """练习题文档字段"""
+    return [
+        (exercise.get('title', ''), 3),
+        (' '.join(exercise.get('tags') or []), 2),
+        (exercise.get('description', ''), 1),
+        (exercise.get('starter_code', ''), 1),
+    ]
+
+
+def quiz_fields(quiz: dict) -> list:
+    """测验题文档字段"""
+    return [
+        (quiz.get('question', ''), 3),
+        (' '.join(str(o) for o in quiz.get('options') or []), 1),
+        (quiz.get('explanation', ''), 1),
+    ]
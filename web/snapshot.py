@@ -0,0 +1,147 @@
+"""
+Python 教程 Web 平台 - 内容启动快照
+启动时需要读取 24 个模块的 Markdown / 示例代码并渲染、加载题库、构建全文检索索引，
+耗时数秒。构建步骤把这些结果写入一个快照文件，应用启动时 mmap 后直接反序列化：
+
+    python snapshot.py build            # 生成 data/content.snapshot（部署/镜像构建时执行）
+    python snapshot.py check            # 检查快照是否可用
+    python snapshot.py bench [-n 3]     # 对比使用/不使用快照的冷启动耗时
+
+文件格式：MAGIC + 版本哈希 + 换行 + pickle 数据。
+版本哈希由全部源文件的签名（mtime, 大小）、渲染依赖版本和快照格式决定；
+任一源文件被修改后快照视为过期，应用回退到从源文件加载（不会使用过期内容）。
+快照只由本项目的构建步骤生成，不要加载来源不明的快照文件（pickle 可执行任意代码）。
+"""
+
+import os
+import sys
+import mmap
+import time
+import pickle
+import secrets
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+
+from state_store import file_signature
+
+MAGIC = b'PYTUTSNAP\n'
+# 快照内容结构变化时递增，旧快照自动失效
+FORMAT_VERSION = 1
+
+# 快照命令导入应用时使用的一次性会话密钥
+_THROWAWAY_KEY = secrets.token_hex(32)
+
+# read_snapshot 的状态
+LOADED = 'loaded'
+MISSING = 'missing'
+STALE = 'stale'
+CORRUPT = 'corrupt'
+
+
+def source_version(paths, extra=()) -> str:
+    """根据源文件签名计算快照版本（只 stat，不读取文件内容）"""
+    h = hashlib.sha1(f'{FORMAT_VERSION}:{sys.version_info[:2]}:{extra}'.encode())
+    for path in paths:
+        h.update(f'{path}:{file_signature(path)}\n'.encode())
+    return h.hexdigest()
+
+
+def write_snapshot(path, version: str, state) -> int:
+    """原子写入快照，返回文件大小"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = MAGIC + version.encode() + b'\n' + pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return len(data)
+
+
+def read_version(path):
+    """快照头部记录的版本，文件不存在或格式不对时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(len(MAGIC) + 64)
+    except OSError:
+        return None
+    if not header.startswith(MAGIC) or b'\n' not in header[len(MAGIC):]:
+        return None
+    return header[len(MAGIC):].split(b'\n', 1)[0].decode('ascii', 'replace')
+
+
+def read_snapshot(path, version: str) -> tuple:
+    """mmap 读取快照，返回 (内容, 状态)；版本不一致、文件缺失或损坏时内容为 None"""
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None, MISSING
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空文件
+            return None, CORRUPT
+        with mm:
+            body_start = len(MAGIC) + len(version) + 1
+            if mm[:len(MAGIC)] != MAGIC:
+                return None, CORRUPT
+            if mm[len(MAGIC):body_start] != version.encode() + b'\n':
+                return None, STALE
+            try:
+                with memoryview(mm) as view, view[body_start:] as body:
+                    return pickle.loads(body), LOADED
+            except Exception:
+                return None, CORRUPT
+
+
+# ==================== 命令行 ====================
+
+def _cold_start(snapshot_enabled: bool) -> float:
+    """在新进程中导入应用，返回导入耗时（秒）"""
+    code = 'import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)'
+    env = dict(os.environ, CONTENT_SNAPSHOT_ENABLED='1' if snapshot_enabled else '0')
+    env.setdefault('SECRET_KEY', _THROWAWAY_KEY)
+    out = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='内容启动快照')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help='从源文件生成快照')
+    sub.add_parser('check', help='检查快照是否可用')
+    bench = sub.add_parser('bench', help='对比冷启动耗时')
+    bench.add_argument('-n', type=int, default=3, help='每种方式启动的次数')
+    args = parser.parse_args(argv)
+    # 这里只导入应用、不处理请求：使用一次性密钥，不生成 data/.secret_key（避免被打包进镜像）
+    os.environ.setdefault('SECRET_KEY', _THROWAWAY_KEY)
+
+    if args.command == 'build':
+        # 从源文件构建，不使用已有快照
+        os.environ['CONTENT_SNAPSHOT_ENABLED'] = '0'
+        started = time.perf_counter()
+        import app
+        path, size = app.write_content_snapshot()
+        print(f'已生成 {path}（{size / 1024:.1f} KB，耗时 {time.perf_counter() - started:.2f}s）')
+    elif args.command == 'check':
+        import app
+        print(f'{app.CONTENT_SNAPSHOT_FILE}: {app.startup_report["snapshot"]}')
+        return 0 if app.startup_report['snapshot'] == LOADED else 1
+    elif args.command == 'bench':
+        for enabled, label in ((False, '源文件'), (True, '快照')):
+            times = sorted(_cold_start(enabled) for _ in range(args.n))
+            print(f'{label}: 最快 {times[0] * 1000:.0f} ms，中位数 {times[len(times) // 2] * 1000:.0f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
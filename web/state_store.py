@@ -0,0 +1,271 @@
+"""
+Python 教程 Web 平台 - 进程内状态存储
+进度、成就、收藏等 JSON 文件只加载一次，读操作直接走内存；
+写操作先更新内存，再延迟合并落盘（临时文件 + rename 原子替换），
+只有磁盘文件的 mtime 发生变化时才会重新加载
+
+多进程部署（gunicorn 多 worker）时开启 multiprocess：
+update() 在文件锁内完成“重新加载 -> 修改 -> 立即写盘”，避免不同进程互相覆盖
+
+按学习者分片存储时文件数量随用户增长：
+- 锁按文件路径分条（lock striping），不同学习者的读写互不阻塞
+- 内存中只保留最近使用的 max_entries 个文件（LRU），空闲学习者的状态落盘后被淘汰
+"""
+
+import os
+import json
+import itertools
+import atexit
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metrics import timed, record_disk_write, JSON_IO_LATENCY
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只支持单进程部署
+    fcntl = None
+
+
+def atomic_write_json(filepath, data):
+    """原子写入 JSON 文件（先写临时文件，再 rename 覆盖）"""
+    filepath = Path(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(filepath.parent), prefix=f'.{filepath.name}.', suffix='.tmp')
+    try:
+        with timed(JSON_IO_LATENCY, op='save'):
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+                written = os.fstat(f.fileno()).st_size
+            os.replace(tmp_path, filepath)
+        record_disk_write(filepath, written)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def file_signature(filepath: Path):
+    """文件签名（mtime_ns, size），文件不存在时返回 None"""
+    try:
+        st = filepath.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+@contextmanager
+def file_lock(filepath):
+    """跨进程文件锁（锁文件为 <文件名>.lock）"""
+    if fcntl is None:
+        yield
+        return
+    filepath = Path(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    with open(filepath.with_name(filepath.name + '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class _Entry:
+    """单个文件的缓存条目"""
+
+    __slots__ = ('data', 'signature', 'dirty')
+
+    def __init__(self, data, signature):
+        self.data = data
+        self.signature = signature
+        self.dirty = False
+
+
+class JSONStateStore:
+    """进程级 JSON 状态存储
+
+    - get(): 命中内存缓存时只做一次 stat，文件被外部修改才重新解析
+    - set(): 只更新内存并标记为脏数据，由后台定时器在 flush_delay 秒后统一落盘
+    - update(): 读-改-写，多进程模式下持有文件锁并立即落盘
+    - flush(): 立即把所有脏数据原子写入磁盘（进程退出时自动调用）
+    """
+
+    # 锁分条数量
+    STRIPES = 64
+
+    def __init__(self, flush_delay: float = 0.5, multiprocess: bool = False, max_entries: int = 4096):
+        self.flush_delay = flush_delay
+        self.multiprocess = multiprocess
+        self.max_entries = max_entries
+        self._stripes = [threading.RLock() for _ in range(self.STRIPES)]
+        self._entries_lock = threading.Lock()     # 只保护 _entries 的结构（LRU 顺序）
+        self._timer_lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._timer = None
+        self.evictions = 0
+
+    def _lock(self, filepath: Path):
+        return self._stripes[hash(filepath) % self.STRIPES]
+
+    def get(self, filepath):
+        """读取文件内容（文件不存在时返回 None）"""
+        filepath = Path(filepath)
+        with self._lock(filepath):
+            entry = self._touch(filepath)
+            if entry is not None and (entry.dirty or entry.signature == file_signature(filepath)):
+                return entry.data
+            entry = self._load(filepath)
+            return entry.data
+
+    def set(self, filepath, data):
+        """更新文件内容，延迟落盘"""
+        filepath = Path(filepath)
+        with self._lock(filepath):
+            self._set_locked(filepath, data)
+        self._schedule_flush()
+
+    def _set_locked(self, filepath: Path, data):
+        entry = self._touch(filepath)
+        if entry is None:
+            entry = self._put(filepath, _Entry(data, None))
+        entry.data = data
+        entry.dirty = True
+
+    def update(self, filepath, mutator, default_factory=None):
+        """在最新数据上执行 mutator(data) 并保存，返回 mutator 的返回值
+
+        文件不存在时以 default_factory() 作为初始数据
+        """
+        filepath = Path(filepath)
+        if not self.multiprocess:
+            with self._lock(filepath):
+                data = self.get(filepath)
+                if data is None and default_factory is not None:
+                    data = default_factory()
+                result = mutator(data)
+                self._set_locked(filepath, data)
+            # 在分条锁之外调度落盘，避免持有一把锁时再去获取其他分条
+            self._schedule_flush()
+            return result
+        with self._lock(filepath):
+            with file_lock(filepath):
+                # 其他进程可能刚写过文件，先按 mtime 检查是否需要重新加载
+                data = self.get(filepath)
+                if data is None and default_factory is not None:
+                    data = default_factory()
+                result = mutator(data)
+                atomic_write_json(filepath, data)
+                entry = self._touch(filepath) or self._put(filepath, _Entry(data, None))
+                entry.data = data
+                entry.signature = file_signature(filepath)
+                entry.dirty = False
+                return result
+
+    def reset_after_fork(self):
+        """fork 之后调用：父进程的定时器线程不会被继承，重新调度未落盘的数据"""
+        self._stripes = [threading.RLock() for _ in range(self.STRIPES)]
+        self._entries_lock = threading.Lock()
+        self._timer_lock = threading.Lock()
+        self._timer = None
+        if any(entry.dirty for entry in list(self._entries.values())):
+            self._schedule_flush()
+
+    def flush(self):
+        """立即将所有脏数据写入磁盘"""
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        with self._entries_lock:
+            items = list(self._entries.items())
+        for filepath, entry in items:
+            if entry.dirty:
+                with self._lock(filepath):
+                    self._write_entry(filepath, entry)
+
+    def invalidate(self, filepath=None):
+        """丢弃缓存（未落盘的数据会先写入磁盘）"""
+        self.flush()
+        with self._entries_lock:
+            if filepath is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(Path(filepath), None)
+
+    def stats(self) -> dict:
+        with self._entries_lock:
+            return {'entries': len(self._entries), 'evictions': self.evictions,
+                    'dirty': sum(1 for entry in self._entries.values() if entry.dirty)}
+
+    def _write_entry(self, filepath: Path, entry: _Entry):
+        """调用方持有该文件的分条锁"""
+        if not entry.dirty:
+            return
+        with file_lock(filepath):
+            atomic_write_json(filepath, entry.data)
+        entry.signature = file_signature(filepath)
+        entry.dirty = False
+
+    def _touch(self, filepath: Path):
+        """取出缓存条目并标记为最近使用"""
+        with self._entries_lock:
+            entry = self._entries.get(filepath)
+            if entry is not None:
+                self._entries.move_to_end(filepath)
+            return entry
+
+    def _put(self, filepath: Path, entry: _Entry) -> _Entry:
+        with self._entries_lock:
+            self._entries[filepath] = entry
+            self._entries.move_to_end(filepath)
+            over = len(self._entries) - self.max_entries
+            victims = list(itertools.islice(self._entries.items(), max(over, 0)))
+        for victim_path, victim in victims:
+            self._evict(victim_path, victim)
+        return entry
+
+    def _evict(self, filepath: Path, entry: _Entry):
+        """淘汰最久未使用的条目（脏数据先落盘）；条目正被其他线程使用时跳过"""
+        lock = self._lock(filepath)
+        if not lock.acquire(blocking=False):
+            return
+        try:
+            self._write_entry(filepath, entry)
+            with self._entries_lock:
+                if self._entries.get(filepath) is entry:
+                    del self._entries[filepath]
+                    self.evictions += 1
+        finally:
+            lock.release()
+
+    def _load(self, filepath: Path) -> _Entry:
+        signature = file_signature(filepath)
+        data = None
+        if signature is not None:
+            with timed(JSON_IO_LATENCY, op='load'), open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        return self._put(filepath, _Entry(data, signature))
+
+    def _schedule_flush(self):
+        if self.flush_delay <= 0 or self.multiprocess:
+            self.flush()
+            return
+        with self._timer_lock:
+            if self._timer is None:
+                # 窗口期内的多次写入合并为一次落盘
+                self._timer = threading.Timer(self.flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+
+# 进程级单例（多进程部署时由 gunicorn 配置设置 STATE_MULTIPROCESS=1）
+state_store = JSONStateStore(
+    multiprocess=os.environ.get('STATE_MULTIPROCESS') == '1',
+    max_entries=int(os.environ.get('STATE_CACHE_ENTRIES', 4096))
+)
+atexit.register(state_store.flush)
@@ -0,0 +1,74 @@
+"""
+Python 教程 Web 平台 - 学习者标识与分片存储路径
+每个浏览器会话分配一个随机学习者 ID（保存在签名的 Flask session 中），
+学习者的进度、成就、收藏各自存放在独立的分片文件中：
+
+    data/users/<ID 前两位>/<ID>/progress.json | achievements.json | favorites.json
+
+默认学习者（单用户模式、命令行脚本）继续使用 data/ 下原有的文件。
+会话中只接受随机 ID，默认学习者不能经由 cookie 冒用；升级前默认学习者的
+进度由第一个新会话认领一次（见 claim_legacy_state），原文件保留作为备份
+"""
+
+import os
+import re
+import secrets
+import time
+from pathlib import Path
+
+from progress_store import DEFAULT_USER
+
+# 学习者 ID：32 位十六进制（也用作目录名，只接受该格式）
+_USER_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def new_user_id() -> str:
+    return secrets.token_hex(16)
+
+
+def is_valid_user_id(user_id) -> bool:
+    """会话中的学习者 ID 是否有效（默认学习者只在服务端使用，不接受来自会话的 'default'）"""
+    return isinstance(user_id, str) and bool(_USER_ID_RE.match(user_id))
+
+
+def user_state_path(data_dir, user_id: str, filename: str) -> Path:
+    """学习者状态文件路径"""
+    data_dir = Path(data_dir)
+    if user_id == DEFAULT_USER:
+        return data_dir / filename
+    if not _USER_ID_RE.match(user_id or ''):
+        raise ValueError(f'无效的学习者 ID: {user_id!r}')
+    return data_dir / 'users' / user_id[:2] / user_id / filename
+
+
+def claim_legacy_state(data_dir, user_id: str) -> bool:
+    """由 user_id 认领升级前默认学习者的数据；标记文件以 O_EXCL 创建，多进程下只有一个会话成功"""
+    marker = Path(data_dir) / 'users' / '.legacy_owner'
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(marker, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(user_id)
+    return True
+
+
+def load_secret_key(path) -> bytes:
+    """会话签名密钥：首次启动时随机生成并以 0600 权限保存，之后各进程读取同一个文件"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # 其他进程可能刚创建、尚未写完
+        for _ in range(50):
+            key = path.read_bytes()
+            if key:
+                return key
+            time.sleep(0.02)
+        raise RuntimeError(f'会话密钥文件为空: {path}')
+    key = secrets.token_bytes(32)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
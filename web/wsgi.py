@@ -0,0 +1,19 @@
+"""
+Python 教程 Web 平台 - WSGI 入口
+生产部署: gunicorn -c gunicorn.conf.py wsgi:app
+
+导入时完成题库索引、检索索引构建和内容渲染预热（启动快照可用时直接从快照加载）；
+配合 preload_app，这些工作只在主进程执行一次，各 worker fork 后直接共享
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import app, warm_caches, startup_summary  # noqa: E402
+
+warm_caches()
+print(f'[startup] {startup_summary()}', file=sys.stderr)
+
+application = app